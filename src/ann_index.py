@@ -0,0 +1,216 @@
+import argparse
+import numpy as np
+from pathlib import Path
+
+from neighbors import normalize, threshold_neighbors, topk_neighbors
+from quantized import open_embeddings
+
+EMBEDDINGS_FILE = Path("outputs/embeddings_qwen3.npy")
+INDEX_FILE = Path("outputs/ann_index_qwen3.npz")
+REPORT_FILE = Path("outputs/ann_recall_qwen3.txt")
+
+N_LISTS = None        # 倒排桶数，None 表示取 √N
+N_PROBE = 8           # 查询时探查的桶数
+PQ_SUBSPACES = 0      # 乘积量化子空间数，0 表示不量化（桶内精确打分）
+PQ_CENTROIDS = 256    # 每个子空间的码本大小（uint8 编码）
+KMEANS_ITERS = 20
+RERANK = 10           # 使用 PQ 时，候选先按近似分取 k × RERANK 个再用原向量精排
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """球面 k-means（点积最大化），返回 k 个中心"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # 空簇重新随机取点
+                centroids[c] = x[rng.integers(len(x))]
+    return centroids
+
+
+def _kmeans_l2(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """欧氏距离 k-means，用于 PQ 码本训练"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        dist = (x ** 2).sum(1, keepdims=True) - 2 * x @ centroids.T + (centroids ** 2).sum(1)
+        assign = np.argmin(dist, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return centroids
+
+
+class IVFIndex:
+    """倒排文件索引（IVF），可选对残差做乘积量化（PQ）；向量归一化后以点积作为余弦相似度"""
+
+    def __init__(self, centroids, list_offsets, list_ids, vectors, codebooks=None, codes=None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets    # 第 c 个桶的成员为 list_ids[list_offsets[c]:list_offsets[c + 1]]
+        self.list_ids = list_ids
+        self.vectors = vectors              # 归一化后的原向量，用于精排
+        self.codebooks = codebooks          # (子空间数, 码本大小, 子空间维度)
+        self.codes = codes                  # (N, 子空间数) uint8，按 list_ids 顺序排列
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: int | None = N_LISTS,
+              pq_subspaces: int = PQ_SUBSPACES, seed: int = 0) -> "IVFIndex":
+        vectors = np.asarray(normalize(embeddings), dtype=np.float32)
+        n_lists = n_lists or max(int(np.sqrt(len(vectors))), 1)
+        centroids = normalize(kmeans(vectors, n_lists, seed=seed))
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_offsets = np.searchsorted(assign[list_ids], np.arange(len(centroids) + 1)).astype(np.int64)
+
+        codebooks = codes = None
+        if pq_subspaces:
+            dim = vectors.shape[1]
+            if dim % pq_subspaces:
+                raise ValueError(f"向量维度 {dim} 不能被 PQ 子空间数 {pq_subspaces} 整除")
+            sub = dim // pq_subspaces
+            residuals = (vectors - centroids[assign])[list_ids]
+            codebooks = np.empty((pq_subspaces, min(PQ_CENTROIDS, len(vectors)), sub), dtype=np.float32)
+            codes = np.empty((len(vectors), pq_subspaces), dtype=np.uint8)
+            for m in range(pq_subspaces):
+                part = residuals[:, m * sub:(m + 1) * sub]
+                codebooks[m] = _kmeans_l2(part, codebooks.shape[1], seed=seed + m)
+                dist = (part ** 2).sum(1, keepdims=True) - 2 * part @ codebooks[m].T + (codebooks[m] ** 2).sum(1)
+                codes[:, m] = np.argmin(dist, axis=1)
+        return cls(centroids, list_offsets, list_ids, vectors, codebooks, codes)
+
+    def save(self, path: Path) -> None:
+        arrays = {"centroids": self.centroids, "list_offsets": self.list_offsets,
+                  "list_ids": self.list_ids, "vectors": self.vectors}
+        if self.codebooks is not None:
+            arrays.update(codebooks=self.codebooks, codes=self.codes)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["list_offsets"], data["list_ids"], data["vectors"],
+                   data["codebooks"] if "codebooks" in data else None,
+                   data["codes"] if "codes" in data else None)
+
+    def _candidates(self, query: np.ndarray, n_probe: int):
+        """返回探查桶内的 (候选 id, 候选在 list_ids 中的位置, 探查的桶)"""
+        probe = np.argsort(-(self.centroids @ query))[:n_probe]
+        positions = np.concatenate([np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe])
+        return self.list_ids[positions], positions, probe
+
+    def _approx_scores(self, query: np.ndarray, positions: np.ndarray, probe: np.ndarray) -> np.ndarray:
+        """PQ 近似分：q·c + Σ_m q_m·codebook_m[code]"""
+        sub = self.codebooks.shape[2]
+        tables = np.einsum("msd,md->ms", self.codebooks, query.reshape(len(self.codebooks), sub))
+        bucket = np.repeat(probe, np.diff(self.list_offsets)[probe])
+        codes = self.codes[positions]
+        return (self.centroids[bucket] @ query
+                + tables[np.arange(len(self.codebooks)), codes].sum(axis=1))
+
+    def search(self, query: np.ndarray, k: int | None = None, threshold: float | None = None,
+               n_probe: int = N_PROBE, exclude: int | None = None):
+        """单条查询：返回 (下标, 相似度)，按相似度降序；k 与 threshold 可任选其一或同时使用"""
+        query = normalize(query[None, :])[0]
+        ids, positions, probe = self._candidates(query, n_probe)
+        if self.codes is not None and k:
+            # 先用 PQ 近似分粗筛，再用原向量精排
+            approx = self._approx_scores(query, positions, probe)
+            keep = np.argsort(-approx)[:k * RERANK + 1]
+            ids = ids[keep]
+        scores = self.vectors[ids] @ query
+        if exclude is not None:
+            mask = ids != exclude
+            ids, scores = ids[mask], scores[mask]
+        if threshold is not None:
+            mask = scores >= threshold
+            ids, scores = ids[mask], scores[mask]
+        order = np.argsort(-scores, kind="stable")
+        if k:
+            order = order[:k]
+        return ids[order], scores[order]
+
+    def iter_threshold_pairs(self, threshold: float, n_probe: int = N_PROBE):
+        """逐个向量产出相似度达到阈值的近邻对 (u, v, score)，u < v
+
+        近似搜索不对称：v < u 的对若在查询 v 时已探查到（u 所在的桶在 v 的探查桶内）则不再产出，
+        每对只出现一次；只需记录每个向量探查过的桶，内存为 O(N × n_probe) 而不是 O(对数)。
+        """
+        assign = np.empty(len(self), dtype=np.int64)
+        assign[self.list_ids] = np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+        probes = np.empty((len(self), min(n_probe, len(self.centroids))), dtype=np.int64)
+        for u, vector in enumerate(self.vectors):
+            query = normalize(vector[None, :])[0]
+            ids, _, probes[u] = self._candidates(query, n_probe)
+            scores = self.vectors[ids] @ query
+            keep = (scores >= threshold) & (ids != u)
+            ids, scores = ids[keep], scores[keep]
+            earlier = ids < u
+            keep = np.ones(len(ids), dtype=bool)
+            keep[earlier] = ~(probes[ids[earlier]] == assign[u]).any(axis=1)
+            ids, scores = ids[keep], scores[keep]
+            yield np.minimum(ids, u), np.maximum(ids, u), scores
+
+    def all_neighbors(self, k: int | None = None, threshold: float | None = None, n_probe: int = N_PROBE):
+        """对索引中每个向量查询近邻（排除自身），结构与 neighbors 模块一致"""
+        return [self.search(v, k, threshold, n_probe, exclude=i) for i, v in enumerate(self.vectors)]
+
+
+def recall(approx, exact) -> float:
+    """近似结果相对精确结果的召回率（按邻居对计）"""
+    hit = total = 0
+    for (a_idx, _), (e_idx, _) in zip(approx, exact):
+        total += len(e_idx)
+        hit += len(np.intersect1d(a_idx, e_idx))
+    return hit / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emb", type=Path, default=EMBEDDINGS_FILE, help="embedding 文件")
+    parser.add_argument("--out", type=Path, default=INDEX_FILE, help="索引输出文件（.npz）")
+    parser.add_argument("--n-lists", type=int, default=N_LISTS, help="倒排桶数")
+    parser.add_argument("--pq", type=int, default=PQ_SUBSPACES, help="PQ 子空间数，0 表示不量化")
+    parser.add_argument("--k", type=int, default=10, help="评估 top-k 召回")
+    parser.add_argument("--thresh", type=float, default=0.75, help="评估阈值召回")
+    parser.add_argument("--report", type=Path, default=REPORT_FILE, help="召回率报告")
+    args = parser.parse_args()
+
+    embeddings = open_embeddings(args.emb)
+    index = IVFIndex.build(embeddings, args.n_lists, args.pq)
+    index.save(args.out)
+    print(f"✅ 索引已保存：{args.out}（{len(index.centroids)} 个桶，PQ 子空间 {args.pq}）")
+
+    # 与精确搜索对比不同 n_probe 下的召回率
+    exact_k = topk_neighbors(embeddings, args.k)
+    exact_t = threshold_neighbors(embeddings, args.thresh)
+    lines = [f"n_probe recall@{args.k} recall@{args.thresh:.2f}"]
+    n_probe = 1
+    while True:
+        probe = min(n_probe, len(index.centroids))
+        r_k = recall(index.all_neighbors(k=args.k, n_probe=probe), exact_k)
+        r_t = recall(index.all_neighbors(threshold=args.thresh, n_probe=probe), exact_t)
+        lines.append(f"{probe} {r_k:.3f} {r_t:.3f}")
+        print(f"n_probe={probe} recall@{args.k}={r_k:.3f} recall@{args.thresh:.2f}={r_t:.3f}")
+        if probe >= len(index.centroids):
+            break
+        n_probe *= 2
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"✅ 召回率报告已保存：{args.report}")
+
+
+if __name__ == "__main__":
+    main()
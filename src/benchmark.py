@@ -0,0 +1,283 @@
+import io
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import contextlib
+import multiprocessing
+import numpy as np
+from pathlib import Path
+
+from instrumentation import proc_status_mb, reset_peak_rss, peak_rss_mb
+from synthetic_spec import generate_spec, stub_embed, save_spec, STUB_DIM
+
+WORK_DIR = Path("outputs/benchmark")
+SIZES = (1000, 10000, 100000)
+THRESHOLD = 0.75
+TIMEOUT = 600           # 单个阶段的超时秒数，超时记为 timeout 而不是拖住整轮测试
+TOLERANCE = 1.2         # 与基线对比时，耗时超过基线的倍数记为回退
+
+
+# —— 各阶段：输入由 _load_inputs 按 needs 读入，返回 (处理条数, 输出规模) ——
+
+def _bench_load_spec(inputs):
+    from spec_loader import parse_spec_file
+    spec = parse_spec_file(inputs["dir"] / "openapi.yaml")
+    return sum(len(methods) for methods in spec["paths"].values()), len(spec["paths"])
+
+
+def _bench_stream_spec(inputs):
+    # 直接从文件流式解析，与 load_spec + parse_openapi 对照（峰值内存不随 spec 增长）
+    from parse_openapi import iter_operations
+    from spec_stream import SpecStream
+    with SpecStream(inputs["dir"] / "openapi.yaml") as spec:
+        n_ops = sum(1 for _ in iter_operations(spec.paths()))
+    return n_ops, n_ops
+
+
+def _bench_parse_openapi(inputs):
+    from parse_openapi import operations_from_spec
+    ops = operations_from_spec(inputs["spec"])
+    return len(ops), len(ops)
+
+
+def _bench_extract_parameters(inputs):
+    from extract_parameters import parameters_from_spec
+    result = parameters_from_spec(inputs["spec"])
+    return len(result), sum(len(op["parameters"]) for op in result)
+
+
+def _bench_build_dependencies(inputs):
+    from build_dependencies import compute_graph
+    graph = compute_graph(inputs["operations"], inputs["embeddings"], THRESHOLD)
+    return len(graph), graph.n_edges
+
+
+def _bench_build_param_deps(inputs):
+    from build_param_deps import iter_vector_edges
+    edges = sum(len(i) for i, _, _ in iter_vector_edges(inputs["params"], inputs["param_vectors"],
+                                                         inputs["param_index"]))
+    return len(inputs["params"]), edges
+
+
+def _bench_threshold_curve(inputs):
+    from threshold_sweep import sweep
+    results = sweep(inputs["embeddings"], inputs["operations"], np.arange(0.65, 0.81, 0.01))
+    return len(inputs["operations"]), len(results)
+
+
+def _bench_tag_purity(inputs):
+    from tag_purity import purity_of
+    purity_of(inputs["graph"], inputs["operations"])
+    return len(inputs["operations"]), inputs["graph"].n_edges
+
+
+def _bench_visualize(inputs):
+    from graph_tiles import write_tiles
+    write_tiles(inputs["graph"], inputs["operations"], inputs["embeddings"], inputs["dir"] / "graph_tiles")
+    return len(inputs["graph"]), len(list((inputs["dir"] / "graph_tiles" / "tiles").glob("*.js")))
+
+
+def _bench_find_dependencies(inputs):
+    from parse_params import extract_operations_from_dict, resolve_all_refs, find_dependencies
+    # 逐接口的日志输出不计入测量
+    with contextlib.redirect_stdout(io.StringIO()):
+        operations = extract_operations_from_dict(inputs["spec"])
+        resolve_all_refs(operations, inputs["spec"])
+        dependencies = find_dependencies(operations)
+    return len(operations), len(dependencies)
+
+
+# 阶段名 → (函数, 需要的输入)
+STAGES = {
+    "load_spec": (_bench_load_spec, []),
+    "parse_openapi": (_bench_parse_openapi, ["spec"]),
+    "stream_spec": (_bench_stream_spec, []),
+    "extract_parameters": (_bench_extract_parameters, ["spec"]),
+    "build_dependencies": (_bench_build_dependencies, ["operations", "embeddings"]),
+    "build_param_deps": (_bench_build_param_deps, ["params", "param_vectors", "param_index"]),
+    "threshold_curve": (_bench_threshold_curve, ["operations", "embeddings"]),
+    "tag_purity": (_bench_tag_purity, ["operations", "graph"]),
+    "visualize": (_bench_visualize, ["operations", "embeddings", "graph"]),
+    "find_dependencies": (_bench_find_dependencies, ["spec"]),
+}
+
+
+def prepare(n: int, seed: int = 0, work_dir: Path = WORK_DIR) -> Path:
+    """生成 n 个接口的合成 spec 及各阶段的输入（桩 embedding、依赖图、参数向量），已存在则复用"""
+    from build_dependencies import compute_graph
+    from extract_parameters import parameters_from_spec
+    from parse_openapi import operations_from_spec
+
+    out = work_dir / f"n{n}_seed{seed}"
+    if (out / "graph.npz").exists():
+        return out
+    out.mkdir(parents=True, exist_ok=True)
+    spec = generate_spec(n, seed)
+    save_spec(spec, out / "openapi.yaml")
+    with open(out / "spec.json", "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+
+    operations = operations_from_spec(spec)
+    embeddings = stub_embed([op["full_text"] for op in operations])
+    with open(out / "operations.json", "w", encoding="utf-8") as f:
+        json.dump(operations, f, ensure_ascii=False)
+    np.save(out / "embeddings.npy", embeddings)
+
+    # 参数描述按 embed_parameter_descriptions --dedup 的方式去重后编码
+    params, unique, index = [], {}, []
+    with contextlib.redirect_stdout(io.StringIO()):
+        extracted = parameters_from_spec(spec)
+    for op in extracted:
+        for param in op["parameters"]:
+            desc = param.get("description", "")
+            params.append({"operationId": op["operationId"], "param_name": param["name"],
+                           "param_in": param["in"], "description": desc})
+            index.append(unique.setdefault(desc, len(unique)))
+    with open(out / "params.json", "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False)
+    np.save(out / "param_vectors.npy", stub_embed(list(unique)))
+    np.save(out / "param_index.npy", np.asarray(index, dtype=np.int32))
+
+    compute_graph(operations, embeddings, THRESHOLD).save(out / "graph.npz")
+    print(f"📦 已生成 {n} 个接口的基准输入：{out}")
+    return out
+
+
+def _load_inputs(data_dir: Path, needs: list[str]) -> dict:
+    from graph import Graph
+
+    inputs = {"dir": data_dir}
+    for name in needs:
+        if name == "spec":
+            with open(data_dir / "spec.json", "r", encoding="utf-8") as f:
+                inputs[name] = json.load(f)
+        elif name in ("operations", "params"):
+            with open(data_dir / f"{name}.json", "r", encoding="utf-8") as f:
+                inputs[name] = json.load(f)
+        elif name == "graph":
+            inputs[name] = Graph.load(data_dir / "graph.npz")
+        else:
+            inputs[name] = np.load(data_dir / f"{name}.npy")
+    return inputs
+
+
+def _run_stage(stage: str, data_dir: Path, conn, max_memory_mb: int | None = None) -> None:
+    """子进程：读入输入后计时运行一个阶段，峰值内存即该进程的最高常驻内存"""
+    if max_memory_mb:
+        # 超出上限时抛 MemoryError 记为 error，而不是被系统 OOM 直接杀掉
+        limit = max_memory_mb * 2 ** 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        fn, needs = STAGES[stage]
+        inputs = _load_inputs(data_dir, needs)
+        input_rss = proc_status_mb("VmRSS")
+        reset_peak_rss()
+        start = time.perf_counter()
+        items, output = fn(inputs)
+        wall = time.perf_counter() - start
+        conn.send({"status": "ok", "wall_s": wall, "items": items, "output": output,
+                   "throughput": items / max(wall, 1e-9), "input_rss_mb": input_rss,
+                   "peak_rss_mb": peak_rss_mb()})
+    except Exception as e:
+        conn.send({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_stage(stage: str, data_dir: Path, timeout: float = TIMEOUT, max_memory_mb: int | None = None) -> dict:
+    """在独立进程中运行，各阶段的峰值内存互不影响；超时或进程被杀（如 OOM）也会记录下来"""
+    ctx = multiprocessing.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_stage, args=(stage, data_dir, send, max_memory_mb))
+    proc.start()
+    send.close()
+    result = {"status": "timeout"} if not recv.poll(timeout) else None
+    if result is None:
+        try:
+            result = recv.recv()
+        except EOFError:
+            result = None
+    proc.join(5 if result else 0)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+    return result or {"status": "error", "error": f"exit code {proc.exitcode}"}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "stub_dim": STUB_DIM,
+        "threshold": THRESHOLD,
+    }
+
+
+def compare(results: list[dict], baseline_file: Path, tolerance: float = TOLERANCE) -> list[str]:
+    """与历史结果逐项对比耗时，返回超过 tolerance 倍的回退项"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {(r["n"], r["stage"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["n"], r["stage"]))
+        if not base or base.get("status") != "ok" or r.get("status") != "ok":
+            continue
+        ratio = r["wall_s"] / max(base["wall_s"], 1e-9)
+        if ratio > tolerance:
+            regressions.append(f"{r['stage']} n={r['n']}: {base['wall_s']:.3f}s → {r['wall_s']:.3f}s（×{ratio:.2f}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="合成 spec 的接口数")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="要测的阶段")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="单个阶段的超时秒数")
+    parser.add_argument("--max-memory-mb", type=int, default=None, help="单个阶段的虚拟内存上限（MB）")
+    parser.add_argument("--out", type=Path, default=None, help="结果 JSON（默认按 commit 命名）")
+    parser.add_argument("--compare", type=Path, default=None, help="对比的历史结果 JSON")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="耗时超过基线多少倍记为回退")
+    args = parser.parse_args()
+
+    env = environment()
+    results = []
+    for n in args.sizes:
+        data_dir = prepare(n, args.seed)
+        for stage in args.stages:
+            r = {"n": n, "stage": stage, **run_stage(stage, data_dir, args.timeout, args.max_memory_mb)}
+            results.append(r)
+            if r["status"] == "ok":
+                print(f"⏱️  n={n:<7} {stage:<19} {r['wall_s']:9.3f}s  峰值 {r['peak_rss_mb']:8.1f} MB  "
+                      f"{r['throughput']:12.1f} 条/s  输出 {r['output']}")
+            else:
+                print(f"❌ n={n:<7} {stage:<19} {r['status']} {r.get('error', '')}")
+
+    out = args.out or WORK_DIR / f"results_{env['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"environment": env, "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"✅ 基准结果已保存：{out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"⚠️  回退：{line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,82 @@
 import json
+import argparse
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from pathlib import Path
 
+import instrumentation
+from ann_index import IVFIndex, N_PROBE
+from graph import Graph
+from instrumentation import count, stage
+from neighbors import threshold_neighbors, topk_neighbors, BLOCK_SIZE
+from quantized import open_embeddings
+
 OPERATIONS_FILE = Path("outputs/operations.json")
 EMBEDDINGS_FILE = Path("outputs/embeddings_qwen3.npy")
 OUTPUT_FILE = Path("outputs/dependencies_qwen3.json")
 
 THRESHOLD = 0.75
 
-def build_dependencies():
-    with open(OPERATIONS_FILE, "r", encoding="utf-8") as f:
-        operations = json.load(f)
-    embeddings = np.load(EMBEDDINGS_FILE)
+def compute_graph(operations: list, embeddings: np.ndarray, threshold: float = THRESHOLD,
+                  topk: int | None = None, block_size: int = BLOCK_SIZE,
+                  ann_index: Path | None = None, n_probe: int = N_PROBE) -> Graph:
+    """在内存中构建 CSR 依赖图"""
+    if ann_index:
+        # 近似近邻：只在探查到的倒排桶内打分
+        index = IVFIndex.load(ann_index)
+        if len(index) != len(embeddings):
+            raise ValueError(f"索引向量数 {len(index)} 与 embedding 数 {len(embeddings)} 不一致")
+        neighbors = index.all_neighbors(topk, threshold, n_probe)
+    # 分块矩阵乘 + 向量化筛选，峰值内存随 block_size 而非 N² 增长
+    elif topk:
+        neighbors = topk_neighbors(embeddings, topk, threshold, block_size)
+    else:
+        neighbors = threshold_neighbors(embeddings, threshold, block_size)
+    return Graph.from_neighbors(neighbors, [op["operationId"] for op in operations])
+
+def compute_dependencies(operations: list, embeddings: np.ndarray, threshold: float = THRESHOLD,
+                         topk: int | None = None, block_size: int = BLOCK_SIZE,
+                         ann_index: Path | None = None, n_probe: int = N_PROBE) -> dict:
+    """在内存中构建依赖图：operationId → [{operationId, score}]"""
+    return compute_graph(operations, embeddings, threshold, topk, block_size,
+                         ann_index, n_probe).to_dependencies()
 
-    sim_matrix = cosine_similarity(embeddings)
-    dependencies = {}
+def build_dependencies(embeddings_file: Path = EMBEDDINGS_FILE, output_file: Path = OUTPUT_FILE,
+                       threshold: float = THRESHOLD, topk: int | None = None,
+                       block_size: int = BLOCK_SIZE, ann_index: Path | None = None,
+                       n_probe: int = N_PROBE, score_dtype: str = "float32"):
+    with stage("load"):
+        with open(OPERATIONS_FILE, "r", encoding="utf-8") as f:
+            operations = json.load(f)
+        embeddings = open_embeddings(embeddings_file)
 
-    for i, op in enumerate(operations):
-        related = []
-        for j, score in enumerate(sim_matrix[i]):
-            if i != j and score >= THRESHOLD:
-                related.append({
-                    "operationId": operations[j]["operationId"],
-                    "score": float(score)
-                })
-        dependencies[op["operationId"]] = related
+    with stage("compute_graph"):
+        graph = compute_graph(operations, embeddings, threshold, topk, block_size, ann_index, n_probe)
+    count("operations", len(operations))
+    count("edges", graph.n_edges)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(dependencies, f, indent=2)
+    # .npz 输出 CSR 图（可内存映射），否则输出 JSON
+    with stage("save"):
+        if output_file.suffix == ".npz":
+            graph.save(output_file, score_dtype)
+        else:
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(graph.to_dependencies(), f, indent=2)
 
     print(f"✅ Built dependencies for {len(operations)} operations")
 
 if __name__ == "__main__":
-    build_dependencies()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emb", type=Path, default=EMBEDDINGS_FILE, help="embedding 文件（float32 / float16 / int8，内存映射读取）")
+    parser.add_argument("--out", type=Path, default=OUTPUT_FILE, help="输出依赖图（.json 或 .npz）")
+    parser.add_argument("--thresh", type=float, default=THRESHOLD, help="相似度阈值")
+    parser.add_argument("--topk", type=int, default=None, help="每个 operation 最多保留的邻居数")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="分块计算的行数")
+    parser.add_argument("--ann", type=Path, default=None, help="使用 ann_index.py 构建的近似索引")
+    parser.add_argument("--n-probe", type=int, default=N_PROBE, help="近似搜索探查的桶数")
+    parser.add_argument("--score-dtype", choices=["float32", "float16"], default="float32",
+                        help=".npz 输出中相似度的存储精度")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("build_dependencies", args):
+        build_dependencies(args.emb, args.out, args.thresh, args.topk, args.block_size,
+                           args.ann, args.n_probe, args.score_dtype)
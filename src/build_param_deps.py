@@ -1,54 +1,231 @@
 import json
+import argparse
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from pathlib import Path
 
+import instrumentation
+from ann_index import IVFIndex, N_PROBE
+from instrumentation import count, stage
+from neighbors import iter_threshold_pairs, BLOCK_SIZE
+from quantized import open_embeddings, quantized_path
+
 PARAM_META_FILE = Path("outputs/param_description_embeddings.json")
 EMBEDDING_FILE = Path("outputs/param_description_embeddings.npy")
+# embed_parameter_descriptions.py --dedup 的输出
+UNIQUE_EMBEDDING_FILE = Path("outputs/param_description_unique_embeddings.npy")
+INDEX_FILE = Path("outputs/param_description_index.npy")
 OUTPUT_FILE = Path("outputs/interface_parameter_dependencies.json")
+# 紧凑格式：边只记录 meta 行号 (i, j, score)
+OUTPUT_JSONL = Path("outputs/interface_parameter_dependencies.jsonl")
+OUTPUT_NPZ = Path("outputs/interface_parameter_dependencies.npz")
 
 SIMILARITY_THRESHOLD = 0.75
 
-def main():
-    # 加载参数描述和embedding
-    with open(PARAM_META_FILE, "r", encoding="utf-8") as f:
-        meta = json.load(f)
+def load_embeddings(dedup: bool, emb_dtype: str = "float32"):
+    """返回 (向量矩阵, 每条 meta 对应的向量下标)；非去重模式下标即行号
+
+    emb_dtype 为 float16 / int8 时读取 quantized.py 生成的量化文件，均以内存映射方式打开。
+    """
+    path = UNIQUE_EMBEDDING_FILE if dedup else EMBEDDING_FILE
+    if emb_dtype != "float32":
+        path = quantized_path(path, emb_dtype)
+    embeddings = open_embeddings(path)
+    if dedup:
+        return embeddings, np.load(INDEX_FILE)
+    return embeddings, np.arange(len(embeddings), dtype=np.int32)
+
+def iter_vector_pairs(vectors: np.ndarray, block_size: int = BLOCK_SIZE,
+                      ann_index: Path | None = None, n_probe: int = N_PROBE):
+    """产出向量间相似度达到阈值的 (u, v, score)，u <= v（u == v 表示描述完全相同）"""
+    if not ann_index:
+        yield from iter_threshold_pairs(vectors, SIMILARITY_THRESHOLD, block_size, include_self=True)
+        return
+
+    # 近似近邻：每个向量只与探查到的倒排桶内向量比较
+    ann = IVFIndex.load(ann_index)
+    if len(ann) != len(vectors):
+        raise ValueError(f"索引向量数 {len(ann)} 与 embedding 数 {len(vectors)} 不一致")
+    # 自身对与精确路径一致：用真实的自相似度按阈值过滤（零向量为 0，不产出）
+    self_scores = np.einsum("ij,ij->i", ann.vectors, ann.vectors)
+    # 两个方向都探查到的对由索引去重，按 block_size 个查询向量攒成一块产出
+    block = []
+    pairs = ann.iter_threshold_pairs(SIMILARITY_THRESHOLD, n_probe)
+    for u, (us, vs, scores) in enumerate(pairs):
+        self_pair = [u] if self_scores[u] >= SIMILARITY_THRESHOLD else []
+        block.append((np.concatenate([self_pair, us]).astype(np.int64),
+                      np.concatenate([self_pair, vs]).astype(np.int64),
+                      np.concatenate([self_scores[self_pair], scores]).astype(np.float32)))
+        if len(block) == block_size or u == len(vectors) - 1:
+            yield tuple(np.concatenate(part) for part in zip(*block))
+            block = []
+
+def group_rows(index: np.ndarray, n_vectors: int):
+    """按向量下标把 meta 行分组：第 u 组为 order[offsets[u]:offsets[u] + counts[u]]"""
+    order = np.argsort(index, kind="stable")
+    counts = np.bincount(index, minlength=n_vectors)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return order, counts, offsets
+
+def expand_pairs(u, v, scores, groups, op_codes):
+    """把向量对展开为 meta 行对 (i, j, score)，i < j，并去掉同一接口内的参数对"""
+    order, counts, offsets = groups
+    per_pair = counts[u] * counts[v]
+    pair_id = np.repeat(np.arange(len(u)), per_pair)
+    k = np.arange(len(pair_id)) - np.repeat(np.cumsum(per_pair) - per_pair, per_pair)
+    cv = counts[v][pair_id]
+    i = order[offsets[u][pair_id] + k // cv]
+    j = order[offsets[v][pair_id] + k % cv]
+    s = scores[pair_id]
+
+    # u == v 时两个方向都会出现，只保留 i < j；u < v 时行号互不相交，交换成 i < j
+    same = u[pair_id] == v[pair_id]
+    keep = ~same | (i < j)
+    i, j, s = i[keep], j[keep], s[keep]
+    i, j = np.minimum(i, j), np.maximum(i, j)
+
+    keep = op_codes[i] != op_codes[j]
+    return i[keep], j[keep], s[keep]
+
+def iter_edges(meta, dedup: bool = False, block_size: int = BLOCK_SIZE,
+               ann_index: Path | None = None, n_probe: int = N_PROBE, emb_dtype: str = "float32"):
+    """分块产出参数依赖边 (i, j, score)，i/j 为 meta 行号"""
+    vectors, index = load_embeddings(dedup, emb_dtype)
+    yield from iter_vector_edges(meta, vectors, index, block_size, ann_index, n_probe)
+
+def iter_vector_edges(meta, vectors: np.ndarray, index: np.ndarray, block_size: int = BLOCK_SIZE,
+                      ann_index: Path | None = None, n_probe: int = N_PROBE):
+    """同 iter_edges，向量矩阵与 meta → 向量下标直接由调用方传入"""
+    groups = group_rows(np.asarray(index, dtype=np.int64), len(vectors))
+    _, op_codes = np.unique([m["operationId"] for m in meta], return_inverse=True)
+
+    for u, v, s in iter_vector_pairs(vectors, block_size, ann_index, n_probe):
+        yield expand_pairs(u, v, s, groups, op_codes)
 
-    embeddings = np.load(EMBEDDING_FILE)
-    sim_matrix = cosine_similarity(embeddings)
+def topk_filter(edges, n_rows: int, k: int):
+    """每个参数只保留相似度最高的 k 条边（两端任一保留即输出），内存为 O(n_rows × k)"""
+    best_rows = np.zeros(0, dtype=np.int64)
+    best_cols = np.zeros(0, dtype=np.int64)
+    best_scores = np.zeros(0, dtype=np.float32)
+    for i, j, s in edges:
+        rows = np.concatenate([best_rows, i, j])
+        cols = np.concatenate([best_cols, j, i])
+        scores = np.concatenate([best_scores, s, s])
+        order = np.lexsort((-scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        # 组内排名 < k 的保留
+        starts = np.searchsorted(rows, rows, side="left")
+        keep = np.arange(len(rows)) - starts < k
+        best_rows, best_cols, best_scores = rows[keep], cols[keep], scores[keep]
+
+    i, j = np.minimum(best_rows, best_cols), np.maximum(best_rows, best_cols)
+    _, first = np.unique(i * n_rows + j, return_index=True)
+    yield i[first], j[first], best_scores[first]
+
+def write_jsonl(edges, output_file: Path) -> int:
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        for i, j, s in edges:
+            for a, b, score in zip(i.tolist(), j.tolist(), s.tolist()):
+                f.write(f'{{"from": {a}, "to": {b}, "score": {score}}}\n')
+            count += len(i)
+    return count
+
+def write_npz(edges, output_file: Path, n_rows: int) -> int:
+    # 先逐块追加到临时二进制文件，最后再以 memmap 读回写入 npz
+    tmp = {name: output_file.with_suffix(f".{name}.tmp") for name in ("rows", "cols", "scores")}
+    files = {name: open(path, "wb") for name, path in tmp.items()}
+    try:
+        for i, j, s in edges:
+            files["rows"].write(i.astype(np.int32).tobytes())
+            files["cols"].write(j.astype(np.int32).tobytes())
+            files["scores"].write(s.astype(np.float32).tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    def read(name, dtype):
+        if tmp[name].stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(tmp[name], dtype=dtype, mode="r")
+
+    arrays = {"rows": read("rows", np.int32), "cols": read("cols", np.int32),
+              "scores": read("scores", np.float32)}
+    np.savez(output_file, shape=np.array([n_rows, n_rows]), **arrays)
+    count = len(arrays["rows"])
+    del arrays
+    for path in tmp.values():
+        path.unlink()
+    return count
+
+def write_json(edges, output_file: Path, meta) -> int:
+    """原始格式：完整描述 + 按相似度降序（需要全部边在内存中排序）"""
+    pairs = [(score, a, b) for i, j, s in edges for a, b, score in zip(i.tolist(), j.tolist(), s.tolist())]
+    # 按相似度排序（同分按行号，保持与逐对遍历一致的顺序）
+    pairs.sort(key=lambda x: (-x[0], x[1], x[2]))
 
     results = []
+    for score, i, j in pairs:
+        m1, m2 = meta[i], meta[j]
+        results.append({
+            "from_operationId": m1["operationId"],
+            "from_param_name": m1["param_name"],
+            "from_param_in": m1["param_in"],
+            "from_description": m1["description"],
+
+            "to_operationId": m2["operationId"],
+            "to_param_name": m2["param_name"],
+            "to_param_in": m2["param_in"],
+            "to_description": m2["description"],
 
-    for i, m1 in enumerate(meta):
-        for j, m2 in enumerate(meta):
-            if i >= j:
-                continue  # 避免重复对
-            score = float(sim_matrix[i][j])
-            if score >= SIMILARITY_THRESHOLD:
-                if m1["operationId"] == m2["operationId"]:
-                  continue
-                results.append({
-                    "from_operationId": m1["operationId"],
-                    "from_param_name": m1["param_name"],
-                    "from_param_in": m1["param_in"],
-                    "from_description": m1["description"],
-
-                    "to_operationId": m2["operationId"],
-                    "to_param_name": m2["param_name"],
-                    "to_param_in": m2["param_in"],
-                    "to_description": m2["description"],
-
-                    "similarity_score": score
-                })
-
-    # 按相似度排序
-    results = sorted(results, key=lambda x: x["similarity_score"], reverse=True)
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+            "similarity_score": score
+        })
+
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
+    return len(results)
+
+def main(dedup: bool = False, ann_index: Path | None = None, n_probe: int = N_PROBE,
+         output_format: str = "jsonl", topk: int | None = None, block_size: int = BLOCK_SIZE,
+         emb_dtype: str = "float32"):
+    # 加载参数描述和embedding
+    with open(PARAM_META_FILE, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    edges = iter_edges(meta, dedup, block_size, ann_index, n_probe, emb_dtype)
+    if topk:
+        edges = topk_filter(edges, len(meta), topk)
+
+    # 边是流式产出的，计算与写出在同一个阶段内
+    with stage("edges"):
+        if output_format == "json":
+            output_file = OUTPUT_FILE
+            n_edges = write_json(edges, output_file, meta)
+        elif output_format == "npz":
+            output_file = OUTPUT_NPZ
+            n_edges = write_npz(edges, output_file, len(meta))
+        else:
+            output_file = OUTPUT_JSONL
+            n_edges = write_jsonl(edges, output_file)
+    count("parameters", len(meta))
+    count("edges", n_edges)
 
-    print(f"✅ 接口参数依赖分析完成，共 {len(results)} 条依赖关系")
-    print(f"📁 结果保存在: {OUTPUT_FILE}")
+    print(f"✅ 接口参数依赖分析完成，共 {n_edges} 条依赖关系")
+    print(f"📁 结果保存在: {output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dedup", action="store_true", help="读取去重后的唯一向量矩阵 + 下标数组")
+    parser.add_argument("--ann", type=Path, default=None, help="使用 ann_index.py 对参数向量构建的近似索引")
+    parser.add_argument("--n-probe", type=int, default=N_PROBE, help="近似搜索探查的桶数")
+    parser.add_argument("--format", choices=["jsonl", "npz", "json"], default="jsonl",
+                        help="jsonl/npz 为按 meta 行号记录的紧凑格式，json 为原始完整格式")
+    parser.add_argument("--topk", type=int, default=None, help="每个参数最多保留的依赖边数")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="分块计算的行数")
+    parser.add_argument("--emb-dtype", choices=["float32", "float16", "int8"], default="float32",
+                        help="读取的向量存储精度（float16 / int8 需先用 quantized.py 生成）")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("build_param_deps", args):
+        main(dedup=args.dedup, ann_index=args.ann, n_probe=args.n_probe,
+             output_format=args.format, topk=args.topk, block_size=args.block_size,
+             emb_dtype=args.emb_dtype)
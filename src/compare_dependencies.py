@@ -1,20 +1,21 @@
-import json
 import numpy as np
 from pathlib import Path
 from collections import Counter
 
+from graph import as_graph, load_graph
+
 def load_dep(file: Path):
-    with open(file, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """读取依赖图（.json 或 CSR .npz）"""
+    return load_graph(file)
 
 def stats(name, dep):
-    neigh = [len(v) for v in dep.values()]
+    neigh = as_graph(dep).degree()
     return {
         "model": name,
         "avg_neighbors": np.mean(neigh),
         "median_neighbors": np.median(neigh),
-        "total_edges": sum(neigh),
-        "isolates": sum(1 for n in neigh if n == 0),
+        "total_edges": int(neigh.sum()),
+        "isolates": int((neigh == 0).sum()),
     }
 
 def main():
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import instrumentation
+from model_registry import list_models, is_sentence_transformer
+
+OPS_FILE = Path("outputs/operations.json")
+OUT_FILE = Path("outputs/compare_models_result.txt")
+OUT_JSON = Path("outputs/compare_models_result.json")
+
+THRESHOLD = 0.75
+CURVE = (0.60, 0.96, 0.01)   # 阈值曲线的 start / stop / step
+
+
+def embed_with_model(texts: list[str], model_name: str, num_threads: int | None = None) -> np.ndarray:
+    """按模型类型选择编码方式，结果都经过 embedding 缓存"""
+    if is_sentence_transformer(model_name):
+        import torch
+        from embedding_cache import cached_embed
+        from model_registry import get_sentence_transformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        model = get_sentence_transformer(model_name)
+        return cached_embed(texts, lambda batch: model.encode(batch, show_progress_bar=False),
+                            model_name, "mean")
+
+    from embedding_engine import embed_texts
+    return embed_texts(texts, model_name, num_threads=num_threads)
+
+
+def evaluate_model(model_name: str, operations: list, threshold: float = THRESHOLD,
+                   num_threads: int | None = None) -> dict:
+    """对单个模型：编码 → 依赖图 → 邻居统计 / 纯度 / 阈值曲线"""
+    from build_dependencies import compute_dependencies
+    from compare_dependencies import stats
+    from tag_purity import purity_of
+    from threshold_sweep import sweep
+
+    start = time.perf_counter()
+    embeddings = embed_with_model([op["full_text"] for op in operations], model_name, num_threads)
+    embed_sec = time.perf_counter() - start
+
+    dependencies = compute_dependencies(operations, embeddings, threshold)
+    result = stats(model_name, dependencies)
+    result = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in result.items()}
+    result.update({
+        "dim": int(embeddings.shape[1]),
+        "purity": float(purity_of(dependencies, operations)),
+        "embed_sec": embed_sec,
+        "curve": sweep(embeddings, operations, np.arange(*CURVE)),
+    })
+    print(f"✅ {model_name} 完成（编码耗时 {embed_sec:.1f}s）")
+    return result
+
+
+def _worker(args):
+    model_name, operations, threshold, num_threads = args
+    return evaluate_model(model_name, operations, threshold, num_threads)
+
+
+def compare_models(models: list[str], operations: list, threshold: float = THRESHOLD,
+                   workers: int | None = None) -> list[dict]:
+    """多个模型并行评估；workers=1 时在当前进程内依次运行（共享已加载的模型）"""
+    cpus = os.cpu_count() or 1
+    workers = min(workers or len(models), len(models), cpus)
+    if workers <= 1:
+        return [evaluate_model(m, operations, threshold) for m in models]
+
+    # 每个进程分到的 torch 线程数，避免进程间线程超额订阅
+    threads = max(cpus // workers, 1)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return list(pool.map(_worker, [(m, operations, threshold, threads) for m in models]))
+
+
+def format_table(results: list[dict]) -> str:
+    lines = ["{:<24} {:>5} {:>8} {:>8} {:>8} {:>8} {:>8} {:>9}".format(
+        "模型", "dim", "avg_n", "med_n", "edges", "isolates", "purity", "embed_s")]
+    for r in results:
+        lines.append("{model:<24} {dim:5d} {avg_neighbors:8.2f} {median_neighbors:8.0f} "
+                     "{total_edges:8.0f} {isolates:8.0f} {purity:8.3f} {embed_sec:9.1f}".format(**r))
+
+    # 阈值曲线：每个模型一列纯度 / 边数
+    lines.append("")
+    lines.append("thresh " + " ".join(f"{r['model'][:16] + ':purity/edges':>28}" for r in results))
+    for row in zip(*[r["curve"] for r in results]):
+        lines.append(f"{row[0]['thresh']:.2f}   " + " ".join(
+            f"{p['purity']:>20.3f}/{p['edges']:<7d}" for p in row))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("models", nargs="*", help="models/ 下的模型目录，默认全部")
+    parser.add_argument("--thresh", type=float, default=THRESHOLD, help="依赖图相似度阈值")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，1 表示顺序执行")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    models = args.models or list_models()
+    with open(OPS_FILE, "r", encoding="utf-8") as f:
+        operations = json.load(f)
+
+    with instrumentation.run_from_args("compare_models", args):
+        results = compare_models(models, operations, args.thresh, args.workers)
+    table = format_table(results)
+    print(table)
+
+    with open(OUT_FILE, "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+    with open(OUT_JSON, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"✅ 结果已保存至：{OUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,36 @@
 import json
+import argparse
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+
+from embedding_cache import cached_embed
+from model_registry import get_sentence_transformer, MINILM
 
 INPUT_FILE = Path("outputs/operations.json")
 OUTPUT_FILE = Path("outputs/embeddings.npy")
 
-model = SentenceTransformer("models/all-MiniLM-L6-v2")
+MODEL_NAME = MINILM
+POOLING = "mean"   # MiniLM 的 SentenceTransformer 池化方式，参与缓存 key 计算
+
+def encode(texts):
+    model = get_sentence_transformer(MODEL_NAME)
+    return model.encode(texts, show_progress_bar=True)
 
-def embed_operations():
+def embed_operations(use_cache=True):
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         operations = json.load(f)
 
     texts = [op["full_text"] for op in operations]
-    embeddings = model.encode(texts, show_progress_bar=True)
+    if use_cache:
+        embeddings = cached_embed(texts, encode, MODEL_NAME, POOLING)
+    else:
+        embeddings = encode(texts)
 
     np.save(OUTPUT_FILE, embeddings)
     print(f"✅ Saved embeddings shape: {embeddings.shape}")
 
 if __name__ == "__main__":
-    embed_operations()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="忽略 embedding 缓存，全部重新编码")
+    args = parser.parse_args()
+    embed_operations(use_cache=not args.no_cache)
\ No newline at end of file
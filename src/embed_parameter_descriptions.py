@@ -1,25 +1,34 @@
 import json
+import argparse
 import numpy as np
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModel
-import torch
 
-MODEL_PATH = "models/Qwen3-Embedding-06B"
+import instrumentation
+from embedding_engine import embed_texts, POOLING_CHOICES, WORKERS, BACKEND
+from model_registry import QWEN3
+
+MODEL_NAME = QWEN3
 INPUT_FILE = Path("outputs/operation_parameters.json")
 OUTPUT_EMBEDDING = Path("outputs/param_description_embeddings.npy")
 OUTPUT_META = Path("outputs/param_description_embeddings.json")
+# 去重模式：唯一描述的向量矩阵 + 每条 meta 对应的向量下标
+OUTPUT_UNIQUE_EMBEDDING = Path("outputs/param_description_unique_embeddings.npy")
+OUTPUT_INDEX = Path("outputs/param_description_index.npy")
 
-@torch.inference_mode()
-def get_embedding(texts):
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, trust_remote_code=True)
-    model = AutoModel.from_pretrained(MODEL_PATH, trust_remote_code=True)
-    model.eval()
+def get_embedding(texts, use_cache=True, pooling=None, workers=WORKERS, backend=BACKEND):
+    # 与 embed_qwen3 共用同一个常驻模型和 embedding 缓存
+    return embed_texts(texts, MODEL_NAME, use_cache=use_cache, pooling=pooling, workers=workers,
+                       backend=backend)
 
-    inputs = tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
-    outputs = model(**inputs)
-    return outputs.last_hidden_state.mean(dim=1).cpu().numpy()
+def dedup_texts(texts):
+    """按首次出现顺序去重，返回 (唯一文本列表, 每条文本对应的唯一下标 int32)"""
+    unique_ids = {}
+    index = np.empty(len(texts), dtype=np.int32)
+    for i, text in enumerate(texts):
+        index[i] = unique_ids.setdefault(text, len(unique_ids))
+    return list(unique_ids), index
 
-def embed_descriptions():
+def embed_descriptions(use_cache=True, dedup=False, pooling=None, workers=WORKERS, backend=BACKEND):
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         operations = json.load(f)
 
@@ -38,14 +47,35 @@ def embed_descriptions():
                 "description": desc
             })
 
-    print(f"🧠 正在对 {len(texts)} 个参数描述生成 embedding...")
-    embeddings = get_embedding(texts)
+    if dedup:
+        unique_texts, index = dedup_texts(texts)
+        print(f"🧠 {len(texts)} 个参数描述去重后剩 {len(unique_texts)} 个，正在生成 embedding...")
+        embeddings = get_embedding(unique_texts, use_cache=use_cache, pooling=pooling, workers=workers,
+                                   backend=backend)
+        np.save(OUTPUT_UNIQUE_EMBEDDING, embeddings)
+        np.save(OUTPUT_INDEX, index)
+    else:
+        print(f"🧠 正在对 {len(texts)} 个参数描述生成 embedding...")
+        embeddings = get_embedding(texts, use_cache=use_cache, pooling=pooling, workers=workers,
+                                   backend=backend)
+        np.save(OUTPUT_EMBEDDING, embeddings)
 
-    np.save(OUTPUT_EMBEDDING, embeddings)
     with open(OUTPUT_META, "w", encoding="utf-8") as f:
         json.dump(meta_info, f, ensure_ascii=False, indent=2)
 
     print(f"✅ 完成！embedding 形状: {embeddings.shape}")
 
 if __name__ == "__main__":
-    embed_descriptions()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="忽略 embedding 缓存，全部重新编码")
+    parser.add_argument("--dedup", action="store_true", help="相同描述只编码一次，输出唯一向量矩阵 + 下标数组")
+    parser.add_argument("--pooling", choices=POOLING_CHOICES, default=None,
+                        help="池化方式，默认 mean；auto 按模型的 1_Pooling 配置。已有向量由旧版 padding 平均生成，换用任一方式都需重新生成")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="编码进程数，每个进程加载一份模型")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default=BACKEND,
+                        help="推理后端（onnx 需先运行 onnx_backend.py 导出）")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("embed_parameter_descriptions", args):
+        embed_descriptions(use_cache=not args.no_cache, dedup=args.dedup, pooling=args.pooling,
+                           workers=args.workers, backend=args.backend)
\ No newline at end of file
@@ -1,40 +1,58 @@
 import json
+import argparse
 import numpy as np
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModel
-import torch
 
-MODEL_PATH = Path("models/Qwen3-Embedding-06B")
+import instrumentation
+from embedding_engine import embed_texts, POOLING_CHOICES, TOKEN_BUDGET, NUM_THREADS, WORKERS, BACKEND
+from model_registry import QWEN3
+
+MODEL_NAME = QWEN3
 INPUT_FILE = Path("outputs/operations.json")
 OUTPUT_FILE = Path("outputs/embeddings_qwen3.npy")
 
-@torch.inference_mode()
-def get_embedding(texts: list[str]) -> np.ndarray:
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, trust_remote_code=True)
-    model = AutoModel.from_pretrained(MODEL_PATH, trust_remote_code=True)
-    model.eval()
-
-    inputs = tokenizer(
-        texts,
-        padding=True,
-        truncation=True,
-        max_length=512,
-        return_tensors="pt"
-    )
-    outputs = model(**inputs)
-    # 平均池化（Qwen3 默认无池化头）
-    embeddings = outputs.last_hidden_state.mean(dim=1)
-    return embeddings.cpu().numpy()
+def get_embedding(texts: list[str], token_budget: int = TOKEN_BUDGET,
+                  num_threads: int | None = NUM_THREADS, use_cache: bool = True,
+                  pooling: str | None = None, workers: int = WORKERS,
+                  backend: str = BACKEND) -> np.ndarray:
+    # 模型常驻内存，按长度分桶批量推理；已缓存的文本不再编码
+    return embed_texts(texts, MODEL_NAME, token_budget=token_budget, num_threads=num_threads,
+                       use_cache=use_cache, pooling=pooling, workers=workers, backend=backend)
 
-def embed_operations():
+def embed_operations(token_budget: int = TOKEN_BUDGET, num_threads: int | None = NUM_THREADS,
+                     use_cache: bool = True, pooling: str | None = None, workers: int = WORKERS,
+                     backend: str = BACKEND):
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         operations = json.load(f)
 
     texts = [op["full_text"] for op in operations]
-    embeddings = get_embedding(texts)
+    embeddings = get_embedding(texts, token_budget=token_budget, num_threads=num_threads,
+                               use_cache=use_cache, pooling=pooling, workers=workers, backend=backend)
 
     np.save(OUTPUT_FILE, embeddings)
     print(f"✅ Qwen3-Embedding 生成完成，形状：{embeddings.shape}")
 
 if __name__ == "__main__":
-    embed_operations()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET, help="每个 batch 的 token 上限")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS,
+                        help="torch CPU 线程数（多进程时为每个进程的线程数，默认均分 CPU）")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="编码进程数，每个进程加载一份模型")
+    parser.add_argument("--no-cache", action="store_true", help="忽略 embedding 缓存，全部重新编码")
+    parser.add_argument("--with-params", action="store_true", help="复用已加载的模型，同时生成参数描述 embedding")
+    parser.add_argument("--pooling", choices=POOLING_CHOICES, default=None,
+                        help="池化方式，默认 mean；auto 按模型的 1_Pooling 配置。已有向量由旧版 padding 平均生成，换用任一方式都需重新生成")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default=BACKEND,
+                        help="推理后端（onnx 需先运行 onnx_backend.py 导出）")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("embed_qwen3", args):
+        with instrumentation.stage("operations"):
+            embed_operations(token_budget=args.token_budget, num_threads=args.threads,
+                             use_cache=not args.no_cache, pooling=args.pooling, workers=args.workers,
+                             backend=args.backend)
+        if args.with_params:
+            from embed_parameter_descriptions import embed_descriptions
+            with instrumentation.stage("parameters"):
+                embed_descriptions(use_cache=not args.no_cache, pooling=args.pooling, workers=args.workers,
+                                   backend=args.backend)
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import numpy as np
+from pathlib import Path
+
+from instrumentation import count
+
+CACHE_DIR = Path("outputs/embedding_cache")
+MAX_CACHE_BYTES = 1 << 30    # 单个模型向量文件上限 1GB，超出后按最近使用淘汰
+EVICT_RATIO = 0.8            # 淘汰后保留到上限的 80%，避免频繁压缩
+
+
+def cache_key(model_id: str, pooling: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{pooling}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """内容寻址的 embedding 缓存：vectors.f32 为内存映射的向量矩阵，index.json 记录 key → 行号"""
+
+    def __init__(self, model_id: str, pooling: str, cache_dir: Path = CACHE_DIR,
+                 max_bytes: int = MAX_CACHE_BYTES):
+        self.model_id = model_id
+        self.pooling = pooling
+        self.max_bytes = max_bytes
+        self.dir = Path(cache_dir) / Path(model_id).name
+        self.vector_file = self.dir / "vectors.f32"
+        self.index_file = self.dir / "index.json"
+
+        self.dim = None
+        self.clock = 0
+        self.entries = {}    # key → [行号, 最近使用时间]
+        if self.index_file.exists():
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.dim = index["dim"]
+            self.clock = index["clock"]
+            self.entries = index["entries"]
+        self._vectors = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _rows(self) -> int:
+        if self.dim is None or not self.vector_file.exists():
+            return 0
+        return self.vector_file.stat().st_size // (4 * self.dim)
+
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            rows = self._rows()
+            if rows == 0:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._vectors = np.memmap(self.vector_file, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def get(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """返回命中的 key → 向量，并刷新其最近使用时间"""
+        self.clock += 1
+        hits = {}
+        vectors = self.vectors()
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[1] = self.clock
+                hits[key] = vectors[entry[0]]
+        return hits
+
+    def put(self, keys: list[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度不一致: 缓存 {self.dim}，输入 {vectors.shape[1]}")
+
+        self.clock += 1
+        start = self._rows()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._vectors = None
+        with open(self.vector_file, "ab") as f:
+            f.write(vectors.tobytes())
+        for offset, key in enumerate(keys):
+            self.entries[key] = [start + offset, self.clock]
+        self._evict()
+
+    def _evict(self) -> None:
+        """向量文件超过上限时，按最近使用保留条目并压缩文件（同时清理被覆盖的旧行）"""
+        row_bytes = 4 * self.dim
+        if self._rows() * row_bytes <= self.max_bytes:
+            return
+        keep = max(int(self.max_bytes * EVICT_RATIO) // row_bytes, 1)
+        kept = sorted(self.entries.items(), key=lambda kv: kv[1][1], reverse=True)[:keep]
+        kept.sort(key=lambda kv: kv[1][0])
+
+        old = np.memmap(self.vector_file, dtype=np.float32, mode="r", shape=(self._rows(), self.dim))
+        tmp_file = self.vector_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(np.ascontiguousarray(old[[entry[0] for _, entry in kept]]).tobytes())
+        del old
+        os.replace(tmp_file, self.vector_file)
+
+        self.entries = {key: [row, entry[1]] for row, (key, entry) in enumerate(kept)}
+        self._vectors = None
+        print(f"🧹 缓存超过 {self.max_bytes} 字节，保留最近使用的 {len(self.entries)} 条")
+
+    def save(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"model_id": self.model_id, "pooling": self.pooling, "dim": self.dim,
+                       "clock": self.clock, "entries": self.entries}, f)
+        os.replace(tmp_file, self.index_file)
+
+
+def cached_embed(texts: list[str], embed_fn, model_id: str, pooling: str,
+                 cache_dir: Path = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES) -> np.ndarray:
+    """只把缓存中没有的文本交给 embed_fn 编码，结果按输入顺序返回"""
+    cache = EmbeddingCache(model_id, pooling, cache_dir, max_bytes)
+    keys = [cache_key(model_id, pooling, text) for text in texts]
+    hits = cache.get(keys)
+
+    # 未命中的文本去重后统一编码
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in hits and key not in missing:
+            missing[key] = text
+    n_hits = len(texts) - sum(1 for k in keys if k not in hits)
+    count("cache_hits", n_hits)
+    count("cache_misses", len(texts) - n_hits)
+    print(f"💾 缓存命中 {n_hits}/{len(texts)}，需编码 {len(missing)} 条")
+
+    new_vectors = {}
+    if missing:
+        vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+        new_vectors = dict(zip(missing.keys(), vectors))
+
+    dim = vectors.shape[1] if missing else cache.dim
+    result = np.empty((len(texts), dim or 0), dtype=np.float32)
+    for i, key in enumerate(keys):
+        result[i] = hits[key] if key in hits else new_vectors[key]
+
+    if missing:
+        cache.put(list(new_vectors.keys()), np.stack(list(new_vectors.values())))
+    cache.save()
+    return result
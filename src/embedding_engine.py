@@ -0,0 +1,250 @@
+import json
+import os
+import atexit
+import time
+import tempfile
+import multiprocessing
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from embedding_cache import cached_embed
+from instrumentation import count
+from model_registry import get_encoder, model_path, resolve_pooling, QWEN3
+
+MAX_LENGTH = 512
+TOKEN_BUDGET = 8192   # 单个 batch 的 token 上限（batch 大小 × 该 batch 最长序列）
+NUM_THREADS = None    # None 表示沿用 torch 默认线程数
+WORKERS = 1           # 编码进程数，>1 时每个进程各自加载一份模型（进程池常驻，模型只加载一次）
+BACKEND = "torch"     # torch / onnx / onnx-int8（onnx 需先用 onnx_backend.py 导出）
+
+
+def mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """按 attention mask 求平均，padding 不参与，结果与所在 batch 无关"""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+def last_token_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """取每条序列最后一个有效 token（Qwen3-Embedding 的原生池化），兼容左右两种 padding"""
+    if bool(attention_mask[:, -1].all()):
+        # 左 padding（或没有 padding）：最后一列就是各序列的末尾 token
+        return last_hidden_state[:, -1]
+    last = attention_mask.sum(dim=1) - 1
+    return last_hidden_state[torch.arange(len(last_hidden_state), device=last.device), last]
+
+
+def cls_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    return last_hidden_state[:, 0]
+
+
+POOLERS = {"mean": mean_pool, "lasttoken": last_token_pool, "cls": cls_pool}
+POOLING_CHOICES = list(POOLERS) + ["auto"]
+
+
+def query_prompt(model_name: str = QWEN3) -> str:
+    """读取 config_sentence_transformers.json 中的查询前缀（Qwen3 的 Instruct 提示），文档侧不加前缀"""
+    config_file = model_path(model_name) / "config_sentence_transformers.json"
+    if not config_file.exists():
+        return ""
+    with open(config_file, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return config.get("prompts", {}).get("query", "")
+
+
+def pooling_id(pooling: str) -> str:
+    """池化方式标识，参与缓存 key 计算（旧版未做 mask 的平均为 mean_padded，未追加 EOS 的 lasttoken 为 lasttoken_l2）"""
+    if pooling == "lasttoken":
+        return "lasttoken_eos_l2"
+    return f"{pooling}_l2"
+
+
+def length_buckets(lengths, token_budget: int = TOKEN_BUDGET) -> list[np.ndarray]:
+    """按 token 长度从长到短排序后切分 batch，使每个 batch 的 padding 后 token 数不超过预算"""
+    lengths = np.asarray(lengths)
+    order = np.argsort(-lengths, kind="stable")
+
+    batches = []
+    start = 0
+    while start < len(order):
+        # 降序排列，batch 内最长的就是第一个
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(token_budget // longest, 1)
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+@torch.inference_mode()
+def encode_batched(
+    texts: list[str],
+    tokenizer,
+    model,
+    token_budget: int = TOKEN_BUDGET,
+    max_length: int = MAX_LENGTH,
+    num_threads: int | None = NUM_THREADS,
+    pool=mean_pool,
+    normalize: bool = True,
+    verbose: bool = True,
+) -> np.ndarray:
+    """按长度分桶批量编码，结果按输入顺序返回（float32，默认 L2 归一化，余弦相似度即点积）"""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if not texts:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+
+    # 先只做分词不做 padding，拿到每条文本的真实长度
+    eos_id = tokenizer.pad_token_id if pool is last_token_pool else None
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_length - (eos_id is not None))
+    if eos_id is not None:
+        # Qwen3 的分词器不会自动追加 <|endoftext|>，lasttoken 需要取该 token 的隐状态（与官方参考实现一致）
+        for ids, mask in zip(encoded["input_ids"], encoded["attention_mask"]):
+            if not ids or ids[-1] != eos_id:
+                ids.append(eos_id)
+                mask.append(1)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    result = None
+    n_tokens = 0
+    start_time = time.perf_counter()
+    for batch_idx in length_buckets(lengths, token_budget):
+        features = tokenizer.pad(
+            {
+                "input_ids": [encoded["input_ids"][i] for i in batch_idx],
+                "attention_mask": [encoded["attention_mask"][i] for i in batch_idx],
+            },
+            padding=True,
+            return_tensors="pt",
+        )
+        outputs = model(**features)
+        emb = pool(outputs.last_hidden_state, features["attention_mask"]).float()
+        if normalize:
+            emb = F.normalize(emb, p=2, dim=1)
+        emb = emb.cpu().numpy()
+        if result is None:
+            result = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+        result[batch_idx] = emb
+        n_tokens += int(features["input_ids"].numel())
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    count("texts_embedded", len(texts))
+    count("tokens_processed", sum(lengths))
+    count("tokens_padded", n_tokens)
+    if verbose:
+        print(f"⚡ 编码 {len(texts)} 条文本，{n_tokens} tokens（含 padding），{len(texts) / elapsed:.1f} texts/s")
+    return result
+
+
+def _encode_shard(model_name: str, pooling: str, texts: list[str], indices: np.ndarray,
+                  out_file: str, shape: tuple, token_budget: int, num_threads: int,
+                  backend: str = BACKEND) -> int:
+    """工作进程：编码自己的分片，直接写入共享的内存映射输出数组的对应行"""
+    tokenizer, model = get_encoder(model_name, backend, num_threads)
+    emb = encode_batched(texts, tokenizer, model, token_budget=token_budget,
+                         num_threads=num_threads, pool=POOLERS[pooling])
+    out = np.memmap(out_file, dtype=np.float32, mode="r+", shape=shape)
+    out[indices] = emb
+    out.flush()
+    del out
+    return len(texts)
+
+
+_POOLS = {}   # 进程数 → 常驻进程池，工作进程里的模型由 model_registry 缓存
+
+
+def worker_pool(workers: int):
+    """常驻编码进程池：同样的进程数只创建一次，之后的调用复用已加载模型的工作进程"""
+    if workers not in _POOLS:
+        _POOLS[workers] = multiprocessing.get_context("spawn").Pool(workers)
+    return _POOLS[workers]
+
+
+@atexit.register
+def close_pools() -> None:
+    """关闭全部常驻进程池，释放工作进程里的模型"""
+    for pool in _POOLS.values():
+        pool.terminate()
+        pool.join()
+    _POOLS.clear()
+
+
+def encode_parallel(
+    texts: list[str],
+    model_name: str = QWEN3,
+    workers: int = 2,
+    pooling: str | None = None,
+    token_budget: int = TOKEN_BUDGET,
+    num_threads: int | None = NUM_THREADS,
+    backend: str = BACKEND,
+) -> np.ndarray:
+    """多进程编码：文本按长度交错分片，每个进程一份模型、一份线程预算，结果写入共享内存映射文件
+
+    进程间只传递文本和行号，向量不经过 pickle；进程池常驻（见 worker_pool），模型只在首次调用时加载。
+    """
+    pooling = resolve_pooling(pooling, model_name)
+    with open(model_path(model_name) / "config.json", "r", encoding="utf-8") as f:
+        hidden_size = json.load(f)["hidden_size"]
+    if not texts:
+        return np.zeros((0, hidden_size), dtype=np.float32)
+    shape = (len(texts), hidden_size)
+    workers = max(workers, 1)
+    num_threads = num_threads or max((os.cpu_count() or 1) // workers, 1)
+
+    # 按字符长度降序后轮流分配，各分片的计算量接近
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    shards = [order[w::workers] for w in range(min(workers, len(texts)))]
+
+    # 优先放在 /dev/shm（内存文件系统），不存在时退回系统临时目录
+    shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    fd, out_file = tempfile.mkstemp(suffix=".f32", dir=shm_dir)
+    os.close(fd)
+    try:
+        out = np.memmap(out_file, dtype=np.float32, mode="w+", shape=shape)
+        del out
+        start_time = time.perf_counter()
+        first = workers not in _POOLS
+        worker_pool(workers).starmap(_encode_shard, [
+            (model_name, pooling, [texts[i] for i in shard], shard, out_file, shape,
+             token_budget, num_threads, backend)
+            for shard in shards
+        ], chunksize=1)
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        # 子进程里的计数器不会回传，文本数在主进程记录
+        count("texts_embedded", len(texts))
+        load_note = "（含模型加载）" if first else ""
+        print(f"⚡ {workers} 个进程 × {num_threads} 线程，共 {len(texts) / elapsed:.1f} texts/s{load_note}")
+        return np.array(np.memmap(out_file, dtype=np.float32, mode="r", shape=shape))
+    finally:
+        os.unlink(out_file)
+
+
+def embed_texts(
+    texts: list[str],
+    model_name: str = QWEN3,
+    token_budget: int = TOKEN_BUDGET,
+    num_threads: int | None = NUM_THREADS,
+    use_cache: bool = True,
+    pooling: str | None = None,
+    workers: int = WORKERS,
+    backend: str = BACKEND,
+) -> np.ndarray:
+    """使用常驻模型编码文本（模型由 model_registry 统一加载），默认只编码缓存未命中的文本
+
+    pooling 为 None 时使用 DEFAULT_POOLING，auto 按模型的 1_Pooling 配置选择（Qwen3 为 lasttoken）；
+    workers > 1 时未命中的文本交给 encode_parallel 多进程编码；
+    backend 为 onnx / onnx-int8 时使用 onnxruntime 推理，缓存与 torch 结果分开存放。
+    """
+    pooling = resolve_pooling(pooling, model_name)
+
+    def encode(batch_texts):
+        if workers > 1 and len(batch_texts) > 1:
+            return encode_parallel(batch_texts, model_name, workers, pooling, token_budget,
+                                   num_threads, backend)
+        tokenizer, model = get_encoder(model_name, backend, num_threads)
+        return encode_batched(batch_texts, tokenizer, model, token_budget=token_budget,
+                              num_threads=num_threads, pool=POOLERS[pooling])
+
+    if not use_cache:
+        return encode(texts)
+    model_id = model_name if backend == "torch" else f"{model_name}@{backend}"
+    return cached_embed(texts, encode, model_id, pooling_id(pooling))
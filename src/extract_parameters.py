@@ -1,21 +1,20 @@
-import prance
-import json
+import argparse
 from pathlib import Path
 
+from parse_openapi import save_json_array
+from ref_resolver import SchemaResolver
+from spec_loader import load_spec
+
 INPUT_FILE = Path("data/openapi.yaml")
 OUTPUT_FILE = Path("outputs/operation_parameters.json")
 
-def extract_parameters():
-    # 让 prance 帮你把 $ref 全部解析成完整定义
-    parser = prance.ResolvingParser(str(INPUT_FILE), backend='openapi-spec-validator', strict=False)
-    spec = parser.specification   
-
-    result = []
-
-    for path, methods in spec.get("paths", {}).items():
+def iter_parameters(paths, resolver: SchemaResolver):
+    """逐个产出每个接口的路径 / 查询 / 请求体参数；paths 为 (path, path 条目) 序列"""
+    for path, methods in paths:
         for method, op in methods.items():
             if method.lower() not in {"get", "post", "put", "delete", "patch", "head"}:
                 continue
+            op = resolver.expand(op)
 
             operation_id = op.get("operationId")
             summary = op.get("summary", "")
@@ -48,20 +47,41 @@ def extract_parameters():
                                 "required": prop_name in schema.get("required", [])
                             })
 
-            result.append({
+            yield {
                 "operationId": operation_id,
                 "method": method.upper(),
                 "path": path,
                 "summary": summary,
                 "description": description,
                 "parameters": param_list
-            })
+            }
+
+def parameters_from_spec(spec: dict) -> list:
+    """从已加载的 spec 中提取每个接口的路径 / 查询 / 请求体参数"""
+    # 按需展开 $ref：每个被引用的组件只解析一次，多处引用共享同一份结果
+    resolver = SchemaResolver(spec)
+    result = list(iter_parameters(spec.get("paths", {}).items(), resolver))
+    if resolver.cycles:
+        print(f"⚠️  检测到循环引用，保留为 $ref: {sorted(resolver.cycles)}")
+    return result
 
-    OUTPUT_FILE.parent.mkdir(exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+def extract_parameters(input_file: Path = INPUT_FILE, stream: bool = False):
+    if stream:
+        # 逐个 path 解析、逐条写出，$ref 引用的组件按需从文件读取
+        from spec_stream import SpecStream
+        with SpecStream(input_file) as spec:
+            resolver = spec.resolver()
+            n = save_json_array(iter_parameters(spec.paths(), resolver), OUTPUT_FILE)
+        if resolver.cycles:
+            print(f"⚠️  检测到循环引用，保留为 $ref: {sorted(resolver.cycles)}")
+    else:
+        n = save_json_array(parameters_from_spec(load_spec(input_file)), OUTPUT_FILE)
 
-    print(f"✅ 提取完成，共 {len(result)} 个接口，参数保存在 {OUTPUT_FILE}")
+    print(f"✅ 提取完成，共 {n} 个接口，参数保存在 {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    extract_parameters()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spec", type=Path, default=INPUT_FILE, help="OpenAPI 文件（YAML / JSON）")
+    parser.add_argument("--stream", action="store_true", help="流式解析（适合数百 MB 的 spec）")
+    args = parser.parse_args()
+    extract_parameters(args.spec, args.stream)
\ No newline at end of file
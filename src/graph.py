@@ -0,0 +1,140 @@
+import json
+import struct
+import zipfile
+import numpy as np
+from pathlib import Path
+
+
+def _mmap_npz(path: Path) -> dict:
+    """以内存映射方式打开未压缩的 .npz：直接定位每个成员的 .npy 数据区，不读入内存"""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} 为压缩格式，无法内存映射")
+            # 本地文件头 30 字节，其后是文件名与扩展字段，再之后才是 .npy 内容
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran else "C")
+    return arrays
+
+
+class Graph:
+    """CSR 格式的依赖图：第 i 个节点的邻居为 indices[indptr[i]:indptr[i+1]]，相似度在 scores 的同一区间"""
+
+    def __init__(self, ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray):
+        self.ids = ids             # operationId 字符串表
+        self.indptr = indptr       # int64，长度 N + 1
+        self.indices = indices     # int32 邻居下标
+        self.scores = scores       # float32 / float16 相似度
+        self._index = None
+
+    @classmethod
+    def from_neighbors(cls, neighbors, ids: list[str], score_dtype=np.float32) -> "Graph":
+        """由 neighbors.py 的 [(邻居下标, 相似度)] 构建，邻居顺序保持不变"""
+        counts = np.fromiter((len(idx) for idx, _ in neighbors), dtype=np.int64, count=len(neighbors))
+        indptr = np.zeros(len(neighbors) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        indices = np.concatenate([np.asarray(idx, dtype=np.int32) for idx, _ in neighbors]) \
+            if neighbors else np.zeros(0, dtype=np.int32)
+        scores = np.concatenate([np.asarray(s, dtype=score_dtype) for _, s in neighbors]) \
+            if neighbors else np.zeros(0, dtype=score_dtype)
+        return cls(np.asarray(ids, dtype=str), indptr, indices.astype(np.int32), scores.astype(score_dtype))
+
+    @classmethod
+    def from_dependencies(cls, dependencies: dict, score_dtype=np.float32) -> "Graph":
+        """由 dependencies_qwen3.json 的结构构建：operationId → [{operationId, score}]"""
+        ids = list(dependencies)
+        position = {op_id: i for i, op_id in enumerate(ids)}
+        neighbors = [([position[n["operationId"]] for n in related], [n["score"] for n in related])
+                     for related in dependencies.values()]
+        return cls.from_neighbors(neighbors, ids, score_dtype)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_edges(self) -> int:
+        return int(self.indptr[-1])
+
+    def index(self, op_id: str) -> int:
+        """operationId → 节点下标（首次调用时建立字典）"""
+        if self._index is None:
+            self._index = {str(op_id): i for i, op_id in enumerate(self.ids)}
+        return self._index[op_id]
+
+    def _node(self, node) -> int:
+        return self.index(node) if isinstance(node, str) else int(node)
+
+    def neighbors(self, node):
+        """返回 (邻居下标, 相似度)，node 可以是下标或 operationId"""
+        i = self._node(node)
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.scores[start:end]
+
+    def degree(self, node=None):
+        """单个节点的出度；node 为 None 时返回所有节点的出度数组"""
+        if node is None:
+            return np.diff(self.indptr)
+        i = self._node(node)
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+    def edge_rows(self) -> np.ndarray:
+        """每条边的起点下标，与 indices 一一对应"""
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.degree())
+
+    def subgraph(self, threshold: float) -> "Graph":
+        """只保留相似度 >= threshold 的边，节点表不变"""
+        keep = self.scores >= np.float64(threshold)
+        counts = np.bincount(self.edge_rows()[keep], minlength=len(self))
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return Graph(self.ids, indptr, self.indices[keep], self.scores[keep])
+
+    def to_dependencies(self) -> dict:
+        """转换回 operationId → [{operationId, score}] 的 JSON 结构"""
+        ids = [str(op_id) for op_id in self.ids]
+        result = {}
+        for i, op_id in enumerate(ids):
+            idx, scores = self.neighbors(i)
+            result[op_id] = [{"operationId": ids[j], "score": float(s)} for j, s in zip(idx, scores)]
+        return result
+
+    def save(self, path: Path, score_dtype=None) -> None:
+        """保存为未压缩的 .npz，以便 load 时内存映射"""
+        scores = self.scores if score_dtype is None else self.scores.astype(score_dtype)
+        np.savez(path, ids=np.asarray(self.ids, dtype=str), indptr=self.indptr.astype(np.int64),
+                 indices=self.indices.astype(np.int32), scores=scores)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "Graph":
+        if mmap:
+            arrays = _mmap_npz(Path(path))
+        else:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        return cls(arrays["ids"], arrays["indptr"], arrays["indices"], arrays["scores"])
+
+
+def load_graph(path: Path, mmap: bool = True) -> Graph:
+    """读取依赖图：.npz 直接映射，旧版 .json 在内存中转换"""
+    path = Path(path)
+    if path.suffix == ".npz":
+        return Graph.load(path, mmap)
+    with open(path, "r", encoding="utf-8") as f:
+        return Graph.from_dependencies(json.load(f))
+
+
+def as_graph(dependencies) -> Graph:
+    return dependencies if isinstance(dependencies, Graph) else Graph.from_dependencies(dependencies)
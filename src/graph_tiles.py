@@ -0,0 +1,211 @@
+import json
+import math
+import numpy as np
+from pathlib import Path
+
+from neighbors import normalize
+
+OUTPUT_DIR = Path("outputs/graph_tiles")
+TILE_NODES = 2000     # 每个瓦片的目标节点数，决定网格层级
+PCA_BLOCK = 8192      # PCA 分块处理的行数，内存随块大小而非 N 增长
+CANVAS = 1000         # SVG 坐标系边长
+
+# 前端：总览层画标签超级节点，放大到一定程度后按视口用 <script> 懒加载瓦片（file:// 下也可用）
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>API Dependency Graph</title>
+<style>
+body { margin: 0; font-family: sans-serif; }
+svg { width: 100vw; height: 100vh; background: #fff; cursor: grab; }
+#info { position: fixed; top: 8px; left: 8px; background: #fffc; padding: 4px 8px; font-size: 12px; }
+.super text { font-size: 12px; pointer-events: none; }
+</style></head>
+<body>
+<div id="info"></div>
+<svg id="svg" viewBox="0 0 __CANVAS__ __CANVAS__">
+  <g id="super-edges"></g><g id="tile-edges"></g><g id="tile-nodes"></g><g id="super"></g>
+</svg>
+<script>
+const META = __META__;
+const NS = "http://www.w3.org/2000/svg";
+const svg = document.getElementById("svg");
+const loaded = new Set();
+let view = {x: 0, y: 0, w: META.canvas};
+
+function color(tag) { return `hsl(${(tag * 137.508) % 360}, 65%, 50%)`; }
+function el(name, attrs, parent) {
+  const e = document.createElementNS(NS, name);
+  for (const k in attrs) e.setAttribute(k, attrs[k]);
+  parent.appendChild(e);
+  return e;
+}
+
+function drawOverview() {
+  const edges = document.getElementById("super-edges"), nodes = document.getElementById("super");
+  for (const [a, b, w] of META.super_edges) {
+    const p = META.super_nodes[a], q = META.super_nodes[b];
+    el("line", {x1: p.x, y1: p.y, x2: q.x, y2: q.y, stroke: "#999", "stroke-opacity": 0.4,
+                "stroke-width": 0.5 + Math.log1p(w)}, edges);
+  }
+  META.super_nodes.forEach((s, i) => {
+    const g = el("g", {class: "super"}, nodes);
+    el("circle", {cx: s.x, cy: s.y, r: 3 + 2 * Math.sqrt(s.size), fill: color(i), "fill-opacity": 0.35}, g);
+    el("text", {x: s.x, y: s.y}, g).textContent = `${s.tag} (${s.size})`;
+  });
+}
+
+function loadTile(key, tile) {
+  const edges = document.getElementById("tile-edges"), nodes = document.getElementById("tile-nodes");
+  for (const [x1, y1, x2, y2] of tile.edges)
+    el("line", {x1, y1, x2, y2, stroke: "#bbb", "stroke-width": 0.2}, edges);
+  for (const [x, y, tag, id] of tile.nodes)
+    el("title", {}, el("circle", {cx: x, cy: y, r: 1.2, fill: color(tag)}, nodes)).textContent = id;
+}
+
+function update() {
+  svg.setAttribute("viewBox", `${view.x} ${view.y} ${view.w} ${view.w}`);
+  const detail = view.w <= META.detail_width;
+  document.getElementById("super").style.opacity = detail ? 0.3 : 1;
+  document.getElementById("info").textContent =
+    `${META.nodes} operations · ${META.edges} edges · ${loaded.size}/${META.tiles.length} tiles` +
+    (detail ? "" : " · 滚轮放大查看单个 operation");
+  if (!detail) return;
+  const cell = META.canvas / META.grid;
+  for (const [tx, ty] of META.tiles) {
+    const key = `${tx}_${ty}`;
+    if (loaded.has(key)) continue;
+    if ((tx + 1) * cell < view.x || tx * cell > view.x + view.w ||
+        (ty + 1) * cell < view.y || ty * cell > view.y + view.w) continue;
+    loaded.add(key);
+    const s = document.createElement("script");
+    s.src = `tiles/${key}.js`;
+    document.body.appendChild(s);
+  }
+}
+
+svg.addEventListener("wheel", e => {
+  e.preventDefault();
+  const r = svg.getBoundingClientRect(), f = e.deltaY > 0 ? 1.25 : 0.8;
+  const px = view.x + (e.clientX - r.left) / r.width * view.w;
+  const py = view.y + (e.clientY - r.top) / r.height * view.w;
+  view = {x: px - (px - view.x) * f, y: py - (py - view.y) * f, w: view.w * f};
+  update();
+}, {passive: false});
+let drag = null;
+svg.addEventListener("mousedown", e => { drag = {x: e.clientX, y: e.clientY}; });
+window.addEventListener("mouseup", () => { drag = null; });
+window.addEventListener("mousemove", e => {
+  if (!drag) return;
+  const r = svg.getBoundingClientRect();
+  view.x -= (e.clientX - drag.x) / r.width * view.w;
+  view.y -= (e.clientY - drag.y) / r.height * view.w;
+  drag = {x: e.clientX, y: e.clientY};
+  update();
+});
+
+drawOverview();
+update();
+</script>
+</body></html>
+"""
+
+
+def pca_layout(embeddings: np.ndarray, block_size: int = PCA_BLOCK) -> np.ndarray:
+    """归一化向量投影到前两个主成分，坐标缩放到 [0, 1]；分块累积协方差，支持 mmap 输入"""
+    n, dim = embeddings.shape
+    total = np.zeros(dim, dtype=np.float64)
+    gram = np.zeros((dim, dim), dtype=np.float64)
+    for start in range(0, n, block_size):
+        block = normalize(embeddings[start:start + block_size]).astype(np.float64)
+        total += block.sum(axis=0)
+        gram += block.T @ block
+    mean = total / max(n, 1)
+    cov = gram / max(n, 1) - np.outer(mean, mean)
+    _, vectors = np.linalg.eigh(cov)
+    components = vectors[:, ::-1][:, :2]
+
+    pos = np.empty((n, 2), dtype=np.float32)
+    for start in range(0, n, block_size):
+        pos[start:start + block_size] = (normalize(embeddings[start:start + block_size]) - mean) @ components
+    pos -= pos.min(axis=0)
+    pos /= np.maximum(pos.max(axis=0), 1e-12)
+    return pos
+
+
+def primary_tags(operations: list) -> tuple[list[str], np.ndarray]:
+    """以第一个标签作为聚类，返回 (标签名列表, 每个 operation 的标签下标)"""
+    names = [op["tags"][0] if op["tags"] else "untagged" for op in operations]
+    tags = sorted(set(names))
+    position = {t: k for k, t in enumerate(tags)}
+    return tags, np.array([position[t] for t in names], dtype=np.int32)
+
+
+def super_edges(rows: np.ndarray, cols: np.ndarray, node_tag: np.ndarray, n_tags: int):
+    """把跨标签的边折叠为超级节点之间的边，返回 (源标签, 目标标签, 边数)"""
+    src, dst = node_tag[rows].astype(np.int64), node_tag[cols].astype(np.int64)
+    cross = src != dst
+    codes, counts = np.unique(src[cross] * n_tags + dst[cross], return_counts=True)
+    return codes // n_tags, codes % n_tags, counts
+
+
+def write_tiles(graph, operations: list, embeddings: np.ndarray, out_dir: Path = OUTPUT_DIR,
+                tile_nodes: int = TILE_NODES) -> Path:
+    """生成可交互的分块 HTML：总览为标签超级节点，节点与边按网格瓦片拆成独立文件按需加载"""
+    position = {op["operationId"]: i for i, op in enumerate(operations)}
+    order = np.array([position[str(op_id)] for op_id in graph.ids], dtype=np.int64)
+    pos = pca_layout(embeddings)[order] * CANVAS
+    tags, node_tag = primary_tags([operations[i] for i in order])
+    rows, cols = graph.edge_rows(), np.asarray(graph.indices)
+    n = len(graph)
+
+    # 超级节点：标签成员的坐标中心
+    size = np.bincount(node_tag, minlength=len(tags))
+    cx = np.bincount(node_tag, weights=pos[:, 0], minlength=len(tags)) / np.maximum(size, 1)
+    cy = np.bincount(node_tag, weights=pos[:, 1], minlength=len(tags)) / np.maximum(size, 1)
+    src, dst, weight = super_edges(rows, cols, node_tag, len(tags))
+
+    # 网格层级：每个瓦片平均不超过 tile_nodes 个节点
+    grid = 2 ** max(0, math.ceil(math.log(max(n / tile_nodes, 1), 4)))
+    cell = np.minimum((pos / CANVAS * grid).astype(np.int64), grid - 1)
+    node_tile = cell[:, 1] * grid + cell[:, 0]
+
+    tile_dir = out_dir / "tiles"
+    tile_dir.mkdir(parents=True, exist_ok=True)
+    for old in tile_dir.glob("*.js"):
+        old.unlink()
+
+    node_order = np.argsort(node_tile, kind="stable")
+    edge_order = np.argsort(node_tile[rows], kind="stable")
+    node_bounds = np.searchsorted(node_tile[node_order], np.arange(grid * grid + 1))
+    edge_bounds = np.searchsorted(node_tile[rows][edge_order], np.arange(grid * grid + 1))
+    rounded = np.round(pos.astype(np.float64), 1)
+    tiles = []
+    for code in np.nonzero(np.diff(node_bounds))[0]:
+        nodes = node_order[node_bounds[code]:node_bounds[code + 1]]
+        edges = edge_order[edge_bounds[code]:edge_bounds[code + 1]]
+        tile = {
+            "nodes": [[*rounded[i].tolist(), int(node_tag[i]), str(graph.ids[i])] for i in nodes],
+            "edges": np.hstack([rounded[rows[edges]], rounded[cols[edges]]]).tolist(),
+        }
+        tx, ty = int(code % grid), int(code // grid)
+        with open(tile_dir / f"{tx}_{ty}.js", "w", encoding="utf-8") as f:
+            f.write(f"loadTile('{tx}_{ty}', {json.dumps(tile, ensure_ascii=False, separators=(',', ':'))});\n")
+        tiles.append([tx, ty])
+
+    meta = {
+        "canvas": CANVAS,
+        "grid": grid,
+        "detail_width": CANVAS / grid * 2,
+        "nodes": n,
+        "edges": graph.n_edges,
+        "tiles": tiles,
+        "super_nodes": [{"tag": t, "size": int(s), "x": round(float(x), 1), "y": round(float(y), 1)}
+                        for t, s, x, y in zip(tags, size, cx, cy)],
+        "super_edges": [[int(a), int(b), int(w)] for a, b, w in zip(src, dst, weight)],
+    }
+    html = HTML_TEMPLATE.replace("__CANVAS__", str(CANVAS)).replace(
+        "__META__", json.dumps(meta, ensure_ascii=False))
+    index = out_dir / "index.html"
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"✅ 已生成 {len(tiles)} 个瓦片（{grid}×{grid} 网格）：{index}")
+    return index
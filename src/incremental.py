@@ -0,0 +1,193 @@
+import hashlib
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+import instrumentation
+from graph import Graph, load_graph
+from neighbors import normalize, similarity, BLOCK_SIZE
+from parse_openapi import operations_from_spec, save_operations
+from quantized import open_embeddings
+from spec_loader import load_spec
+
+SPEC_FILE = Path("data/openapi.yaml")
+OPS_FILE = Path("outputs/operations.json")
+EMB_FILE = Path("outputs/embeddings_qwen3.npy")
+DEP_FILE = Path("outputs/dependencies_qwen3.json")
+SCHEMA_RESULT_FILE = Path("outputs/dependency_results.txt")
+SCHEMA_STATE_FILE = Path("outputs/schema_dependencies_state.json")
+
+THRESHOLD = 0.75
+HTTP_METHODS = ["get", "post", "put", "delete", "patch", "head", "options"]
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+                          .encode("utf-8")).hexdigest()
+
+
+def diff_operations(old_ops: list, new_ops: list) -> dict:
+    """按 operationId + 内容哈希比较新旧 operation 列表
+
+    changed 只包含 embedding 输入（full_text）变化的接口；其余字段变化记为 updated，向量可复用。
+    """
+    old = {op["operationId"]: op for op in old_ops}
+    new = {op["operationId"]: op for op in new_ops}
+    result = {"added": [], "removed": [op_id for op_id in old if op_id not in new],
+              "changed": [], "updated": [], "unchanged": []}
+    for op_id, op in new.items():
+        if op_id not in old:
+            result["added"].append(op_id)
+        elif op["full_text"] != old[op_id]["full_text"]:
+            result["changed"].append(op_id)
+        elif content_hash(op) != content_hash(old[op_id]):
+            result["updated"].append(op_id)
+        else:
+            result["unchanged"].append(op_id)
+    return result
+
+
+def update_embeddings(old_ops: list, old_embeddings: np.ndarray, new_ops: list, diff: dict, embed_fn):
+    """复用未变化接口的向量，只对新增 / 文本变化的接口调用 embed_fn；返回 (新向量矩阵, 需重算的行号)"""
+    old_row = {op["operationId"]: i for i, op in enumerate(old_ops)}
+    dirty_ids = set(diff["added"]) | set(diff["changed"])
+    dirty = np.array([i for i, op in enumerate(new_ops) if op["operationId"] in dirty_ids], dtype=np.int64)
+
+    embeddings = np.empty((len(new_ops), old_embeddings.shape[1]), dtype=np.float32)
+    reused = np.setdiff1d(np.arange(len(new_ops)), dirty)
+    if len(reused):
+        src = np.array([old_row[new_ops[i]["operationId"]] for i in reused], dtype=np.int64)
+        embeddings[reused] = np.asarray(old_embeddings[src], dtype=np.float32)
+    if len(dirty):
+        embeddings[dirty] = embed_fn([new_ops[i]["full_text"] for i in dirty])
+    return embeddings, dirty
+
+
+def update_graph(graph: Graph, new_ids: list[str], embeddings, dirty: np.ndarray,
+                 threshold: float = THRESHOLD, block_size: int = BLOCK_SIZE) -> Graph:
+    """就地修补阈值依赖图：两端都未变化的旧边保留，只计算变化节点的相似度行 / 列，代价 O(变化数 × N)"""
+    n = len(new_ids)
+    position = {op_id: i for i, op_id in enumerate(new_ids)}
+    is_dirty = np.zeros(n, dtype=bool)
+    is_dirty[dirty] = True
+
+    # 旧节点 → 新下标；已删除或需重算的节点记为 -1
+    remap = np.array([position.get(str(op_id), -1) for op_id in graph.ids], dtype=np.int64)
+    alive = remap >= 0
+    remap[alive] = np.where(is_dirty[remap[alive]], -1, remap[alive])
+    rows, cols = remap[graph.edge_rows()], remap[np.asarray(graph.indices)]
+    keep = (rows >= 0) & (cols >= 0)
+    parts = [(rows[keep], cols[keep], np.asarray(graph.scores, dtype=np.float32)[keep])]
+
+    normed = normalize(embeddings)
+    for start in range(0, len(dirty), block_size):
+        d = dirty[start:start + block_size]
+        block = similarity(normed[d], normed)
+        block[np.arange(len(d)), d] = -np.inf
+        r, c = np.nonzero(block >= threshold)
+        s = block[r, c]
+        r = d[r]
+        parts.append((r, c, s))
+        # 相似度对称：未变化节点指向变化节点的边（两端都变化的已在各自的行中）
+        back = ~is_dirty[c]
+        parts.append((c[back], r[back], s[back]))
+
+    rows = np.concatenate([p[0] for p in parts]).astype(np.int64)
+    cols = np.concatenate([p[1] for p in parts]).astype(np.int64)
+    scores = np.concatenate([p[2] for p in parts]).astype(np.float32)
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return Graph(np.asarray(new_ids, dtype=str), indptr, cols[order].astype(np.int32), scores[order])
+
+
+def schema_hashes(spec: dict) -> tuple[str, dict]:
+    """公共组件的哈希，以及每个 "METHOD path" 接口定义的哈希（与 parse_params 的接口 id 一致）"""
+    hashes = {}
+    for path, path_config in spec.get("paths", {}).items():
+        for method in HTTP_METHODS:
+            if method in path_config:
+                hashes[f"{method.upper()} {path}"] = content_hash([path, path_config[method]])
+    return content_hash(spec.get("components", {})), hashes
+
+
+def update_schema_graph(spec: dict, state_file: Path = SCHEMA_STATE_FILE,
+                        result_file: Path = SCHEMA_RESULT_FILE) -> list:
+    """基于 schema 的依赖图：有上次状态且公共组件未变时只重新匹配变化的接口，否则全量计算"""
+    from parse_params import (extract_operations_from_dict, resolve_all_refs, find_dependencies,
+                              update_dependencies, save_dependency_results)
+
+    components_hash, hashes = schema_hashes(spec)
+    operations = extract_operations_from_dict(spec)
+    resolve_all_refs(operations, spec)
+
+    state = None
+    if state_file.exists():
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    if state and state["components"] == components_hash:
+        dirty = {op_id for op_id, h in hashes.items() if state["ops"].get(op_id) != h}
+        previous = [tuple(pair) for pair in state["dependencies"]]
+        dependencies = update_dependencies(operations, previous, dirty)
+    else:
+        print("⚠️  无上次状态或公共组件已变化，全量计算 schema 依赖")
+        dependencies = find_dependencies(operations)
+
+    save_dependency_results(dependencies, str(result_file))
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump({"components": components_hash, "ops": hashes,
+                   "dependencies": [list(pair) for pair in dependencies]}, f, ensure_ascii=False)
+    return dependencies
+
+
+def update_semantic_graph(spec: dict, threshold: float = THRESHOLD, embed_fn=None,
+                          dep_file: Path = DEP_FILE) -> Graph:
+    """语义依赖图：只为新增 / 变化的接口生成 embedding 并修补相似度行列，随后写回 operations / 向量 / 依赖图"""
+    with open(OPS_FILE, "r", encoding="utf-8") as f:
+        old_ops = json.load(f)
+    new_ops = operations_from_spec(spec)
+    diff = diff_operations(old_ops, new_ops)
+    print(f"🔍 新增 {len(diff['added'])}，删除 {len(diff['removed'])}，文本变化 {len(diff['changed'])}，"
+          f"其他字段变化 {len(diff['updated'])}，未变化 {len(diff['unchanged'])}")
+
+    if embed_fn is None:
+        from embed_qwen3 import get_embedding as embed_fn
+    embeddings, dirty = update_embeddings(old_ops, open_embeddings(EMB_FILE), new_ops, diff, embed_fn)
+    graph = update_graph(load_graph(dep_file), [op["operationId"] for op in new_ops],
+                         embeddings, dirty, threshold)
+
+    save_operations(new_ops, OPS_FILE)
+    np.save(EMB_FILE, embeddings)
+    if dep_file.suffix == ".npz":
+        graph.save(dep_file)
+    else:
+        with open(dep_file, "w", encoding="utf-8") as f:
+            json.dump(graph.to_dependencies(), f, indent=2)
+    print(f"✅ 语义依赖图已更新：{len(dirty)} 个接口重算，共 {graph.n_edges} 条边")
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spec", type=Path, default=SPEC_FILE, help="新版 OpenAPI 文件")
+    parser.add_argument("--thresh", type=float, default=THRESHOLD, help="语义依赖图的相似度阈值（需与上次构建一致）")
+    parser.add_argument("--dep", type=Path, default=DEP_FILE, help="要修补的语义依赖图（.json 或 .npz）")
+    parser.add_argument("--skip-semantic", action="store_true", help="不更新语义依赖图")
+    parser.add_argument("--skip-schema", action="store_true", help="不更新 schema 依赖图")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrumentation.run_from_args("incremental", args):
+        with instrumentation.stage("load_spec"):
+            spec = load_spec(args.spec)
+        if not args.skip_semantic:
+            with instrumentation.stage("semantic"):
+                update_semantic_graph(spec, args.thresh, dep_file=args.dep)
+        if not args.skip_schema:
+            with instrumentation.stage("schema"):
+                update_schema_graph(spec)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+METRICS_DIR = Path("outputs/metrics")
+# 热循环里的逐条日志默认关闭；PIPELINE_VERBOSE=1 或 --verbose 打开
+VERBOSE = os.environ.get("PIPELINE_VERBOSE", "") not in ("", "0")
+
+_COUNTERS = Counter()
+_STAGES = []
+_STACK = []
+
+
+def set_verbose(flag: bool) -> None:
+    global VERBOSE
+    VERBOSE = flag
+
+
+def debug(*args, **kwargs) -> None:
+    """逐条明细日志，只在 verbose 模式下输出"""
+    if VERBOSE:
+        print(*args, **kwargs)
+
+
+def count(name: str, n: int = 1) -> None:
+    """计数器累加，如 pairs_tested / texts_embedded / tokens_processed"""
+    _COUNTERS[name] += n
+
+
+def counters() -> dict:
+    return dict(_COUNTERS)
+
+
+def reset() -> None:
+    _COUNTERS.clear()
+    _STAGES.clear()
+    _STACK.clear()
+
+
+def proc_status_mb(field: str) -> float | None:
+    """读取 /proc/self/status 中的内存字段（VmRSS / VmHWM，MB）；非 Linux 返回 None"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """清零 VmHWM，之后的峰值只反映此后的内存占用（需要 Linux 4.0+）；不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """进程常驻内存峰值；ru_maxrss 在 exec 后仍保留父进程 fork 时的值，优先用按地址空间统计的 VmHWM"""
+    peak = proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 2 ** 20 if platform.system() == "Darwin" else peak / 2 ** 10
+
+
+@contextmanager
+def stage(name: str):
+    """阶段计时：墙钟 / CPU 时间、结束时常驻内存与阶段内峰值、阶段内的计数器增量；开启 tracemalloc 时记录 Python 分配峰值
+
+    常驻内存峰值与 Python 分配峰值的处理相同：进入阶段时把到目前为止的峰值记到外层阶段上再清零，
+    退出时取本阶段峰值并合并回外层。无法清零 VmHWM 的平台上记录的是进程级峰值（rss_peak_scope 为 process）。
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # 嵌套阶段会清零峰值，先把到目前为止的峰值记到外层阶段上
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in _STACK:
+            frame["py_peak"] = max(frame["py_peak"], peak)
+        tracemalloc.reset_peak()
+    rss_peak = peak_rss_mb()
+    for frame in _STACK:
+        frame["rss_peak"] = max(frame["rss_peak"], rss_peak)
+    per_stage = reset_peak_rss()
+    # 外层帧的 name 已是完整路径
+    frame = {"name": f"{_STACK[-1]['name']}/{name}" if _STACK else name, "py_peak": 0, "rss_peak": 0.0}
+    _STACK.append(frame)
+    before = Counter(_COUNTERS)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        record = {
+            "name": frame["name"],
+            "wall_s": time.perf_counter() - wall,
+            "cpu_s": time.process_time() - cpu,
+            "rss_mb": proc_status_mb("VmRSS"),
+            "rss_peak_mb": max(frame["rss_peak"], peak_rss_mb()),
+        }
+        if not per_stage:
+            record["rss_peak_scope"] = "process"
+        for outer in _STACK[:-1]:
+            outer["rss_peak"] = max(outer["rss_peak"], record["rss_peak_mb"])
+        if tracing:
+            peak = max(frame["py_peak"], tracemalloc.get_traced_memory()[1])
+            record["py_peak_mb"] = peak / 2 ** 20
+            for outer in _STACK[:-1]:
+                outer["py_peak"] = max(outer["py_peak"], peak)
+        delta = {k: v - before.get(k, 0) for k, v in _COUNTERS.items() if v != before.get(k, 0)}
+        if delta:
+            record["counters"] = delta
+        _STACK.pop()
+        _STAGES.append(record)
+        debug(f"⏱️  {record['name']}: {record['wall_s']:.3f}s")
+
+
+def write_metrics(record: dict, metrics_file: Path) -> None:
+    """每次运行追加一行 JSON，便于跨版本对比"""
+    metrics_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(metrics_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def run(name: str, metrics_file: Path | None = None, profile_file: Path | None = None,
+        trace_memory: bool = False):
+    """一次脚本运行：整体计时，可选 tracemalloc / cProfile，结束时把阶段与计数器写入 outputs/metrics/<name>.jsonl"""
+    reset()
+    if trace_memory:
+        tracemalloc.start()
+    profiler = None
+    if profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    status = "ok"
+    try:
+        with stage(name):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profile_file.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(profile_file))
+        if trace_memory:
+            tracemalloc.stop()
+        total = _STAGES[-1]
+        record = {
+            "run": name,
+            "started": started,
+            "status": status,
+            "argv": sys.argv[1:],
+            "wall_s": total["wall_s"],
+            "cpu_s": total["cpu_s"],
+            "rss_peak_mb": total["rss_peak_mb"],
+            "stages": _STAGES[:-1],
+            "counters": counters(),
+        }
+        if "py_peak_mb" in total:
+            record["py_peak_mb"] = total["py_peak_mb"]
+        if profile_file:
+            record["profile"] = str(profile_file)
+        metrics_file = metrics_file or METRICS_DIR / f"{name}.jsonl"
+        write_metrics(record, metrics_file)
+        print(f"📈 运行指标已写入：{metrics_file}（{record['wall_s']:.2f}s，峰值 {record['rss_peak_mb']:.0f} MB）")
+
+
+def add_arguments(parser) -> None:
+    """给脚本的 argparse 加上统一的观测参数"""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--metrics", type=Path, default=None, help="运行指标 JSONL（默认 outputs/metrics/<脚本>.jsonl）")
+    group.add_argument("--profile", type=Path, default=None, help="保存 cProfile 结果（可用 snakeviz / pstats 查看）")
+    group.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 记录各阶段 Python 内存峰值（较慢）")
+    group.add_argument("--verbose", action="store_true", help="输出热循环里的逐条日志")
+
+
+def run_from_args(name: str, args):
+    if args.verbose:
+        set_verbose(True)
+    return run(name, args.metrics, args.profile, args.trace_memory)
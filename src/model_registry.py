@@ -0,0 +1,121 @@
+import json
+from pathlib import Path
+
+MODELS_DIR = Path("models")
+QWEN3 = "Qwen3-Embedding-06B"
+MINILM = "all-MiniLM-L6-v2"
+
+# 仓库里的 embeddings_qwen3.npy 由旧版未做 mask、未归一化的 padding 平均生成，
+# 现在的 mean（mask + L2）与 lasttoken 都和它不一致，无论选哪种都需要重新生成向量。
+# 重新生成后默认值改为 "auto"，即模型原生的池化（按 1_Pooling 配置，Qwen3 为 lasttoken）
+DEFAULT_POOLING = "mean"
+
+# 已加载的模型常驻内存：(类型, 模型名) → 模型对象
+_LOADED = {}
+
+
+def model_path(name: str) -> Path:
+    """模型名解析为 models/ 下的目录；传入已存在的路径则直接使用"""
+    path = Path(name)
+    return path if path.exists() else MODELS_DIR / name
+
+
+def list_models() -> list[str]:
+    """models/ 下所有本地模型目录名"""
+    if not MODELS_DIR.exists():
+        return []
+    return sorted(p.name for p in MODELS_DIR.iterdir() if (p / "config.json").exists())
+
+
+def pooling_from_config(name: str = QWEN3) -> str:
+    """读取模型目录下 1_Pooling/config.json 中启用的池化方式，没有配置时使用 mean"""
+    config_file = model_path(name) / "1_Pooling" / "config.json"
+    if not config_file.exists():
+        return "mean"
+    with open(config_file, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if config.get("pooling_mode_lasttoken"):
+        return "lasttoken"
+    if config.get("pooling_mode_cls_token"):
+        return "cls"
+    return "mean"
+
+
+def resolve_pooling(pooling: str | None, name: str = QWEN3) -> str:
+    """None → DEFAULT_POOLING，auto → 模型配置，其余原样返回"""
+    if pooling == "auto":
+        return pooling_from_config(name)
+    return pooling or DEFAULT_POOLING
+
+
+def is_sentence_transformer(name: str) -> bool:
+    """带 sentence_bert_config.json 的模型走 SentenceTransformer，其余走 AutoModel + embedding_engine"""
+    return (model_path(name) / "sentence_bert_config.json").exists()
+
+
+def get_transformer(name: str = QWEN3):
+    """返回 (tokenizer, model)，同一进程内每个模型只加载一次"""
+    key = ("transformer", name)
+    if key not in _LOADED:
+        from transformers import AutoTokenizer, AutoModel
+
+        path = model_path(name)
+        print(f"📦 加载模型: {path}")
+        tokenizer = AutoTokenizer.from_pretrained(path, trust_remote_code=True)
+        model = AutoModel.from_pretrained(path, trust_remote_code=True)
+        model.eval()
+        _LOADED[key] = (tokenizer, model)
+    return _LOADED[key]
+
+
+def get_sentence_transformer(name: str = MINILM):
+    """返回常驻的 SentenceTransformer 模型"""
+    key = ("sentence_transformer", name)
+    if key not in _LOADED:
+        from sentence_transformers import SentenceTransformer
+
+        path = model_path(name)
+        print(f"📦 加载模型: {path}")
+        _LOADED[key] = SentenceTransformer(str(path))
+    return _LOADED[key]
+
+
+def get_onnx(name: str = QWEN3, quantized: bool = False, num_threads: int | None = None):
+    """返回 (tokenizer, OnnxModel)，模型需先用 onnx_backend.py 导出；调用方式与 get_transformer 相同"""
+    key = ("onnx-int8" if quantized else "onnx", name)
+    if key not in _LOADED:
+        from transformers import AutoConfig, AutoTokenizer
+        from onnx_backend import OnnxModel, onnx_path
+
+        path = onnx_path(name, quantized)
+        if not path.exists():
+            raise FileNotFoundError(f"未找到 {path}，请先运行 onnx_backend.py 导出")
+        print(f"📦 加载 ONNX 模型: {path}")
+        tokenizer = AutoTokenizer.from_pretrained(model_path(name), trust_remote_code=True)
+        config = AutoConfig.from_pretrained(model_path(name), trust_remote_code=True)
+        _LOADED[key] = (tokenizer, OnnxModel(path, config, num_threads))
+    return _LOADED[key]
+
+
+def get_encoder(name: str = QWEN3, backend: str = "torch", num_threads: int | None = None):
+    """按后端返回 (tokenizer, model)：torch 为 AutoModel，onnx / onnx-int8 为 onnxruntime 会话"""
+    if backend == "torch":
+        return get_transformer(name)
+    return get_onnx(name, quantized=backend == "onnx-int8", num_threads=num_threads)
+
+
+def warm_up(name: str = QWEN3) -> None:
+    """加载模型并跑一次前向，提前触发权重加载与算子初始化"""
+    import torch
+
+    tokenizer, model = get_transformer(name)
+    with torch.inference_mode():
+        model(**tokenizer(["warm up"], return_tensors="pt"))
+    print(f"🔥 模型已预热: {name}")
+
+
+def unload(name: str | None = None) -> None:
+    """释放指定模型（None 表示全部）"""
+    for key in list(_LOADED):
+        if name is None or key[1] == name:
+            del _LOADED[key]
@@ -0,0 +1,90 @@
+import numpy as np
+
+from quantized import QuantizedEmbeddings
+
+BLOCK_SIZE = 1024   # 每次参与矩阵乘的行数，峰值内存约为 BLOCK_SIZE × N 个 float32
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2 归一化（零向量保持为零），之后余弦相似度即为点积；量化向量已预归一化，原样返回"""
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def similarity(rows: np.ndarray, normed, col_start: int = 0) -> np.ndarray:
+    """rows 与 normed[col_start:] 的相似度；量化向量按列分块反量化计算"""
+    if isinstance(normed, QuantizedEmbeddings):
+        return normed.similarity(rows, col_start)
+    return rows @ normed[col_start:].T
+
+
+def iter_similarity_blocks(normed: np.ndarray, block_size: int = BLOCK_SIZE):
+    """按行分块计算相似度，产出 (起始行号, block_size × N 的相似度块)"""
+    for start in range(0, len(normed), block_size):
+        block = similarity(normed[start:start + block_size], normed)
+        # 排除自身
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf
+        yield start, block
+
+
+def threshold_neighbors(embeddings: np.ndarray, threshold: float, block_size: int = BLOCK_SIZE):
+    """返回每行的 (邻居下标, 相似度)，只保留相似度 >= threshold 的邻居，下标升序"""
+    normed = normalize(embeddings)
+    result = []
+    for start, block in iter_similarity_blocks(normed, block_size):
+        rows, cols = np.nonzero(block >= threshold)
+        scores = block[rows, cols]
+        # nonzero 按行优先输出，按行切分即可
+        bounds = np.searchsorted(rows, np.arange(len(block) + 1))
+        for r in range(len(block)):
+            result.append((cols[bounds[r]:bounds[r + 1]], scores[bounds[r]:bounds[r + 1]]))
+    return result
+
+
+def topk_neighbors(embeddings: np.ndarray, k: int, threshold: float | None = None,
+                   block_size: int = BLOCK_SIZE):
+    """返回每行相似度最高的 k 个邻居 (下标, 相似度)，按相似度降序；可再叠加阈值过滤"""
+    normed = normalize(embeddings)
+    k = min(k, len(normed) - 1)
+    result = []
+    if k <= 0:
+        return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in range(len(normed))]
+    for start, block in iter_similarity_blocks(normed, block_size):
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for idx, scores in zip(top, top_scores):
+            if threshold is not None:
+                keep = scores >= threshold
+                idx, scores = idx[keep], scores[keep]
+            result.append((idx, scores))
+    return result
+
+
+def iter_threshold_pairs(embeddings: np.ndarray, threshold: float, block_size: int = BLOCK_SIZE,
+                         include_self: bool = False):
+    """分块产出上三角中相似度 >= threshold 的 (i, j, score)，j > i（include_self 时 j >= i）"""
+    normed = normalize(embeddings)
+    for start in range(0, len(normed), block_size):
+        # 上三角只需与 start 之后的列相乘
+        block = similarity(normed[start:start + block_size], normed, start)
+        rows, cols = np.nonzero(block >= threshold)
+        scores = block[rows, cols]
+        rows, cols = rows + start, cols + start
+        keep = cols >= rows if include_self else cols > rows
+        yield rows[keep], cols[keep], scores[keep]
+
+
+def to_dependencies(neighbors, operation_ids: list[str]) -> dict:
+    """转换为 dependencies_qwen3.json 的结构：operationId → [{operationId, score}]"""
+    return {
+        op_id: [{"operationId": operation_ids[j], "score": float(s)} for j, s in zip(idx, scores)]
+        for op_id, (idx, scores) in zip(operation_ids, neighbors)
+    }
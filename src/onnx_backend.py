@@ -0,0 +1,150 @@
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from types import SimpleNamespace
+
+from model_registry import model_path, QWEN3
+
+ONNX_DIR = Path("models/onnx")
+OPSET = 17
+BACKENDS = ("torch", "onnx", "onnx-int8")
+OPS_FILE = Path("outputs/operations.json")
+
+
+def onnx_path(name: str, quantized: bool = False) -> Path:
+    """导出文件位置：models/onnx/<模型名>/model.onnx（int8 为 model.int8.onnx）"""
+    return ONNX_DIR / Path(name).name / ("model.int8.onnx" if quantized else "model.onnx")
+
+
+def export(name: str = QWEN3, quantize: bool = False, force: bool = False) -> Path:
+    """把 models/ 下的模型导出为 ONNX（输出 last_hidden_state），可选再做动态 int8 量化"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    fp32 = onnx_path(name)
+    if force or not fp32.exists():
+        path = model_path(name)
+        tokenizer = AutoTokenizer.from_pretrained(path, trust_remote_code=True)
+        model = AutoModel.from_pretrained(path, trust_remote_code=True)
+        model.config.use_cache = False
+        model.eval()
+
+        class LastHidden(torch.nn.Module):
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, input_ids, attention_mask):
+                return self.inner(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+        sample = tokenizer(["export sample", "a longer export sample text"], padding=True, return_tensors="pt")
+        fp32.parent.mkdir(parents=True, exist_ok=True)
+        with torch.inference_mode():
+            torch.onnx.export(
+                LastHidden(model),
+                (sample["input_ids"], sample["attention_mask"]),
+                str(fp32),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "seq"},
+                    "attention_mask": {0: "batch", 1: "seq"},
+                    "last_hidden_state": {0: "batch", 1: "seq"},
+                },
+                opset_version=OPSET,
+            )
+        print(f"📦 已导出 ONNX：{fp32}")
+
+    if not quantize:
+        return fp32
+    int8 = onnx_path(name, quantized=True)
+    if force or not int8.exists():
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(str(fp32), str(int8), weight_type=QuantType.QInt8)
+        print(f"📦 已生成动态 int8 量化模型：{int8}")
+    return int8
+
+
+class OnnxModel:
+    """onnxruntime 会话的包装，调用方式与 AutoModel 相同（返回带 last_hidden_state 的对象）"""
+
+    def __init__(self, path: Path, config, num_threads: int | None = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.config = config
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        import torch
+
+        hidden = self.session.run(["last_hidden_state"], {
+            "input_ids": input_ids.numpy().astype(np.int64),
+            "attention_mask": attention_mask.numpy().astype(np.int64),
+        })[0]
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(hidden))
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """逐行余弦相似度，以及两组向量各自 top-10 近邻的重合率"""
+    from neighbors import normalize, topk_neighbors
+
+    cos = np.sum(normalize(reference) * normalize(candidate), axis=1)
+    ref_top = topk_neighbors(reference, 10)
+    cand_top = topk_neighbors(candidate, 10)
+    overlap = [len(set(a.tolist()) & set(b.tolist())) / max(len(a), 1)
+               for (a, _), (b, _) in zip(ref_top, cand_top)]
+    return {
+        "cos_min": float(cos.min()) if len(cos) else 1.0,
+        "cos_mean": float(cos.mean()) if len(cos) else 1.0,
+        "cos_p01": float(np.percentile(cos, 1)) if len(cos) else 1.0,
+        "top10_overlap": float(np.mean(overlap)) if overlap else 1.0,
+    }
+
+
+def main():
+    from embedding_engine import embed_texts
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=QWEN3, help="models/ 下的模型目录")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS[1:], default=list(BACKENDS[1:]),
+                        help="要评估的 ONNX 后端")
+    parser.add_argument("--force", action="store_true", help="重新导出 / 量化")
+    parser.add_argument("--out", type=Path, default=None, help="一致性报告")
+    args = parser.parse_args()
+
+    with open(OPS_FILE, "r", encoding="utf-8") as f:
+        texts = [op["full_text"] for op in json.load(f)]
+    for backend in args.backend:
+        export(args.model, quantize=backend == "onnx-int8", force=args.force)
+
+    results = {}
+    for backend in BACKENDS[:1] + tuple(args.backend):
+        start = time.perf_counter()
+        results[backend] = (embed_texts(texts, args.model, use_cache=False, backend=backend),
+                            time.perf_counter() - start)
+
+    reference, ref_sec = results["torch"]
+    lines = ["backend seconds speedup cos_min cos_p01 cos_mean top10_overlap"]
+    lines.append(f"torch {ref_sec:.2f} 1.00 1.0000 1.0000 1.0000 1.000")
+    for backend in args.backend:
+        emb, sec = results[backend]
+        r = cosine_agreement(reference, emb)
+        lines.append(f"{backend} {sec:.2f} {ref_sec / max(sec, 1e-9):.2f} {r['cos_min']:.4f} "
+                     f"{r['cos_p01']:.4f} {r['cos_mean']:.4f} {r['top10_overlap']:.3f}")
+    print("\n".join(lines))
+
+    out = args.out or Path(f"outputs/onnx_agreement_{Path(args.model).name}.txt")
+    with open(out, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"✅ 一致性报告已保存：{out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,19 @@
-import yaml
+import argparse
 import json
 from pathlib import Path
 
+from spec_loader import load_spec
+
 INPUT_FILE = Path("data/openapi.yaml")
 OUTPUT_FILE = Path("outputs/operations.json")
 
-def extract_operations():
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        spec = yaml.safe_load(f)
-
-    operations = []
-    for path, methods in spec.get("paths", {}).items():
+def iter_operations(paths):
+    """从 (path, path 条目) 序列中逐个产出 operation；paths 可以是 spec["paths"].items() 或 SpecStream.paths()"""
+    for path, methods in paths:
         for method, op in methods.items():
             if method.lower() not in {"get", "post", "put", "delete", "patch", "head"}:
                 continue
-            operations.append({
+            yield {
                 "operationId": op.get("operationId"),
                 "method": method.upper(),
                 "path": path,
@@ -22,11 +21,40 @@ def extract_operations():
                 "description": op.get("description", ""),
                 "tags": op.get("tags", []),
                 "full_text": f"{op.get('summary', '')}. {op.get('description', '')}".strip()
-            })
+            }
+
+def operations_from_spec(spec: dict) -> list:
+    """从已加载的 spec 中提取 operation 列表"""
+    return list(iter_operations(spec.get("paths", {}).items()))
+
+def save_json_array(items, output_file: Path) -> int:
+    """逐项写出 JSON 数组（格式与 json.dump(list, indent=2) 相同），items 可以是生成器；返回条数"""
+    output_file.parent.mkdir(exist_ok=True)
+    n = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        for item in items:
+            text = json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            f.write(("[\n  " if n == 0 else ",\n  ") + text)
+            n += 1
+        f.write("\n]" if n else "[]")
+    return n
+
+def save_operations(operations, output_file: Path = OUTPUT_FILE) -> int:
+    return save_json_array(operations, output_file)
 
-    OUTPUT_FILE.parent.mkdir(exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(operations, f, indent=2, ensure_ascii=False)
+def extract_operations(input_file: Path = INPUT_FILE, stream: bool = False):
+    if stream:
+        # 逐个 path 解析、逐条写出，内存占用与 spec 大小无关
+        from spec_stream import SpecStream
+        with SpecStream(input_file) as spec:
+            n = save_operations(iter_operations(spec.paths()))
+    else:
+        n = save_operations(operations_from_spec(load_spec(input_file)))
+    print(f"✅ 提取完成，共 {n} 个接口，保存在 {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    extract_operations()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spec", type=Path, default=INPUT_FILE, help="OpenAPI 文件（YAML / JSON）")
+    parser.add_argument("--stream", action="store_true", help="流式解析（适合数百 MB 的 spec）")
+    args = parser.parse_args()
+    extract_operations(args.spec, args.stream)
@@ -1,8 +1,14 @@
-import yaml
+import argparse
 import traceback
-from typing import Dict, List, Tuple, Any, Optional
+from collections import defaultdict
+from typing import Dict, List, Tuple, Any, Optional, Set
 import os
 
+import instrumentation
+from instrumentation import debug, count, stage
+from ref_resolver import SchemaResolver
+from spec_loader import load_spec
+
 
 # GitLab API 常见字段映射表
 FIELD_MAPPING = {
@@ -30,6 +36,8 @@ RESOURCE_BUSINESS_TAG = {
     "batched_background_migrations": "batched_bg_migration"
 }
 
+HTTP_METHODS = ["get", "post", "put", "delete", "patch", "head", "options"]
+
 # 路径参数名 → 业务标识映射
 PATH_PARAM_BUSINESS_TAG = {
     "batched_background_migrations": "batched_bg_migration",
@@ -41,8 +49,7 @@ PATH_PARAM_BUSINESS_TAG = {
 
 def load_openapi_dict(file_path: str) -> Dict[str, Any]:
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            openapi_dict = yaml.safe_load(f)
+        openapi_dict = load_spec(file_path)
         # 验证 OpenAPI 基本结构
         required_keys = ["openapi", "paths", "components"]
         for key in required_keys:
@@ -68,7 +75,7 @@ def _get_response_schema_from_dict(response: Dict[str, Any]) -> Optional[Dict[st
     # 检查是否有 content
     content = response.get("content", {})
     if not content:
-        print("  ❌ 响应无 content 定义")
+        debug("  ❌ 响应无 content 定义")
         return None
 
     # 查找目标 JSON 类型
@@ -81,118 +88,86 @@ def _get_response_schema_from_dict(response: Dict[str, Any]) -> Optional[Dict[st
             break
 
     if not target_schema:
-        print(f"  ❌ 无可用 JSON schema（content 类型: {list(content.keys())}）")
+        debug(f"  ❌ 无可用 JSON schema（content 类型: {list(content.keys())}）")
         return None
 
     # 验证 schema 是字典
     if not isinstance(target_schema, dict):
-        print(f"  ❌ schema 不是字典类型（实际类型: {type(target_schema)}）")
+        debug(f"  ❌ schema 不是字典类型（实际类型: {type(target_schema)}）")
         return None
 
-    print(f"  ✅ 提取 {target_type} schema，包含字段: {list(target_schema.keys())[:5]}...")
+    debug(f"  ✅ 提取 {target_type} schema，包含字段: {list(target_schema.keys())[:5]}...")
     return target_schema
 
 
+def _operations_from_path(path: str, path_config: Dict[str, Any]):
+    """逐个产出一个 path 下的 (接口 id, 接口数据)；入参 / 出参此时仍是未解析的原始定义"""
+    # 提取当前接口的业务场景标识
+    business_tags = []
+    for resource, tag in RESOURCE_BUSINESS_TAG.items():
+        if resource in path:
+            business_tags.append(tag)
+    # 保留更具体的子资源标识
+    business_tags = list(set(business_tags))
+    if len(business_tags) > 1:
+        # 排除通用父资源
+        business_tags = [tag for tag in business_tags if tag not in ["project", "group"]]
+    # 若仍无标识，尝试从路径最后一段提取资源
+    if not business_tags:
+        path_segments = [seg for seg in path.split("/") if seg and not seg.startswith("{")]
+        if path_segments:
+            last_segment = path_segments[-1]
+            business_tags = [RESOURCE_BUSINESS_TAG.get(last_segment, last_segment)]
+
+    for method in HTTP_METHODS:
+        if method not in path_config:
+            continue
+
+        op_config = path_config[method]
+        op_id = f"{method.upper()} {path}"
+        debug(f"\n=== 处理接口: {op_id} ===")
+
+        # 初始化操作数据（原始定义在 resolve_operation 中替换为解析结果，不保留两份）
+        op_data = {
+            "op_id": op_id,
+            "path": path,
+            "business_tags": business_tags,  # 接口的业务场景标识
+            "input": {
+                "parameters": op_config.get("parameters", []),
+                "request_body": op_config.get("requestBody"),
+            },
+            "output": None,
+        }
+
+        # 提取 2xx 响应的 schema
+        responses = op_config.get("responses", {})
+        response_found = False
+        for status_code, resp_config in responses.items():
+            if str(status_code).startswith("2"):
+                debug(f"  处理响应（状态码: {status_code}）")
+                op_data["output"] = _get_response_schema_from_dict(resp_config)
+                response_found = True
+                break
+
+        if not response_found:
+            debug("  ❌ 未找到 2xx 成功响应定义")
+        yield op_id, op_data
+
+
 def extract_operations_from_dict(openapi_dict: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     """从 OpenAPI 字典中提取接口操作信息（优化业务标识提取逻辑）"""
     operations: Dict[str, Dict[str, Any]] = {}
-    paths = openapi_dict.get("paths", {})
-    methods = ["get", "post", "put", "delete", "patch", "head", "options"]
-
-    for path, path_config in paths.items():
-        # 提取当前接口的业务场景标识
-        business_tags = []
-        for resource, tag in RESOURCE_BUSINESS_TAG.items():
-            if resource in path:
-                business_tags.append(tag)
-        # 保留更具体的子资源标识
-        business_tags = list(set(business_tags))
-        if len(business_tags) > 1:
-            # 排除通用父资源
-            business_tags = [tag for tag in business_tags if tag not in ["project", "group"]]
-        # 若仍无标识，尝试从路径最后一段提取资源
-        if not business_tags:
-            path_segments = [seg for seg in path.split("/") if seg and not seg.startswith("{")]
-            if path_segments:
-                last_segment = path_segments[-1]
-                business_tags = [RESOURCE_BUSINESS_TAG.get(last_segment, last_segment)]
-
-        for method in methods:
-            if method not in path_config:
-                continue
-
-            op_config = path_config[method]
-            op_id = f"{method.upper()} {path}"
-            print(f"\n=== 处理接口: {op_id} ===")
-
-            # 初始化操作数据
-            operations[op_id] = {
-                "op_id": op_id,
-                "path": path,  
-                "business_tags": business_tags,  # 接口的业务场景标识
-                "input": {
-                    "parameters": op_config.get("parameters", []),
-                    "request_body": op_config.get("requestBody"),
-                    "request_body_resolved": {},
-                    "parameters_resolved": []
-                },
-                "output": None,
-                "output_resolved": {},
-                "raw_response": None
-            }
-
-            # 提取 2xx 响应的 schema
-            responses = op_config.get("responses", {})
-            response_found = False
-            for status_code, resp_config in responses.items():
-                if str(status_code).startswith("2"):
-                    print(f"  处理响应（状态码: {status_code}）")
-                    operations[op_id]["raw_response"] = resp_config
-                    operations[op_id]["output"] = _get_response_schema_from_dict(resp_config)
-                    response_found = True
-                    break
-
-            if not response_found:
-                print("  ❌ 未找到 2xx 成功响应定义")
+    for path, path_config in openapi_dict.get("paths", {}).items():
+        operations.update(_operations_from_path(path, path_config))
 
     print(f"\n✅ 共提取到 {len(operations)} 个接口操作")
     return operations
 
 
 def resolve_ref_recursive(schema: Any, components: Dict[str, Any], indent: int = 0) -> Any:
-    prefix = "  " * indent
-    if not isinstance(schema, dict):
-        return schema
-
-    # 处理 $ref 引用
-    if "$ref" in schema:
-        ref_path = schema["$ref"].lstrip("#/")
-        ref_parts = ref_path.split("/")
-        if len(ref_parts) >= 2 and ref_parts[0] == "components" and ref_parts[1] == "schemas":
-            ref_key = ref_parts[2]
-            print(f"{prefix}🔍 解析引用: #/components/schemas/{ref_key}")
-            ref_schema = components.get(ref_key, {})
-            if not ref_schema:
-                print(f"{prefix}❌ 未找到引用的 schema: {ref_key}")
-                return schema
-            # 递归解析引用的 schema
-            return resolve_ref_recursive(ref_schema, components, indent + 1)
-
-    # 处理数组类型
-    if schema.get("type") == "array":
-        print(f"{prefix}📋 解析数组类型，处理 items 引用")
-        items = schema.get("items", {})
-        if isinstance(items, dict):
-            resolved_items = resolve_ref_recursive(items, components, indent + 1)
-            schema["items"] = resolved_items
-        return schema
-
-    # 处理对象类型
-    if schema.get("type") == "object":
-        return schema
-
-    # 其他类型直接返回
-    return schema
+    """解析顶层 $ref 与数组 items 引用（不修改公共组件）；批量解析请复用同一个 SchemaResolver"""
+    resolver = SchemaResolver({"components": {"schemas": components}})
+    return resolver.resolve_shallow(schema)
 
 
 def get_output_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
@@ -210,7 +185,7 @@ def get_output_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
             ref_key = schema["$ref"].split("/")[-1]
             ref_schema = components.get(ref_key, {})
             if ref_schema:
-                print(f"    🔍 递归解析引用对象: {ref_key}")
+                debug(f"    🔍 递归解析引用对象: {ref_key}")
                 # 从引用名推导字段标识
                 ref_business_tag = None
                 for tag in upstream_business_tags:
@@ -224,7 +199,7 @@ def get_output_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         if isinstance(schema, dict) and schema.get("type") == "array":
             items = schema.get("items", {})
             if items:
-                print(f"    🔍 解析数组元素")
+                debug(f"    🔍 解析数组元素")
                 parse_schema(items, parent_business_tag)
             return
 
@@ -232,7 +207,7 @@ def get_output_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         if isinstance(schema, dict) and schema.get("type") == "object":
             properties = schema.get("properties", {})
             if not properties:
-                print(f"    ⚠️ 对象 schema 无 properties 字段")
+                debug(f"    ⚠️ 对象 schema 无 properties 字段")
                 return
 
             for prop_name, prop_details in properties.items():
@@ -261,96 +236,133 @@ def get_output_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
                     "business_tag": field_business_tag 
                 }
 
-            print(f"    ✅ 提取到 {len(properties)} 个字段")
+            debug(f"    ✅ 提取到 {len(properties)} 个字段")
             return
 
         # 其他类型不处理
-        print(f"    ⚠️ 非对象/数组类型，跳过解析")
+        debug(f"    ⚠️ 非对象/数组类型，跳过解析")
 
     # 开始解析出参 schema
-    print(f"  🔍 开始解析出参结构")
+    debug(f"  🔍 开始解析出参结构")
     parse_schema(output_resolved)
 
     return output_fields
 
+def resolve_operation(op_data: Dict[str, Any], resolver: SchemaResolver, components) -> None:
+    """解析单个接口的出参 / 请求体 / 参数引用，原始定义替换为解析结果（只保留解析后的版本）"""
+    debug(f"\n=== 解析接口: {op_data['op_id']} ===")
+
+    # 解析出参引用
+    output = op_data.pop("output", None)
+    op_data["output_resolved"] = {}
+    if output:
+        try:
+            debug("  解析出参引用...")
+            resolved_output = resolver.resolve_shallow(output)
+            op_data["output_resolved"] = resolved_output
+
+            # 正确计算字段数量
+            if isinstance(resolved_output, dict):
+                prop_count = 0
+                # 响应是数组类型 → 统计数组元素的 properties
+                if resolved_output.get("type") == "array":
+                    items = resolved_output.get("items", {})
+                    if isinstance(items, dict) and items.get("type") == "object":
+                        prop_count = len(items.get("properties", {}))
+                # 响应是对象类型 → 直接统计自身的 properties
+                elif resolved_output.get("type") == "object":
+                    prop_count = len(resolved_output.get("properties", {}))
+
+            debug(f"  ✅ 出参解析完成，包含 {prop_count} 个字段")
+        except Exception as e:
+            debug(f"  ❌ 解析出参失败: {e}")
+            op_data["output_resolved"] = {}
+    else:
+        debug("  ⚠️  无出参 schema 可解析")
+
+    # 解析请求体引用
+    op_input = op_data["input"]
+    req_body = op_input.pop("request_body", None)
+    op_input["request_body_resolved"] = {}
+    if req_body:
+        try:
+            debug("  解析请求体引用...")
+            req_content = req_body.get("content", {})
+            req_schema = None
+            # 优先处理 JSON 类型的请求体
+            for content_type in ["application/json", "application/vnd.gitlab+json"]:
+                if content_type in req_content:
+                    req_schema = req_content[content_type].get("schema")
+                    break
+            # 递归解析请求体中的 $ref
+            if req_schema and isinstance(req_schema, dict):
+                op_input["request_body_resolved"] = resolver.resolve_shallow(req_schema)
+            debug("  ✅ 请求体解析完成")
+        except Exception as e:
+            debug(f"  ❌ 解析请求体失败: {e}")
+            op_input["request_body_resolved"] = {}
+
+    # 解析参数引用
+    resolved_params = []
+    for param in op_input.pop("parameters", []):
+        try:
+            if isinstance(param, dict) and "schema" in param:
+                param_schema = param["schema"]
+                if isinstance(param_schema, dict):
+                    # 递归解析参数 schema 中的 $ref（复制参数，不修改原始定义）
+                    resolved_schema = resolver.resolve_shallow(param_schema)
+                    param = {**param, "schema": resolved_schema}
+            resolved_params.append(param)
+        except Exception as e:
+            debug(f"  ❌ 解析参数失败: {e}")
+            resolved_params.append(param)
+    op_input["parameters_resolved"] = resolved_params
+
+    # 缓存公共组件到接口数据中，供后续字段提取使用
+    op_data["_components"] = components
+
+
 def resolve_all_refs(operations: Dict[str, Dict[str, Any]], openapi_dict: Dict[str, Any]) -> None:
     print("\n" + "="*50)
     print("开始解析引用关系（$ref）")
     print("="*50)
 
-    # 加载公共组件 schema
+    # 加载公共组件 schema；同一个解析器按引用路径缓存，每个组件只解析一次
     components = openapi_dict.get("components", {}).get("schemas", {})
+    resolver = SchemaResolver(openapi_dict)
     print(f"✅ 加载公共组件 schema 共 {len(components)} 个")
 
-    for op_id, op_data in operations.items():
-        print(f"\n=== 解析接口: {op_id} ===")
-
-        # 解析出参引用
-        if op_data["output"]:
-            try:
-                print("  解析出参引用...")
-                resolved_output = resolve_ref_recursive(op_data["output"], components)
-                op_data["output_resolved"] = resolved_output
-
-                # 正确计算字段数量
-                if isinstance(resolved_output, dict):
-                    prop_count = 0
-                    # 响应是数组类型 → 统计数组元素的 properties
-                    if resolved_output.get("type") == "array":
-                        items = resolved_output.get("items", {})
-                        if isinstance(items, dict) and items.get("type") == "object":
-                            prop_count = len(items.get("properties", {}))
-                    # 响应是对象类型 → 直接统计自身的 properties
-                    elif resolved_output.get("type") == "object":
-                        prop_count = len(resolved_output.get("properties", {}))
-
-                print(f"  ✅ 出参解析完成，包含 {prop_count} 个字段")
-            except Exception as e:
-                print(f"  ❌ 解析出参失败: {e}")
-                op_data["output_resolved"] = {}
-        else:
-            print("  ⚠️  无出参 schema 可解析")
-            op_data["output_resolved"] = {}
+    for op_data in operations.values():
+        resolve_operation(op_data, resolver, components)
+
+    if resolver.cycles:
+        print(f"⚠️  检测到循环引用: {sorted(resolver.cycles)}")
 
-        # 解析请求体引用
-        req_body = op_data["input"]["request_body"]
-        if req_body:
-            try:
-                print("  解析请求体引用...")
-                req_content = req_body.get("content", {})
-                req_schema = None
-                # 优先处理 JSON 类型的请求体
-                for content_type in ["application/json", "application/vnd.gitlab+json"]:
-                    if content_type in req_content:
-                        req_schema = req_content[content_type].get("schema")
-                        break
-                # 递归解析请求体中的 $ref
-                if req_schema and isinstance(req_schema, dict):
-                    resolved_body = resolve_ref_recursive(req_schema, components)
-                    op_data["input"]["request_body_resolved"] = resolved_body
-                print("  ✅ 请求体解析完成")
-            except Exception as e:
-                print(f"  ❌ 解析请求体失败: {e}")
-                op_data["input"]["request_body_resolved"] = {}
-
-        # 解析参数引用
-        resolved_params = []
-        for param in op_data["input"]["parameters"]:
-            try:
-                if isinstance(param, dict) and "schema" in param:
-                    param_schema = param["schema"]
-                    if isinstance(param_schema, dict):
-                        # 递归解析参数 schema 中的 $ref
-                        resolved_schema = resolve_ref_recursive(param_schema, components)
-                        param["schema"] = resolved_schema
-                resolved_params.append(param)
-            except Exception as e:
-                print(f"  ❌ 解析参数失败: {e}")
-                resolved_params.append(param)
-        op_data["input"]["parameters_resolved"] = resolved_params
-
-        # 缓存公共组件到接口数据中，供后续字段提取使用
-        op_data["_components"] = components
+
+def extract_operations_streaming(file_path: str) -> Dict[str, Dict[str, Any]]:
+    """流式提取并解析接口：逐个 path 从文件解析，公共组件在 $ref 用到时才读取，不加载整个 spec"""
+    from spec_stream import SpecStream
+
+    with SpecStream(file_path) as spec:
+        for key in ["openapi", "paths", "components"]:
+            if key not in spec.keys:
+                raise ValueError(f"OpenAPI 文件缺失必要字段: {key}")
+        components = spec.components("schemas")
+        resolver = spec.resolver()
+        print(f"✅ 扫描 OpenAPI 文件完成，包含:")
+        print(f"  - paths 数量: {len(spec.path_spans)} 个")
+        print(f"  - 公共 schema 数量: {len(components)} 个（按需加载）")
+
+        operations: Dict[str, Dict[str, Any]] = {}
+        for path, path_config in spec.paths():
+            for op_id, op_data in _operations_from_path(path, path_config):
+                resolve_operation(op_data, resolver, components)
+                operations[op_id] = op_data
+
+    if resolver.cycles:
+        print(f"⚠️  检测到循环引用: {sorted(resolver.cycles)}")
+    print(f"\n✅ 共提取到 {len(operations)} 个接口操作（实际加载公共 schema {components.n_loaded} 个）")
+    return operations
 
 
 def get_input_fields(op_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
@@ -418,7 +430,8 @@ def is_compatible(
         if matched_field not in output_fields:
             matched_field = FIELD_MAPPING.get(field_name)
         if not matched_field or matched_field not in output_fields:
-            print(f"    ❌ 字段名不匹配：下游 {field_name} 未在上游找到对应字段")
+            debug(f"    ❌ 字段名不匹配：下游 {field_name} 未在上游找到对应字段")
+            count("reject_field_name")
             return False
 
         # 提取上下游字段的详细信息
@@ -436,17 +449,20 @@ def is_compatible(
                 or (input_type == "number" and output_type in ["int", "integer"])
             )
             if not type_compatible:
-                print(f"    ❌ 类型不匹配：{input_type}（下游）≠ {output_type}（上游）")
+                debug(f"    ❌ 类型不匹配：{input_type}（下游）≠ {output_type}（上游）")
+                count("reject_type")
                 return False
 
         # 字段级业务标识校验
         # 若上下游任一字段无标识，视为语义不明，不匹配
         if not input_biz_tag or not output_biz_tag:
-            print(f"    ❌ 业务标识缺失：上游 {matched_field}({output_biz_tag}) / 下游 {field_name}({input_biz_tag})")
+            debug(f"    ❌ 业务标识缺失：上游 {matched_field}({output_biz_tag}) / 下游 {field_name}({input_biz_tag})")
+            count("reject_business_tag_missing")
             return False
         # 标识必须完全一致
         if input_biz_tag != output_biz_tag:
-            print(f"    ❌ 业务标识不匹配：{input_biz_tag}（下游）≠ {output_biz_tag}（上游）")
+            debug(f"    ❌ 业务标识不匹配：{input_biz_tag}（下游）≠ {output_biz_tag}（上游）")
+            count("reject_business_tag")
             return False
 
         # 嵌套对象递归检查
@@ -476,44 +492,146 @@ def save_dependency_results(dependencies: List[Tuple[str, str]], output_path: st
         print(f"\n❌ 保存结果文件失败: {e}")
 
 
-def find_dependencies(operations: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
-    """查找接口依赖关系（基于字段级标识校验）"""
-    print("\n" + "="*50)
-    print("开始查找接口依赖关系")
-    print("="*50)
+def _compatible_types(input_type: Optional[str]) -> Optional[Set[Optional[str]]]:
+    """与下游入参类型兼容的上游出参类型集合（None 表示任意类型均可），与 is_compatible 的规则一致"""
+    if not input_type:
+        return None
+    types = {input_type, None}
+    if input_type in ["int", "integer"]:
+        types.add("number")
+    if input_type == "number":
+        types.update(["int", "integer"])
+    return types
+
+
+def build_output_index(outputs: Dict[str, Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[Optional[str], Set[str]]]:
+    """倒排索引：(出参字段名, 业务标识) → {字段类型 → 上游接口集合}；无业务标识的字段不可能匹配，不入索引"""
+    index: Dict[Tuple[str, str], Dict[Optional[str], Set[str]]] = defaultdict(lambda: defaultdict(set))
+    for op_id, fields in outputs.items():
+        for field_name, spec in fields.items():
+            if spec.get("business_tag"):
+                index[(field_name, spec["business_tag"])][spec.get("type")].add(op_id)
+    return index
+
+
+def _field_candidates(index, field_name: str, input_spec: Dict[str, Any]) -> Set[str]:
+    """可能满足单个入参字段的上游接口（超集，最终仍由 is_compatible 精确校验）"""
+    biz_tag = input_spec.get("business_tag")
+    if not biz_tag:
+        return set()
+    types = _compatible_types(input_spec.get("type"))
+    candidates: Set[str] = set()
+    for name in {field_name, FIELD_MAPPING.get(field_name)}:
+        if not name:
+            continue
+        by_type = index.get((name, biz_tag), {})
+        for output_type, op_ids in by_type.items():
+            if types is None or output_type in types:
+                candidates |= op_ids
+    return candidates
 
-    dependencies = []
+
+def _signatures(operations: Dict[str, Dict[str, Any]]):
+    """每个接口的出参 / 入参签名只计算一次；返回 (接口顺序, 上游出参, 下游入参)"""
     op_list = list(operations.items())
-    total_ops = len(op_list)
     components = op_list[0][1].get("_components", {}) if op_list else {}
     for op_id, op_data in operations.items():
         op_data["_components"] = components
 
-    for a_idx, (a_id, a_data) in enumerate(op_list):
-        a_output = get_output_fields(a_data)
-        if not a_output:
-            continue  # 无出参的接口不作为上游
-
-        if a_idx % 10 == 0:
-            print(f"  进度: 处理第 {a_idx+1}/{total_ops} 个上游接口")
+    order = {op_id: idx for idx, (op_id, _) in enumerate(op_list)}
+    outputs = {op_id: get_output_fields(op_data) for op_id, op_data in op_list}
+    outputs = {op_id: fields for op_id, fields in outputs.items() if fields}  # 无出参的接口不作为上游
+    inputs = {op_id: get_input_fields(op_data) for op_id, op_data in op_list}
+    inputs = {op_id: fields for op_id, fields in inputs.items() if fields}  # 无入参的接口不作为下游
+    return order, outputs, inputs
+
+
+def _match_downstream(index, outputs: Dict[str, Dict[str, Any]], b_id: str,
+                      b_input: Dict[str, Any]) -> Tuple[List[str], int]:
+    """在索引覆盖的上游中查找下游 b 的依赖；返回 (成立的上游列表, 精确校验次数)"""
+    # 下游的每个入参字段都必须在上游找到，取各字段候选集合的交集
+    candidates: Optional[Set[str]] = None
+    for field_name, input_spec in b_input.items():
+        field_candidates = _field_candidates(index, field_name, input_spec)
+        candidates = field_candidates if candidates is None else candidates & field_candidates
+        if not candidates:
+            break
+    candidates = (candidates or set()) - {b_id}  # 排除自身依赖
+    return [a_id for a_id in candidates if is_compatible(outputs[a_id], b_input)], len(candidates)
 
-        for b_id, b_data in op_list:
-            if a_id == b_id:
-                continue  # 排除自身依赖
 
-            b_input = get_input_fields(b_data)
-            if not b_input:
-                continue  # 无入参的接口不作为下游
+def find_dependencies(operations: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """查找接口依赖关系（基于字段级标识校验）"""
+    print("\n" + "="*50)
+    print("开始查找接口依赖关系")
+    print("="*50)
 
-            # 仅传递上下游字段信息
-            if is_compatible(a_output, b_input):
-                print(f"  ✅ 依赖成立: {a_id[:40]}... → {b_id[:40]}...")
-                dependencies.append((a_id, b_id))
+    order, outputs, inputs = _signatures(operations)
+    index = build_output_index(outputs)
+    print(f"  上游接口 {len(outputs)} 个，下游接口 {len(inputs)} 个，索引键 {len(index)} 个")
 
+    dependencies = []
+    tested = 0
+    for b_id, b_input in inputs.items():
+        matched, n_candidates = _match_downstream(index, outputs, b_id, b_input)
+        tested += n_candidates
+        dependencies.extend((a_id, b_id) for a_id in matched)
+
+    # 保持与逐对遍历一致的顺序：先按上游、再按下游
+    dependencies.sort(key=lambda pair: (order[pair[0]], order[pair[1]]))
+    for a_id, b_id in dependencies:
+        debug(f"  ✅ 依赖成立: {a_id[:40]}... → {b_id[:40]}...")
+
+    total_pairs = len(outputs) * len(inputs)
+    count("pairs_tested", tested)
+    count("pairs_pruned", total_pairs - tested)
+    count("dependencies", len(dependencies))
+    print(f"  候选接口对 {tested} 组（全量两两比较需 {total_pairs} 组）")
     print(f"\n✅ 依赖查找完成，共发现 {len(dependencies)} 组依赖关系")
     return dependencies
 
 
+def update_dependencies(
+    operations: Dict[str, Dict[str, Any]],
+    previous: List[Tuple[str, str]],
+    dirty: Set[str]
+) -> List[Tuple[str, str]]:
+    """增量更新依赖：两端都未变化的旧依赖直接保留，只对新增 / 修改的接口重新匹配（公共组件需未变化）"""
+    print("\n" + "="*50)
+    print(f"增量更新接口依赖关系（变化接口 {len(dirty)} 个）")
+    print("="*50)
+
+    order, outputs, inputs = _signatures(operations)
+    kept = [(a_id, b_id) for a_id, b_id in previous
+            if a_id in order and b_id in order and a_id not in dirty and b_id not in dirty]
+
+    matched = []
+    tested = 0
+    # 变化的接口作为下游：在全部上游中匹配
+    index = build_output_index(outputs)
+    for b_id in dirty & inputs.keys():
+        found, n_candidates = _match_downstream(index, outputs, b_id, inputs[b_id])
+        tested += n_candidates
+        matched.extend((a_id, b_id) for a_id in found)
+    # 变化的接口作为上游：只需匹配未变化的下游（变化的下游上一步已覆盖）
+    dirty_index = build_output_index({op_id: outputs[op_id] for op_id in dirty & outputs.keys()})
+    if dirty_index:
+        for b_id, b_input in inputs.items():
+            if b_id in dirty:
+                continue
+            found, n_candidates = _match_downstream(dirty_index, outputs, b_id, b_input)
+            tested += n_candidates
+            matched.extend((a_id, b_id) for a_id in found)
+
+    dependencies = sorted(set(kept) | set(matched), key=lambda pair: (order[pair[0]], order[pair[1]]))
+    count("pairs_tested", tested)
+    count("dependencies_kept", len(kept))
+    count("dependencies", len(dependencies))
+    print(f"  保留 {len(kept)} 组，重新校验 {tested} 组，新增 / 更新 {len(matched)} 组")
+    print(f"\n✅ 增量更新完成，共 {len(dependencies)} 组依赖关系")
+    return dependencies
+
+
 def print_dependency_summary(dependencies: List[Tuple[str, str]]) -> str:
     """生成汇总文本（终端只显示统计，文件保留完整依赖）"""
     summary_lines = []
@@ -564,24 +682,35 @@ def print_dependency_summary(dependencies: List[Tuple[str, str]]) -> str:
 
 def main(
     file_path: str = "./data/openapi.yaml",
-    output_file: str = "./dependency_results.txt"
+    output_file: str = "./dependency_results.txt",
+    stream: bool = False
 ) -> None:
     print("="*60)
     print("           GitLab OpenAPI 接口依赖关系分析工具")
     print("="*60)
 
     try:
-        print("\n1. 加载 OpenAPI 文件...")
-        openapi_dict = load_openapi_dict(file_path)
+        if stream:
+            print("\n1-3. 流式提取接口操作并解析引用关系（$ref）...")
+            with stage("extract_operations_streaming"):
+                operations = extract_operations_streaming(file_path)
+        else:
+            print("\n1. 加载 OpenAPI 文件...")
+            with stage("load"):
+                openapi_dict = load_openapi_dict(file_path)
 
-        print("\n2. 提取接口操作信息...")
-        operations = extract_operations_from_dict(openapi_dict)
+            print("\n2. 提取接口操作信息...")
+            with stage("extract_operations"):
+                operations = extract_operations_from_dict(openapi_dict)
 
-        print("\n3. 解析引用关系（$ref）...")
-        resolve_all_refs(operations, openapi_dict)
+            print("\n3. 解析引用关系（$ref）...")
+            with stage("resolve_refs"):
+                resolve_all_refs(operations, openapi_dict)
+        count("operations", len(operations))
 
         print("\n4. 查找接口依赖关系...")
-        dependencies = find_dependencies(operations)
+        with stage("find_dependencies"):
+            dependencies = find_dependencies(operations)
 
         full_summary = print_dependency_summary(dependencies)
         terminal_summary = full_summary.split("\n\n" + "="*40)[0] if dependencies else full_summary
@@ -601,4 +730,9 @@ def main(
 if __name__ == "__main__":
     OPENAPI_FILE_PATH = './data/openapi.yaml' 
     RESULT_FILE_PATH = './outputs/dependency_results.txt' 
-    main(file_path=OPENAPI_FILE_PATH, output_file=RESULT_FILE_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="流式解析 spec（适合数百 MB 的文件）")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("parse_params", args):
+        main(file_path=OPENAPI_FILE_PATH, output_file=RESULT_FILE_PATH, stream=args.stream)
\ No newline at end of file
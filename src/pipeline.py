@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import argparse
+import numpy as np
+from pathlib import Path
+
+import instrumentation
+from model_registry import resolve_pooling, QWEN3
+from spec_loader import fingerprint as file_fingerprint
+
+SPEC_FILE = Path("data/openapi.yaml")
+STATE_FILE = Path("outputs/.pipeline_state.json")
+THRESHOLD = 0.75
+
+DEFAULT_TARGETS = ["dependencies", "purity", "curve"]
+
+
+def _hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _hash_array(value: np.ndarray) -> str:
+    digest = hashlib.sha256(str((value.shape, value.dtype.str)).encode("utf-8"))
+    digest.update(np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+
+def _load_json(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(value, path: Path, indent: int = 2):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(value, f, indent=indent, ensure_ascii=False)
+
+
+# —— 各阶段的计算函数（输入输出都在内存中，按需延迟导入重依赖）——
+
+def _stage_operations(params):
+    from parse_openapi import operations_from_spec
+    from spec_loader import load_spec
+    return operations_from_spec(load_spec(params["spec"]))
+
+
+def _stage_embeddings(params, operations):
+    from embedding_engine import embed_texts
+    return embed_texts([op["full_text"] for op in operations], params["model"],
+                       pooling=params["pooling"], backend=params["backend"])
+
+
+def _stage_dependencies(params, operations, embeddings):
+    from build_dependencies import compute_dependencies
+    return compute_dependencies(operations, embeddings, params["threshold"])
+
+
+def _stage_purity(params, operations, dependencies):
+    from tag_purity import purity_of
+    return float(purity_of(dependencies, operations))
+
+
+def _stage_curve(params, operations, embeddings):
+    from threshold_sweep import sweep
+    return sweep(embeddings, operations, np.arange(params["start"], params["stop"], params["step"]))
+
+
+def _stage_graph(params, dependencies):
+    from visualize import draw
+    draw(dependencies, Path(params["image"]))
+    # 产物指纹用 JSON 计算，返回字符串而不是 Path
+    return str(params["image"])
+
+
+def _save_purity(value, path: Path):
+    # 只更新 Qwen3 一行，保留 tag_purity.py 写入的 MiniLM 对比结果
+    from tag_purity import read_result, write_result
+    previous = read_result(path) if path.exists() else {}
+    write_result(previous.get("MiniLM"), value, path)
+
+
+def _load_purity(path: Path):
+    from tag_purity import read_result
+    return read_result(path)["Qwen3"]
+
+
+def _save_curve(value, path: Path):
+    from threshold_curve import write_curve
+    write_curve(value, path)
+
+
+# 阶段定义：参数、输入、计算函数、落盘路径与读写方式、产物指纹
+STAGES = {
+    "operations": {
+        "params": ["spec"],
+        "inputs": [],
+        "run": _stage_operations,
+        "path": Path("outputs/operations.json"),
+        "save": _save_json,
+        "load": _load_json,
+        "hash": _hash_json,
+    },
+    "embeddings": {
+        "params": ["model", "pooling", "backend"],
+        "inputs": ["operations"],
+        "run": _stage_embeddings,
+        "path": Path("outputs/embeddings_qwen3.npy"),
+        "save": lambda value, path: np.save(path, value),
+        "load": np.load,
+        "hash": _hash_array,
+    },
+    "dependencies": {
+        "params": ["threshold"],
+        "inputs": ["operations", "embeddings"],
+        "run": _stage_dependencies,
+        "path": Path("outputs/dependencies_qwen3.json"),
+        "save": _save_json,
+        "load": _load_json,
+        "hash": _hash_json,
+    },
+    "purity": {
+        "params": [],
+        "inputs": ["operations", "dependencies"],
+        "run": _stage_purity,
+        "path": Path("outputs/tag_purity_result.txt"),
+        "save": _save_purity,
+        "load": _load_purity,
+        "hash": _hash_json,
+    },
+    "curve": {
+        "params": ["start", "stop", "step"],
+        "inputs": ["operations", "embeddings"],
+        "run": _stage_curve,
+        "path": Path("outputs/threshold_curve_qwen3.txt"),
+        "save": _save_curve,
+        "load": None,   # 曲线文件只用于阅读，不作为其他阶段的输入
+        "hash": _hash_json,
+    },
+    "graph": {
+        "params": ["image"],
+        "inputs": ["dependencies"],
+        "run": _stage_graph,
+        "path": Path("outputs/dependency_graph_qwen3.png"),
+        "save": None,   # 绘图阶段自己写文件
+        "load": None,
+        "hash": _hash_json,
+    },
+}
+
+
+class Pipeline:
+    """单进程流水线：阶段之间在内存中传递产物；输入指纹未变的阶段跳过（类似 make）"""
+
+    def __init__(self, params: dict, write: set, force: bool = False, state_file: Path = STATE_FILE):
+        self.params = params
+        self.write = write
+        self.force = force
+        self.state_file = state_file
+        self.state = {} if force or not state_file.exists() else _load_json(state_file)
+        self.values = {}
+        self.output_fps = {}
+        self.executed = []
+
+    def _stage_key(self, name: str) -> str:
+        """阶段指纹 = 阶段名 + 该阶段用到的参数 + 所有输入产物的指纹"""
+        stage = STAGES[name]
+        inputs = [self.output_fp(dep) for dep in stage["inputs"]]
+        if name == "operations":
+            inputs.append(file_fingerprint(self.params["spec"]))
+        return _hash_json([name, {k: str(self.params[k]) for k in stage["params"]}, inputs])
+
+    def _is_fresh(self, name: str) -> bool:
+        entry = self.state.get(name)
+        return bool(entry) and entry["key"] == self._stage_key(name)
+
+    def _wants_write(self, name: str) -> bool:
+        return name in self.write or "all" in self.write
+
+    def _on_disk(self, name: str) -> bool:
+        """落盘文件存在且仍是本流水线上次写入的那份"""
+        path = STAGES[name]["path"]
+        entry = self.state.get(name, {})
+        if not path.exists() or "file" not in entry:
+            return False
+        stat = path.stat()
+        return entry["file"] == [stat.st_size, stat.st_mtime_ns]
+
+    def output_fp(self, name: str) -> str:
+        """产物指纹：阶段未变时直接取上次记录，否则需要重新计算"""
+        if name not in self.output_fps:
+            if self._is_fresh(name):
+                self.output_fps[name] = self.state[name]["output"]
+            else:
+                self.get(name)
+        return self.output_fps[name]
+
+    def get(self, name: str):
+        """取得产物：内存中已有 → 磁盘上是最新的 → 重新计算"""
+        if name in self.values:
+            return self.values[name]
+        stage = STAGES[name]
+        if stage["load"] and self._is_fresh(name) and self._on_disk(name):
+            print(f"⏭️  [{name}] 输入未变，读取 {stage['path']}")
+            self.values[name] = stage["load"](stage["path"])
+            return self.values[name]
+
+        inputs = [self.get(dep) for dep in stage["inputs"]]
+        key = self._stage_key(name)
+        print(f"▶️  [{name}] 运行中...")
+        with instrumentation.stage(name):
+            value = stage["run"](self.params, *inputs)
+        self.values[name] = value
+        self.output_fps[name] = stage["hash"](value)
+        self.state[name] = {"key": key, "output": self.output_fps[name]}
+        self.executed.append(name)
+
+        if stage["save"] and self._wants_write(name):
+            stage["path"].parent.mkdir(parents=True, exist_ok=True)
+            stage["save"](value, stage["path"])
+            stat = stage["path"].stat()
+            self.state[name]["file"] = [stat.st_size, stat.st_mtime_ns]
+            print(f"💾 [{name}] 已写入 {stage['path']}")
+        return value
+
+    def run(self, targets: list[str]) -> None:
+        for name in targets:
+            stage = STAGES[name]
+            if stage["save"] is None:
+                # 绘图阶段自己写文件，只需确认文件还在
+                persisted = stage["path"].exists()
+            else:
+                persisted = self._on_disk(name) or not self._wants_write(name)
+            if self._is_fresh(name) and persisted:
+                print(f"⏭️  [{name}] 输入未变，跳过")
+                continue
+            self.get(name)
+
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix(".tmp")
+        _save_json(self.state, tmp_file)
+        os.replace(tmp_file, self.state_file)
+        print(f"✅ 流水线完成，执行阶段: {self.executed or '无'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help=f"目标阶段，可选 {list(STAGES)}")
+    parser.add_argument("--spec", type=Path, default=SPEC_FILE, help="OpenAPI 文件")
+    parser.add_argument("--thresh", type=float, default=THRESHOLD, help="依赖图相似度阈值")
+    parser.add_argument("--model", default=QWEN3, help="embedding 模型")
+    parser.add_argument("--pooling", choices=["mean", "lasttoken", "cls", "auto"], default=None,
+                        help="池化方式（默认 mean，auto 按模型的 1_Pooling 配置）")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default="torch", help="推理后端")
+    parser.add_argument("--write", default=",".join(DEFAULT_TARGETS),
+                        help="需要落盘的产物，逗号分隔；all 表示全部")
+    parser.add_argument("--force", action="store_true", help="忽略上次状态，全部重新运行")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    # 池化方式先解析成具体名字，默认值变化时 embeddings 阶段的指纹随之变化
+    params = {"spec": args.spec, "threshold": args.thresh, "start": 0.65, "stop": 0.81, "step": 0.01,
+              "image": STAGES["graph"]["path"], "model": args.model,
+              "pooling": resolve_pooling(args.pooling, args.model), "backend": args.backend}
+    write = {name for name in args.write.split(",") if name}
+    with instrumentation.run_from_args("pipeline", args):
+        Pipeline(params, write, args.force).run(args.targets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import numpy as np
+from pathlib import Path
+
+THRESHOLD = 0.75
+COL_BLOCK = 4096    # 计算相似度时每次反量化的列数，临时内存约为 行数 × COL_BLOCK 个 float32
+DTYPES = ("float16", "int8")
+
+
+class QuantizedEmbeddings:
+    """预归一化的量化向量：float16，或 int8 码 + 每行缩放系数；计算时按块反量化"""
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray | None = None):
+        self.codes = codes      # (N, D) float16 / int8，可以是 memmap
+        self.scales = scales    # int8 时为 (N,) float32，向量 ≈ codes × scale
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def dtype(self):
+        return self.codes.dtype
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """取若干行并反量化为 float32"""
+        rows = np.asarray(self.codes[key], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[key], dtype=np.float32)[..., None]
+        return rows
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self[:]
+        return rows if dtype is None else rows.astype(dtype)
+
+    def similarity(self, rows: np.ndarray, col_start: int = 0, col_block: int = COL_BLOCK) -> np.ndarray:
+        """rows 与第 col_start 行之后所有向量的点积；int8 时先对码做矩阵乘再乘列缩放系数"""
+        rows = np.asarray(rows, dtype=np.float32)
+        out = np.empty((len(rows), len(self) - col_start), dtype=np.float32)
+        for start in range(col_start, len(self), col_block):
+            codes = np.asarray(self.codes[start:start + col_block], dtype=np.float32)
+            block = rows @ codes.T
+            if self.scales is not None:
+                block *= np.asarray(self.scales[start:start + col_block], dtype=np.float32)
+            out[:, start - col_start:start - col_start + len(codes)] = block
+        return out
+
+
+def scale_path(path: Path) -> Path:
+    """int8 向量的缩放系数文件：xxx.int8.npy → xxx.int8.scale.npy"""
+    return path.with_name(path.stem + ".scale.npy")
+
+
+def quantized_path(path: Path, dtype: str) -> Path:
+    """float32 文件对应的量化文件名：embeddings_qwen3.npy → embeddings_qwen3.int8.npy"""
+    return path.with_name(f"{path.stem}.{dtype}.npy")
+
+
+def quantize(embeddings: np.ndarray, dtype: str) -> QuantizedEmbeddings:
+    """L2 归一化后量化；int8 使用每行对称缩放（最大绝对值映射到 127）"""
+    from neighbors import normalize
+
+    normed = normalize(embeddings)
+    if dtype == "float16":
+        return QuantizedEmbeddings(normed.astype(np.float16))
+    if dtype == "int8":
+        scales = np.abs(normed).max(axis=1) / 127
+        codes = np.round(normed / np.where(scales == 0, 1, scales)[:, None])
+        return QuantizedEmbeddings(codes.astype(np.int8), scales.astype(np.float32))
+    raise ValueError(f"不支持的量化类型：{dtype}")
+
+
+def save_embeddings(path: Path, embeddings: np.ndarray, dtype: str = "float32") -> None:
+    """保存向量；float16 / int8 会先归一化再量化"""
+    if dtype == "float32":
+        np.save(path, np.asarray(embeddings, dtype=np.float32))
+        return
+    quantized = quantize(embeddings, dtype)
+    np.save(path, quantized.codes)
+    if quantized.scales is not None:
+        np.save(scale_path(path), quantized.scales)
+
+
+def open_embeddings(path: Path, mmap: bool = True):
+    """按文件中的类型打开向量：float32 返回 ndarray，float16 / int8 返回 QuantizedEmbeddings；默认内存映射"""
+    path = Path(path)
+    mode = "r" if mmap else None
+    codes = np.load(path, mmap_mode=mode)
+    if codes.dtype == np.int8:
+        return QuantizedEmbeddings(codes, np.load(scale_path(path), mmap_mode=mode))
+    if codes.dtype == np.float16:
+        return QuantizedEmbeddings(codes)
+    return codes
+
+
+def accuracy_report(embeddings: np.ndarray, quantized: QuantizedEmbeddings,
+                    threshold: float = THRESHOLD, block_size: int = 1024) -> dict:
+    """与 float32 精确相似度对比：绝对误差，以及阈值下边集合的差异（不含自身）"""
+    from neighbors import normalize
+
+    normed = normalize(embeddings)
+    max_err, err_sum, pairs = 0.0, 0.0, 0
+    both = only_exact = only_quant = 0
+    for start in range(0, len(normed), block_size):
+        exact = normed[start:start + block_size] @ normed.T
+        approx = quantized.similarity(quantized[start:start + block_size])
+        rows = np.arange(len(exact))
+        exact[rows, start + rows] = approx[rows, start + rows] = -np.inf
+        valid = np.isfinite(exact)
+        err = np.abs(exact[valid] - approx[valid])
+        max_err = max(max_err, float(err.max(initial=0.0)))
+        err_sum += float(err.sum())
+        pairs += int(valid.sum())
+        e, a = exact >= threshold, approx >= threshold
+        both += int((e & a).sum())
+        only_exact += int((e & ~a).sum())
+        only_quant += int((~e & a).sum())
+    return {
+        "max_abs_err": max_err,
+        "mean_abs_err": err_sum / max(pairs, 1),
+        "edges": both + only_exact,
+        "edges_lost": only_exact,
+        "edges_added": only_quant,
+        "edge_recall": both / max(both + only_exact, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("emb", type=Path, help="float32 embedding 文件")
+    parser.add_argument("--dtype", nargs="+", choices=DTYPES, default=list(DTYPES), help="量化类型")
+    parser.add_argument("--thresh", type=float, default=THRESHOLD, help="评估边集合时的阈值")
+    parser.add_argument("--report", type=Path, default=None, help="精度报告（默认与输入同目录）")
+    args = parser.parse_args()
+
+    embeddings = np.load(args.emb, mmap_mode="r")
+    report = args.report or args.emb.with_name(f"quantization_report_{args.emb.stem}.txt")
+    lines = ["dtype size_ratio max_abs_err mean_abs_err edges lost added edge_recall"]
+    for dtype in args.dtype:
+        out = quantized_path(args.emb, dtype)
+        save_embeddings(out, embeddings, dtype)
+        size = out.stat().st_size + (scale_path(out).stat().st_size if dtype == "int8" else 0)
+        r = accuracy_report(embeddings, open_embeddings(out), args.thresh)
+        lines.append(f"{dtype} {size / args.emb.stat().st_size:.3f} {r['max_abs_err']:.2e} "
+                     f"{r['mean_abs_err']:.2e} {r['edges']} {r['edges_lost']} {r['edges_added']} "
+                     f"{r['edge_recall']:.4f}")
+        print(f"✅ {dtype} 已保存：{out}（边召回 {r['edge_recall']:.4f}，最大误差 {r['max_abs_err']:.2e}）")
+
+    with open(report, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"✅ 精度报告已保存：{report}")
+
+
+if __name__ == "__main__":
+    main()
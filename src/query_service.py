@@ -0,0 +1,282 @@
+import json
+import time
+import argparse
+import threading
+import numpy as np
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from model_registry import resolve_pooling, QWEN3
+from neighbors import normalize
+from quantized import open_embeddings
+
+OPS_FILE = Path("outputs/operations.json")
+EMB_FILE = Path("outputs/embeddings_qwen3.npy")
+PARAM_META_FILE = Path("outputs/param_description_embeddings.json")
+PARAM_EMB_FILE = Path("outputs/param_description_embeddings.npy")
+# embed_parameter_descriptions.py --dedup 的输出：唯一描述的向量 + 每个参数对应的向量下标
+PARAM_UNIQUE_EMB_FILE = Path("outputs/param_description_unique_embeddings.npy")
+PARAM_INDEX_FILE = Path("outputs/param_description_index.npy")
+
+HOST = "127.0.0.1"
+PORT = 8765
+TOP_K = 10
+TARGETS = ("operations", "parameters")
+CACHE_SIZE = 4096     # 查询向量 LRU 缓存条数
+LATENCY_WINDOW = 10000
+
+
+def load_matrix(path: Path) -> np.ndarray:
+    """读入并 L2 归一化为连续的 float32 矩阵，查询时只做一次矩阵-向量乘"""
+    return np.ascontiguousarray(np.asarray(normalize(open_embeddings(path)), dtype=np.float32))
+
+
+def top_k(scores: np.ndarray, k: int, exclude: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """argpartition 取前 k 个再排序，返回 (下标, 相似度)，相似度降序"""
+    if exclude is not None:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    k = min(k, len(scores) - (exclude is not None))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+def load_param_matrix(emb_file: Path | None = PARAM_EMB_FILE, unique_file: Path | None = PARAM_UNIQUE_EMB_FILE,
+                      index_file: Path | None = PARAM_INDEX_FILE):
+    """参数描述向量，返回 (矩阵, 参数 → 矩阵行下标)；--dedup 的输出比完整矩阵新（或完整矩阵不存在）时用去重版本，
+    下标为 None 表示逐行对应；都没有时返回 (None, None)"""
+    full = emb_file if emb_file and emb_file.exists() else None
+    if unique_file and index_file and unique_file.exists() and index_file.exists():
+        if full is None or unique_file.stat().st_mtime_ns >= full.stat().st_mtime_ns:
+            return load_matrix(unique_file), np.load(index_file).astype(np.int64)
+    if full is not None:
+        return load_matrix(full), None
+    return None, None
+
+
+class QueryIndex:
+    """常驻内存的 operation / 参数向量索引：按 operationId 或文本查询 top-k 相关项"""
+
+    def __init__(self, operations: list, embeddings: np.ndarray, params: list | None = None,
+                 param_embeddings: np.ndarray | None = None, model_name: str = QWEN3,
+                 encode_fn=None, cache_size: int = CACHE_SIZE, pooling: str | None = None,
+                 param_index: np.ndarray | None = None):
+        self.operations = operations
+        self.matrix = embeddings
+        self.position = {op["operationId"]: i for i, op in enumerate(operations)}
+        self.params = params or []
+        self.param_matrix = param_embeddings
+        self.param_index = param_index      # 去重模式下每个参数对应的向量行，None 表示逐行对应
+        if self.param_matrix is not None:
+            n_rows = len(param_index) if param_index is not None else len(self.param_matrix)
+            if n_rows != len(self.params):
+                raise ValueError(f"参数描述向量 {n_rows} 条与元数据 {len(self.params)} 条不一致，请重新生成")
+        self.model_name = model_name
+        self.pooling = resolve_pooling(pooling, model_name)
+        self._encode_fn = encode_fn
+        self._prompt = None
+        self._model_lock = threading.Lock()
+        self.embed_query = lru_cache(maxsize=cache_size)(self._embed_query)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    @classmethod
+    def load(cls, ops_file: Path = OPS_FILE, emb_file: Path = EMB_FILE,
+             param_meta_file: Path | None = PARAM_META_FILE, param_emb_file: Path | None = PARAM_EMB_FILE,
+             param_unique_file: Path | None = PARAM_UNIQUE_EMB_FILE, param_index_file: Path | None = PARAM_INDEX_FILE,
+             **kwargs) -> "QueryIndex":
+        with open(ops_file, "r", encoding="utf-8") as f:
+            operations = json.load(f)
+        params, param_matrix, param_index = None, None, None
+        if param_meta_file and param_meta_file.exists():
+            param_matrix, param_index = load_param_matrix(param_emb_file, param_unique_file, param_index_file)
+            if param_matrix is not None:
+                with open(param_meta_file, "r", encoding="utf-8") as f:
+                    params = json.load(f)
+        return cls(operations, load_matrix(emb_file), params, param_matrix, param_index=param_index, **kwargs)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        """默认编码器：常驻 Qwen3，查询加上模型配置里的 query 提示（文档向量生成时不加）"""
+        if self._encode_fn is not None:
+            return self._encode_fn(texts)
+        from embedding_engine import encode_batched, query_prompt, POOLERS
+        from model_registry import get_transformer
+
+        if self._prompt is None:
+            self._prompt = query_prompt(self.model_name)
+        tokenizer, model = get_transformer(self.model_name)
+        return encode_batched([self._prompt + t for t in texts], tokenizer, model,
+                              pool=POOLERS[self.pooling], verbose=False)
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        with self._model_lock:
+            vec = np.asarray(normalize(self._encode([text])), dtype=np.float32)[0]
+        vec.setflags(write=False)
+        return vec
+
+    def warm_up(self) -> None:
+        """启动时先编码一次，把模型加载和算子初始化挪出第一次查询"""
+        self._encode(["warm up"])
+
+    def query(self, operation_id: str | None = None, text: str | None = None, k: int = TOP_K,
+              target: str = "operations") -> list[dict]:
+        """按 operationId（用已存的向量，排除自身）或自由文本查询 target 中最相关的 k 项"""
+        start = time.perf_counter()
+        if target not in TARGETS:
+            raise ValueError(f"未知的 target：{target}（可选 {' / '.join(TARGETS)}）")
+        if operation_id is not None:
+            if operation_id not in self.position:
+                raise KeyError(f"未知的 operationId：{operation_id}")
+            row = self.position[operation_id]
+            vec = self.matrix[row]
+        elif text:
+            row, vec = None, self.embed_query(text)
+        else:
+            raise ValueError("需要 operationId 或 q 参数")
+
+        if target == "parameters":
+            if self.param_matrix is None:
+                raise ValueError("未加载参数描述向量")
+            scores = self.param_matrix @ vec
+            if self.param_index is not None:
+                scores = scores[self.param_index]
+            idx, scores = top_k(scores, k)
+            result = [{**self.params[i], "score": float(s)} for i, s in zip(idx, scores)]
+        else:
+            idx, scores = top_k(self.matrix @ vec, k, exclude=row)
+            result = [{"operationId": self.operations[i]["operationId"],
+                       "method": self.operations[i].get("method"),
+                       "path": self.operations[i].get("path"),
+                       "score": float(s)} for i, s in zip(idx, scores)]
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    def stats(self) -> dict:
+        lat = np.asarray(self.latencies) * 1000
+        info = self.embed_query.cache_info()
+        return {
+            "operations": len(self.operations),
+            "parameters": len(self.params),
+            "queries": len(lat),
+            "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+            "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+            "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max": info.maxsize},
+        }
+
+
+def make_handler(index: QueryIndex):
+    class Handler(BaseHTTPRequestHandler):
+        """GET /related?operationId=..|q=..&k=10&target=operations|parameters；POST /related 批量查询"""
+
+        def _send(self, status: int, body) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _answer(self, q: dict):
+            for key in ("operationId", "q", "target"):
+                if q.get(key) is not None and not isinstance(q[key], str):
+                    raise ValueError(f"{key} 需为字符串")
+            try:
+                k = int(q.get("k", TOP_K))
+            except (TypeError, ValueError):
+                raise ValueError(f"k 需为整数：{q.get('k')!r}")
+            return index.query(q.get("operationId"), q.get("q"), k, q.get("target") or "operations")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                if url.path == "/health":
+                    self._send(200, {"status": "ok"})
+                elif url.path == "/stats":
+                    self._send(200, index.stats())
+                elif url.path == "/related":
+                    params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                    self._send(200, self._answer(params))
+                else:
+                    self._send(404, {"error": f"未知路径：{url.path}"})
+            except KeyError as e:
+                self._send(404, {"error": str(e.args[0])})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+
+        def do_POST(self):
+            """请求体：{"queries": [{"operationId": ..} 或 {"q": ..}, ...], "k": 10, "target": ..}"""
+            if urlparse(self.path).path != "/related":
+                self._send(404, {"error": f"未知路径：{self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("请求体需为 JSON 对象")
+                queries = body.get("queries", [])
+                if not isinstance(queries, list):
+                    raise ValueError("queries 需为数组")
+                defaults = {key: body[key] for key in ("k", "target") if key in body}
+                results = []
+                for q in queries:
+                    if not isinstance(q, dict):
+                        results.append({"error": "查询项需为 JSON 对象"})
+                        continue
+                    try:
+                        results.append({"results": self._answer({**defaults, **q})})
+                    except (KeyError, ValueError) as e:
+                        results.append({"error": str(e.args[0] if isinstance(e, KeyError) else e)})
+                self._send(200, results)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            # 每次查询都打印访问日志会拖慢高频调用
+            pass
+
+    return Handler
+
+
+def serve(index: QueryIndex, host: str = HOST, port: int = PORT) -> None:
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    print(f"🚀 查询服务已启动：http://{host}:{port}/related?operationId=...（Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=Path, default=OPS_FILE, help="operations.json")
+    parser.add_argument("--emb", type=Path, default=EMB_FILE, help="operation 向量（float32 / float16 / int8）")
+    parser.add_argument("--param-meta", type=Path, default=PARAM_META_FILE, help="参数描述元数据")
+    parser.add_argument("--param-emb", type=Path, default=PARAM_EMB_FILE, help="参数描述向量")
+    parser.add_argument("--param-unique-emb", type=Path, default=PARAM_UNIQUE_EMB_FILE, help="参数描述唯一向量（--dedup 输出）")
+    parser.add_argument("--param-index", type=Path, default=PARAM_INDEX_FILE, help="参数 → 唯一向量下标（--dedup 输出）")
+    parser.add_argument("--model", default=QWEN3, help="文本查询使用的模型（需与生成向量的模型一致）")
+    parser.add_argument("--pooling", choices=["mean", "lasttoken", "cls", "auto"], default=None,
+                        help="文本查询的池化方式，需与生成向量时的 --pooling 一致（默认 mean）")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="查询向量 LRU 缓存条数")
+    parser.add_argument("--no-warm-up", action="store_true", help="启动时不预加载模型（只做 operationId 查询时可用）")
+    args = parser.parse_args()
+
+    index = QueryIndex.load(args.ops, args.emb, args.param_meta, args.param_emb,
+                            args.param_unique_emb, args.param_index,
+                            model_name=args.model, cache_size=args.cache_size, pooling=args.pooling)
+    print(f"✅ 已加载 {len(index.operations)} 个接口、{len(index.params)} 个参数描述")
+    if not args.no_warm_up:
+        index.warm_up()
+    serve(index, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
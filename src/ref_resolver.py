@@ -0,0 +1,113 @@
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional
+
+
+class FrozenDict(dict):
+    """只读字典：解析结果在多个引用处共享，禁止原地修改"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("解析后的 schema 为只读共享对象，请复制后再修改")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(node: Any) -> Any:
+    """递归转换为只读结构（dict → FrozenDict，list → tuple）"""
+    if isinstance(node, FrozenDict):
+        return node
+    if isinstance(node, dict):
+        return FrozenDict((k, freeze(v)) for k, v in node.items())
+    if isinstance(node, (list, tuple)):
+        return tuple(freeze(v) for v in node)
+    return node
+
+
+def walk_pointer(node: Any, parts: List[str]) -> Optional[Any]:
+    """沿 JSON Pointer 的各段逐级查找，找不到返回 None"""
+    for part in parts:
+        part = part.replace("~1", "/").replace("~0", "~")
+        if isinstance(node, Mapping) and part in node:
+            node = node[part]
+        elif isinstance(node, list) and part.isdigit() and int(part) < len(node):
+            node = node[int(part)]
+        else:
+            return None
+    return node
+
+
+class SchemaResolver:
+    """OpenAPI 本地 $ref 解析器：按引用路径记忆化，每个被引用的组件只在首次用到时解析一次，可检测循环引用"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self._targets: Dict[str, Any] = {}     # 引用路径 → 原始目标节点
+        self._shallow: Dict[str, Any] = {}     # 引用路径 → 浅解析结果
+        self._expanded: Dict[str, Any] = {}    # 引用路径 → 完全展开结果
+        self._expanding: set = set()           # 正在展开的引用路径，用于检测循环
+        self.cycles: set = set()               # 发现的循环引用路径
+
+    def lookup(self, ref: str) -> Optional[Any]:
+        """按 JSON Pointer 查找引用目标（只支持本文件内的 #/... 引用），找不到返回 None"""
+        if ref not in self._targets:
+            node: Any = None
+            if ref.startswith("#/"):
+                node = walk_pointer(self.spec, ref[2:].split("/"))
+            self._targets[ref] = node
+        return self._targets[ref]
+
+    def resolve_shallow(self, schema: Any) -> Any:
+        """只解析顶层引用与数组 items（不展开 properties），返回新的只读对象，不修改原组件"""
+        if not isinstance(schema, dict):
+            return schema
+        ref = schema.get("$ref")
+        if isinstance(ref, str):
+            if ref in self._shallow:
+                return self._shallow[ref]
+            if ref in self._expanding:
+                self.cycles.add(ref)
+                return freeze(schema)
+            target = self.lookup(ref)
+            if not target:
+                return schema
+            self._expanding.add(ref)
+            try:
+                resolved = self.resolve_shallow(target)
+            finally:
+                self._expanding.discard(ref)
+            self._shallow[ref] = resolved = freeze(resolved)
+            return resolved
+
+        if schema.get("type") == "array" and isinstance(schema.get("items"), dict):
+            return FrozenDict({**freeze(schema), "items": self.resolve_shallow(schema["items"])})
+        return schema
+
+    def expand(self, node: Any) -> Any:
+        """完全展开所有 $ref，返回只读共享结构；循环引用处保留原 $ref 节点"""
+        if isinstance(node, list):
+            return tuple(self.expand(v) for v in node)
+        if not isinstance(node, dict):
+            return node
+
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            if ref in self._expanded:
+                return self._expanded[ref]
+            target = self.lookup(ref)
+            if target is None:
+                return freeze(node)
+            if ref in self._expanding:
+                self.cycles.add(ref)
+                return freeze(node)
+            self._expanding.add(ref)
+            try:
+                expanded = self.expand(target)
+            finally:
+                self._expanding.discard(ref)
+            self._expanded[ref] = expanded
+            return expanded
+
+        return FrozenDict((k, self.expand(v)) for k, v in node.items())
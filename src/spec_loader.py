@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import pickle
+import yaml
+from pathlib import Path
+from typing import Any, Dict
+
+SNAPSHOT_DIR = Path("outputs/spec_cache")
+INDEX_FILE = SNAPSHOT_DIR / "index.json"
+
+# 有 libyaml 时使用 C 实现的解析器，速度快一个数量级
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 进程内缓存：(绝对路径, 大小, 修改时间) → 已解析的 spec
+_MEMORY: Dict[tuple, Dict[str, Any]] = {}
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_spec_file(path: Path) -> Dict[str, Any]:
+    """直接解析 YAML / JSON 文件，不经过快照"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            return json.load(f)
+        return yaml.load(f, Loader=YAML_LOADER)
+
+
+def _load_index() -> Dict[str, Any]:
+    if INDEX_FILE.exists():
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_index(index: Dict[str, Any]) -> None:
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_file = INDEX_FILE.with_suffix(".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_file, INDEX_FILE)
+
+
+def fingerprint(path) -> str:
+    """文件内容的 sha256；大小与修改时间未变时直接读索引，不重新计算"""
+    path = Path(path)
+    stat = path.stat()
+    key = str(path.resolve())
+    index = _load_index()
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    sha256 = file_sha256(path)
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    _save_index(index)
+    # 同一文件的旧快照不再需要
+    if entry and entry["sha256"] != sha256:
+        old = SNAPSHOT_DIR / f"{path.stem}-{entry['sha256'][:16]}.pickle"
+        if old.exists():
+            old.unlink()
+    return sha256
+
+
+def load_spec(path, use_snapshot: bool = True) -> Dict[str, Any]:
+    """加载 OpenAPI 文件：首次解析后写入按内容哈希命名的 pickle 快照，之后直接读快照
+
+    返回的 dict 在进程内共享，调用方不要原地修改。
+    """
+    path = Path(path)
+    stat = path.stat()
+    memory_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if memory_key in _MEMORY:
+        return _MEMORY[memory_key]
+    if not use_snapshot:
+        return parse_spec_file(path)
+
+    snapshot = SNAPSHOT_DIR / f"{path.stem}-{fingerprint(path)[:16]}.pickle"
+    spec = None
+    if snapshot.exists():
+        try:
+            with open(snapshot, "rb") as f:
+                spec = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️  快照读取失败，重新解析: {e}")
+    if spec is None:
+        spec = parse_spec_file(path)
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_file = snapshot.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, snapshot)
+        print(f"📦 已解析 {path} 并写入快照 {snapshot}")
+
+    _MEMORY[memory_key] = spec
+    return spec
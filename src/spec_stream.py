@@ -0,0 +1,206 @@
+import argparse
+import json
+import yaml
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import instrumentation
+from ref_resolver import SchemaResolver, walk_pointer
+from spec_loader import YAML_LOADER
+
+INPUT_FILE = Path("data/openapi.yaml")
+CHUNK_SIZE = 1 << 20
+
+_START = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+_END = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+
+
+def _skip(events, event):
+    """跳过以 event 开头的整个节点，返回节点的最后一个事件"""
+    depth = int(isinstance(event, _START))
+    while depth:
+        event = next(events)
+        if isinstance(event, _START):
+            depth += 1
+        elif isinstance(event, _END):
+            depth -= 1
+    return event
+
+
+def _span(events, event) -> Tuple[int, int, int]:
+    """节点在文件中的 (起始, 结束, 缩进)，位置按字符计；块结构单独解析时需要补回原缩进"""
+    end = _skip(events, event)
+    block = isinstance(event, _START) and not event.flow_style
+    return event.start_mark.index, end.end_mark.index, event.start_mark.column if block else 0
+
+
+def _mapping_items(events):
+    """逐个产出当前映射的 (键, 值的起始事件)；调用方需在下一次迭代前消费完值节点"""
+    while True:
+        event = next(events)
+        if isinstance(event, yaml.MappingEndEvent):
+            return
+        yield event.value, next(events)
+
+
+def _byte_offsets(path: Path, positions) -> Dict[int, int]:
+    """字符位置 → 字节偏移，分块顺序读取一遍文件；纯 ASCII 文件两者相同"""
+    targets = iter(sorted(positions))
+    target = next(targets, None)
+    result = {}
+    n_chars = n_bytes = 0
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        while target is not None:
+            chunk = f.read(CHUNK_SIZE)
+            while target is not None and target <= n_chars + len(chunk):
+                result[target] = n_bytes + len(chunk[:target - n_chars].encode("utf-8"))
+                target = next(targets, None)
+            if not chunk:
+                break
+            n_chars += len(chunk)
+            n_bytes += len(chunk.encode("utf-8"))
+    return result
+
+
+class ComponentTable(Mapping):
+    """按需加载的公共组件表（如 components/schemas）：只保存位置，组件首次被访问时才从文件读出并缓存"""
+
+    def __init__(self, stream: "SpecStream", spans: Dict[str, tuple]):
+        self._stream = stream
+        self._spans = spans
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._loaded:
+            self._loaded[name] = self._stream.load(self._spans[name])
+        return self._loaded[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._spans
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    @property
+    def n_loaded(self) -> int:
+        return len(self._loaded)
+
+
+class SpecStream:
+    """基于 YAML 事件流的 OpenAPI 读取，整个 spec 不会同时驻留内存
+
+    构造时顺序扫描一遍事件，只记下每个 path 条目和公共组件在文件中的位置；
+    paths() 每次只解析一个 path 条目，$ref 用到的组件才从文件读出（见 ComponentTable）。
+    JSON 是 YAML 的子集，同样走事件扫描，片段直接用 json 模块解析。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.keys: List[str] = []                        # 顶层字段
+        self.path_spans: List[Tuple[str, tuple]] = []    # (path, 位置)，保持文件顺序
+        self._component_spans: Dict[str, Dict[str, tuple]] = {}
+        self._file = None
+        self._scan()
+        self.sections = {section: ComponentTable(self, spans)
+                         for section, spans in self._component_spans.items()}
+
+    def _scan(self) -> None:
+        with open(self.path, "rb") as f:
+            events = yaml.parse(f, Loader=YAML_LOADER)
+            next(events), next(events)  # StreamStart / DocumentStart
+            if not isinstance(next(events), yaml.MappingStartEvent):
+                raise ValueError(f"{self.path} 顶层不是映射，不是 OpenAPI 文件")
+            for key, event in _mapping_items(events):
+                self.keys.append(key)
+                if key == "paths" and isinstance(event, yaml.MappingStartEvent):
+                    for path, value in _mapping_items(events):
+                        self.path_spans.append((path, _span(events, value)))
+                elif key == "components" and isinstance(event, yaml.MappingStartEvent):
+                    for section, value in _mapping_items(events):
+                        if not isinstance(value, yaml.MappingStartEvent):
+                            _skip(events, value)
+                            continue
+                        self._component_spans[section] = {name: _span(events, node)
+                                                          for name, node in _mapping_items(events)}
+                else:
+                    _skip(events, event)
+
+        # 事件位置按字符计，转换为字节偏移后才能 seek
+        spans = [span for _, span in self.path_spans]
+        spans += [span for table in self._component_spans.values() for span in table.values()]
+        offsets = _byte_offsets(self.path, {i for start, end, _ in spans for i in (start, end)})
+        self.path_spans = [(path, (offsets[start], offsets[end], indent))
+                           for path, (start, end, indent) in self.path_spans]
+        for table in self._component_spans.values():
+            for name, (start, end, indent) in table.items():
+                table[name] = (offsets[start], offsets[end], indent)
+
+    def load(self, span: tuple) -> Any:
+        """解析文件中的一个片段"""
+        start, end, indent = span
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(start)
+        text = self._file.read(end - start).decode("utf-8")
+        if self.path.suffix == ".json":
+            return json.loads(text)
+        return yaml.load(" " * indent + text, Loader=YAML_LOADER)
+
+    def paths(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按文件顺序逐个产出 (path, path 条目)，与 spec["paths"].items() 相同"""
+        for path, span in self.path_spans:
+            yield path, self.load(span) or {}
+
+    def components(self, section: str = "schemas") -> ComponentTable:
+        return self.sections.get(section) or ComponentTable(self, {})
+
+    def resolver(self) -> "StreamResolver":
+        return StreamResolver(self)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "SpecStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class StreamResolver(SchemaResolver):
+    """引用目标从 SpecStream 按需读取的 $ref 解析器，记忆化与循环检测沿用 SchemaResolver"""
+
+    def __init__(self, stream: SpecStream):
+        super().__init__({})
+        self.stream = stream
+
+    def lookup(self, ref: str):
+        if ref not in self._targets:
+            node = None
+            if ref.startswith("#/"):
+                node = walk_pointer({"components": self.stream.sections}, ref[2:].split("/"))
+            self._targets[ref] = node
+        return self._targets[ref]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spec", type=Path, nargs="?", default=INPUT_FILE, help="OpenAPI 文件（YAML / JSON）")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    from parse_openapi import iter_operations
+
+    with instrumentation.run_from_args("spec_stream", args):
+        with instrumentation.stage("scan"):
+            stream = SpecStream(args.spec)
+        with stream, instrumentation.stage("operations"):
+            n_ops = sum(1 for _ in iter_operations(stream.paths()))
+    sections = "，".join(f"{name} {len(table)} 个" for name, table in stream.sections.items())
+    print(f"✅ {args.spec}：{len(stream.path_spans)} 个 path，{n_ops} 个接口；公共组件：{sections or '无'}")
@@ -0,0 +1,237 @@
+import re
+import zlib
+import random
+import argparse
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+
+OUTPUT_DIR = Path("outputs/synthetic")
+STUB_DIM = 256
+OPS_PER_RESOURCE = 5    # 列表 / 创建 / 查询 / 更新 / 删除
+VARIANTS_PER_TAG = 10   # 每个标签覆盖的资源变体数，约 50 个接口一个标签
+VOCAB_SIZE = 5000       # 描述中随机词的词表大小
+CONTEXT_WORDS = 3
+
+# GitLab 风格的资源族：(复数路径段, 单数名, 父资源)
+FAMILIES = [
+    ("badges", "badge", "projects"), ("branches", "branch", "projects"), ("issues", "issue", "projects"),
+    ("merge_requests", "merge request", "projects"), ("pipelines", "pipeline", "projects"),
+    ("jobs", "job", "projects"), ("members", "member", "groups"), ("labels", "label", "groups"),
+    ("milestones", "milestone", "groups"), ("variables", "variable", "projects"), ("hooks", "hook", "projects"),
+    ("deployments", "deployment", "projects"), ("environments", "environment", "projects"),
+    ("releases", "release", "projects"), ("tags", "tag", "projects"), ("commits", "commit", "projects"),
+    ("notes", "note", "projects"), ("snippets", "snippet", "projects"), ("runners", "runner", "groups"),
+    ("packages", "package", "projects"), ("clusters", "cluster", "groups"), ("epics", "epic", "groups"),
+    ("wikis", "wiki page", "projects"), ("access_requests", "access request", "groups"),
+    ("boards", "board", "groups"), ("registries", "registry repository", "projects"),
+]
+
+# 拼接资源变体名称用的音节，使同族不同变体的文本有区分度
+SYLLABLES = ["ka", "lo", "mi", "ter", "va", "nu", "sol", "ri", "den", "po", "zu", "gar", "fe", "quin", "bo", "ly"]
+
+FLAGS = ["notifications", "approvals", "cleanup", "mirroring", "scanning", "caching", "archiving", "webhooks"]
+
+SHARED_PARAMETERS = {
+    "ProjectIdOrPath": {"name": "id", "in": "path", "required": True,
+                        "description": "The ID or URL-encoded path of the project",
+                        "schema": {"anyOf": [{"type": "string"}, {"type": "integer"}]}},
+    "GroupIdOrPath": {"name": "id", "in": "path", "required": True,
+                      "description": "The ID or URL-encoded path of the group owned by the authenticated user",
+                      "schema": {"type": "string"}},
+    "Page": {"name": "page", "in": "query", "description": "Current page number",
+             "schema": {"type": "integer", "format": "int32", "default": 1}},
+    "PerPage": {"name": "per_page", "in": "query", "description": "Number of items per page",
+                "schema": {"type": "integer", "format": "int32", "default": 20}},
+    "Search": {"name": "search", "in": "query", "description": "Return list of items matching the search criteria",
+               "schema": {"type": "string"}},
+}
+
+SHARED_SCHEMAS = {
+    "API_Entities_Namespace": {"type": "object", "properties": {
+        "id": {"type": "integer"}, "name": {"type": "string"}, "path": {"type": "string"},
+        "kind": {"type": "string"}, "full_path": {"type": "string"}}},
+    "API_Entities_UserBasic": {"type": "object", "properties": {
+        "id": {"type": "integer"}, "username": {"type": "string"}, "name": {"type": "string"},
+        "state": {"type": "string"}, "web_url": {"type": "string"}}},
+    "API_Entities_BasicProjectDetails": {"type": "object", "properties": {
+        "id": {"type": "integer"}, "name": {"type": "string"}, "path_with_namespace": {"type": "string"},
+        "namespace": {"$ref": "#/components/schemas/API_Entities_Namespace"}}},
+}
+
+
+def _camel(text: str) -> str:
+    return "".join(part.capitalize() for part in re.split(r"[_\s]+", text) if part)
+
+
+def variant_word(variant: int) -> str:
+    """变体序号 → 确定性的合成单词（"kalo"、"miter" ...），0 号变体不加限定"""
+    if not variant:
+        return ""
+    syllables = []
+    while variant:
+        variant, k = divmod(variant - 1, len(SYLLABLES))
+        syllables.append(SYLLABLES[k])
+    return "".join(reversed(syllables)) if len(syllables) > 1 else syllables[0] + "x"
+
+
+def resource_names(n_resources: int) -> list[tuple]:
+    """第 k 个资源变体：(资源族, 限定词, 变体序号)，先遍历资源族再遍历变体，保证确定性"""
+    return [(FAMILIES[k % len(FAMILIES)], variant_word(k // len(FAMILIES)), k // len(FAMILIES))
+            for k in range(n_resources)]
+
+
+def generate_spec(n_operations: int, seed: int = 0) -> dict:
+    """生成 GitLab 形状的 OpenAPI 3.0 spec：共享参数 / schema 的 $ref 复用，实体间随机互相引用（扇出）"""
+    rng = random.Random(seed)
+    n_resources = -(-n_operations // OPS_PER_RESOURCE)
+    schemas = {name: dict(schema) for name, schema in SHARED_SCHEMAS.items()}
+    paths = {}
+    tags = {}
+    entity_names = []
+    count = 0
+
+    for (plural, singular, parent), qualifier, variant in resource_names(n_resources):
+        suffix = f"_{variant}" if variant else ""
+        segment = f"{plural}{suffix}"
+        noun = f"{qualifier} {singular}".strip()
+        nouns = f"{qualifier} {plural.replace('_', ' ')}".strip()
+        # 同一资源的接口共享几个上下文词，每个接口再带少量自己的词，模拟真实描述的多样性
+        context = " ".join(variant_word(rng.randrange(1, VOCAB_SIZE)) for _ in range(CONTEXT_WORDS))
+        tag = f"{plural}{'_' + str(variant // VARIANTS_PER_TAG) if variant >= VARIANTS_PER_TAG else ''}"
+        tags.setdefault(tag, {"name": tag, "description": f"Operations about {plural}"})
+        parent_param = "ProjectIdOrPath" if parent == "projects" else "GroupIdOrPath"
+        parent_word = "project" if parent == "projects" else "group"
+        item_param = f"{singular.split()[-1]}_id"
+
+        entity = f"API_Entities_{_camel(singular)}{_camel(qualifier)}{variant or ''}"
+        properties = {
+            "id": {"type": "integer", "description": f"The ID of the {noun}"},
+            "name": {"type": "string", "description": f"The name of the {noun}"},
+            "description": {"type": "string"},
+            "created_at": {"type": "string", "format": "date-time"},
+            "author": {"$ref": "#/components/schemas/API_Entities_UserBasic"},
+            parent_word: {"$ref": "#/components/schemas/API_Entities_BasicProjectDetails"},
+        }
+        # 扇出：随机引用已有的其他实体
+        for other in rng.sample(entity_names, min(len(entity_names), rng.randint(0, 3))):
+            properties[other.removeprefix("API_Entities_").lower()] = {"$ref": f"#/components/schemas/{other}"}
+        schemas[entity] = {"type": "object", "properties": properties, "description": f"{entity} model"}
+        entity_names.append(entity)
+
+        ref = {"$ref": f"#/components/schemas/{entity}"}
+        base = f"/{parent}/{{id}}/{segment}"
+        parent_ref = {"$ref": f"#/components/parameters/{parent_param}"}
+        item = {"name": item_param, "in": "path", "required": True,
+                "description": f"The ID of the {noun}", "schema": {"type": "integer", "format": "int32"}}
+        body = {"content": {"application/json": {"schema": {"type": "object", "required": ["name"], "properties": {
+            "name": {"type": "string", "description": f"The name of the {noun}"},
+            "description": {"type": "string", "description": f"The description of the {noun}"},
+            rng.choice(FLAGS) + "_enabled": {"type": "boolean",
+                                             "description": f"Enable {rng.choice(FLAGS)} for the {nouns}"},
+        }}}}}
+        op_id = f"ApiV4{_camel(parent)}Id{_camel(segment)}"
+
+        def op(method, summary, description, params, responses, request_body=None, item_op=False):
+            extra = " ".join(variant_word(rng.randrange(1, VOCAB_SIZE)) for _ in range(CONTEXT_WORDS))
+            description = f"{description}. Used by {context} {extra}"
+            result = {"tags": [tag], "summary": summary, "description": description,
+                      "operationId": f"{method}{op_id}{_camel(item_param) if item_op else ''}",
+                      "parameters": params, "responses": responses}
+            if request_body:
+                result["requestBody"] = request_body
+            return result
+
+        def ok(code, schema, text):
+            return {code: {"description": text, "content": {"application/json": {"schema": schema}}},
+                    "404": {"description": "Not found", "content": {}}}
+
+        collection = {
+            "get": op("get", f"List {nouns} of a {parent_word}", f"Get a list of {nouns} for the {parent_word}",
+                      [parent_ref, {"$ref": "#/components/parameters/Page"},
+                       {"$ref": "#/components/parameters/PerPage"}, {"$ref": "#/components/parameters/Search"}],
+                      ok("200", {"type": "array", "items": ref}, f"List {nouns}")),
+            "post": op("post", f"Create a {noun}", f"Create a new {noun} in the {parent_word}",
+                       [parent_ref], ok("201", ref, f"Create a {noun}"), body),
+        }
+        member = {
+            "get": op("get", f"Get a single {noun}", f"Get details of a single {noun}",
+                      [parent_ref, item], ok("200", ref, f"Get a {noun}"), item_op=True),
+            "put": op("put", f"Update a {noun}", f"Update an existing {noun}",
+                      [parent_ref, item], ok("200", ref, f"Update a {noun}"), body, item_op=True),
+            "delete": op("delete", f"Delete a {noun}", f"Remove a {noun} from the {parent_word}",
+                         [parent_ref, item], {"204": {"description": f"Delete a {noun}", "content": {}}},
+                         item_op=True),
+        }
+        for path, methods in ((base, collection), (f"{base}/{{{item_param}}}", member)):
+            for method in list(methods):
+                if count >= n_operations:
+                    del methods[method]
+                else:
+                    count += 1
+            if methods:
+                paths[path] = methods
+
+    return {
+        "openapi": "3.0.1",
+        "info": {"title": "GitLab API (synthetic)", "version": "v4"},
+        "servers": [{"url": "https://gitlab.example.com/api/v4"}],
+        "security": [{"ApiKeyAuth": []}],
+        "tags": list(tags.values()),
+        "paths": paths,
+        "components": {
+            "parameters": SHARED_PARAMETERS,
+            "schemas": schemas,
+            "securitySchemes": {"ApiKeyAuth": {"type": "apiKey", "in": "header", "name": "Private-Token"}},
+        },
+    }
+
+
+def stub_embed(texts: list[str], dim: int = STUB_DIM) -> np.ndarray:
+    """确定性的词袋随机投影向量，代替模型做基准测试：共享词越多余弦越高，无需模型权重"""
+    vocab = {}
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            rows.append(i)
+            cols.append(vocab.setdefault(token, len(vocab)))
+    counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                               shape=(len(texts), max(len(vocab), 1)))
+    # 每个词的投影向量只由词本身决定，与出现顺序无关
+    basis = np.zeros((max(len(vocab), 1), dim), dtype=np.float32)
+    for token, k in vocab.items():
+        basis[k] = np.random.default_rng(zlib.crc32(token.encode("utf-8"))).standard_normal(dim)
+    emb = np.asarray(counts @ basis, dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return emb / norms
+
+
+def save_spec(spec: dict, path: Path) -> None:
+    """写出 YAML；共享的对象逐处展开，不使用 YAML 锚点，与真实 spec 的形态一致"""
+    import yaml
+
+    class Dumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
+        def ignore_aliases(self, data):
+            return True
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(spec, f, Dumper=Dumper, sort_keys=False, allow_unicode=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("n", type=int, help="接口数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=None, help="输出的 YAML 文件")
+    args = parser.parse_args()
+
+    spec = generate_spec(args.n, args.seed)
+    out = args.out or OUTPUT_DIR / f"openapi_{args.n}.yaml"
+    save_spec(spec, out)
+    print(f"✅ 已生成 {args.n} 个接口的 spec：{out}")
+
+
+if __name__ == "__main__":
+    main()
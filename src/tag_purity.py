@@ -1,49 +1,153 @@
 import json
+import sys
+import argparse
 import numpy as np
 from pathlib import Path
 from collections import Counter
+from scipy import sparse
+
+import instrumentation
+from graph import as_graph, load_graph
+
+RESULT_FILE = Path("outputs/tag_purity_result.txt")
 
 def load(file: Path):
     with open(file, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def tag_purity(dep_file: Path, ops_file: Path):
-    dep = load(dep_file)
-    ops = load(ops_file)
-    # 建立 id → tags 映射
-    id2tags = {op["operationId"]: set(op["tags"]) for op in ops}
-
-    purity = []
-    for op, neighbors in dep.items():
-        if not neighbors:
-            continue
-        op_tags = id2tags[op]
-        # 邻居所有标签（去重）
-        neigh_tags = set(t for n in neighbors for t in id2tags[n["operationId"]])
-        if not neigh_tags:
-            continue
-        purity.append(len(op_tags & neigh_tags) / len(neigh_tags))
-    return np.mean(purity) if purity else 0.0
+    return purity_of(load_graph(dep_file), load(ops_file))
 
-def main():
-    ops_file = Path("outputs/operations.json")
-    mini_dep = Path("outputs/dependencies.json")
-    qwen_dep = Path("outputs/dependencies_qwen3.json")
+def tag_incidence(ops: list, ids=None) -> sparse.csr_matrix:
+    """operation × tag 的 0/1 稀疏关联矩阵，行顺序与 ids（默认 ops 顺序）一致"""
+    id2tags = {op["operationId"]: op["tags"] for op in ops}
+    ids = [op["operationId"] for op in ops] if ids is None else [str(op_id) for op_id in ids]
+    vocab = {t: k for k, t in enumerate(sorted({t for op in ops for t in op["tags"]}))}
+    rows = [i for i, op_id in enumerate(ids) for _ in set(id2tags[op_id])]
+    cols = [vocab[t] for op_id in ids for t in set(id2tags[op_id])]
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                             shape=(len(ids), max(len(vocab), 1)))
 
-    mini_pur = tag_purity(mini_dep, ops_file)
-    qwen_pur = tag_purity(qwen_dep, ops_file)
+def adjacency(graph, threshold: float | None = None) -> sparse.csr_matrix:
+    """依赖图的 0/1 邻接矩阵；给定 threshold 时只保留相似度 >= threshold 的边"""
+    data = np.ones(graph.n_edges, dtype=np.float32)
+    if threshold is not None:
+        data *= np.asarray(graph.scores) >= np.float64(threshold)
+    # 内存映射的图是只读的，eliminate_zeros 会原地改写下标，需复制一份
+    adj = sparse.csr_matrix((data, np.asarray(graph.indices), np.asarray(graph.indptr)),
+                            shape=(len(graph), len(graph)), copy=True)
+    adj.eliminate_zeros()
+    return adj
+
+def node_purity(dep, incidence: sparse.csr_matrix, threshold: float | None = None,
+                skip_untagged: bool = True) -> np.ndarray:
+    """每个节点的纯度 = |自身标签 ∩ 邻居标签并集| / |邻居标签并集|，无邻居的节点为 NaN
+
+    邻居都没有标签（并集为空）的节点默认也为 NaN，不计入平均；skip_untagged=False 时记为 0（阈值曲线的口径）。
+
+    邻接矩阵 × 关联矩阵得到每个节点的邻居标签计数，非零即属于并集，全程是稀疏矩阵运算。
+    """
+    adj = adjacency(as_graph(dep), threshold)
+    neigh_tags = adj @ incidence
+    neigh_tags.data[:] = 1
+    union = np.asarray(neigh_tags.sum(axis=1)).ravel()
+    inter = np.asarray(neigh_tags.multiply(incidence).sum(axis=1)).ravel()
+    purity = inter.astype(np.float64) / np.maximum(union, 1)
+    purity[adj.getnnz(axis=1) == 0] = np.nan
+    if skip_untagged:
+        purity[union == 0] = np.nan
+    return purity
+
+def purity_stats(purity: np.ndarray) -> dict:
+    """单个图的汇总：平均纯度、有邻居的节点数、纯度为 1 的节点占比、最低纯度"""
+    valid = purity[~np.isnan(purity)]
+    return {
+        "purity": float(valid.mean()) if len(valid) else 0.0,
+        "nodes": int(len(valid)),
+        "pure_ratio": float((valid == 1).mean()) if len(valid) else 0.0,
+        "min": float(valid.min()) if len(valid) else 0.0,
+    }
+
+def purity_report(graphs: dict, ops: list, thresholds=None, skip_untagged: bool = True) -> dict:
+    """一次计算多个图 / 多个阈值的纯度：名称 → [{thresh, purity, nodes, ...}]
+
+    节点表相同的图共用一份关联矩阵；thresholds 为 None 时使用图中的全部边。
+    """
+    report, incidences = {}, {}
+    for name, dep in graphs.items():
+        graph = as_graph(dep)
+        key = tuple(str(op_id) for op_id in graph.ids)
+        if key not in incidences:
+            incidences[key] = tag_incidence(ops, key)
+        report[name] = [{"thresh": t, **purity_stats(node_purity(graph, incidences[key], t, skip_untagged))}
+                        for t in (thresholds if thresholds is not None else [None])]
+    return report
 
-    out = Path("outputs/tag_purity_result.txt")
+def purity_of(dep, ops: list) -> float:
+    """对内存中的依赖图（JSON 结构或 Graph）计算模块纯度"""
+    graph = as_graph(dep)
+    return purity_stats(node_purity(graph, tag_incidence(ops, graph.ids)))["purity"]
+
+def gate(dep_files: list[Path], ops_file: Path, min_purity: float, thresholds=None) -> bool:
+    """CI 质量门：所有图（及阈值）的纯度都不低于 min_purity 时返回 True"""
+    report = purity_report({str(f): load_graph(f) for f in dep_files}, load(ops_file), thresholds)
+    ok = True
+    for name, rows in report.items():
+        for r in rows:
+            passed = r["purity"] >= min_purity
+            ok &= passed
+            thresh = "" if r["thresh"] is None else f" @ {r['thresh']:.2f}"
+            print(f"{'✅' if passed else '❌'} {name}{thresh} 纯度={r['purity']:.3f} 节点={r['nodes']}")
+    return ok
+
+def write_result(mini_pur: float | None, qwen_pur: float, out: Path = RESULT_FILE) -> None:
+    """写出两个模型的纯度对比；没有 MiniLM 结果时只写 Qwen3 一行"""
     with open(out, "w", encoding="utf-8") as f:
-        f.write(f"MiniLM 模块纯度：{mini_pur:.3f}\n")
+        if mini_pur is not None:
+            f.write(f"MiniLM 模块纯度：{mini_pur:.3f}\n")
         f.write(f"Qwen3  模块纯度：{qwen_pur:.3f}\n")
+        if mini_pur is None:
+            return
         if qwen_pur > mini_pur:
             f.write("→ Qwen3 更能把同模块 API 聚到一起 ✅\n")
         else:
             f.write("→ MiniLM 更优 ✅\n")
+
+
+def read_result(out: Path = RESULT_FILE) -> dict:
+    """读取结果文件中的 {模型: 纯度}"""
+    result = {}
+    with open(out, "r", encoding="utf-8") as f:
+        for line in f:
+            if "模块纯度：" in line:
+                name, value = line.split("模块纯度：")
+                result[name.strip()] = float(value)
+    return result
+
+
+def main():
+    ops_file = Path("outputs/operations.json")
+    mini_dep = Path("outputs/dependencies.json")
+    qwen_dep = Path("outputs/dependencies_qwen3.json")
+
+    mini_pur = tag_purity(mini_dep, ops_file)
+    qwen_pur = tag_purity(qwen_dep, ops_file)
+
+    out = RESULT_FILE
+    write_result(mini_pur, qwen_pur, out)
     print(f"✅ 结果已保存至：{out}")
     print(f"MiniLM 模块纯度：{mini_pur:.3f}")
     print(f"Qwen3  模块纯度：{qwen_pur:.3f}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("deps", nargs="*", type=Path, help="依赖图（.json / .npz）；不给时对比 MiniLM 与 Qwen3")
+    parser.add_argument("--ops", type=Path, default=Path("outputs/operations.json"), help="operation 列表")
+    parser.add_argument("--min-purity", type=float, default=0.0, help="纯度下限，低于则以非零状态退出")
+    parser.add_argument("--thresholds", type=float, nargs="*", default=None, help="额外按这些阈值过滤边")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("tag_purity", args):
+        passed = gate(args.deps, args.ops, args.min_purity, args.thresholds) if args.deps else main()
+    if args.deps:
+        sys.exit(0 if passed else 1)
\ No newline at end of file
@@ -1,9 +1,14 @@
 import json
 import numpy as np
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
 import argparse
 
+import instrumentation
+from instrumentation import stage
+from tag_purity import purity_report
+from threshold_sweep import sweep
+from quantized import open_embeddings
+
 OPS_FILE   = Path("outputs/operations.json")
 EMB_FILE   = Path("outputs/embeddings_qwen3.npy")   # 用 Qwen3 向量
 OUT_FILE   = Path("outputs/threshold_curve_qwen3.txt")
@@ -13,47 +18,45 @@ def load(file: Path):
         return json.load(f)
 
 def purity_at_threshold(threshold: float, dep: dict, ops: list) -> float:
-    id2tags = {op["operationId"]: set(op["tags"]) for op in ops}
-    purity = []
-    for op, neighbors in dep.items():
-        neigh = [n for n in neighbors if n["score"] >= threshold]
-        if not neigh:
-            continue
-        op_tags = id2tags[op]
-        neigh_tags = set(t for n in neigh for t in id2tags[n["operationId"]])
-        purity.append(len(op_tags & neigh_tags) / max(len(neigh_tags), 1))
-    return np.mean(purity) if purity else 0.0
-
-def main():
-    ops = load(OPS_FILE)
-    embeddings = np.load(EMB_FILE)
-    sim_matrix = cosine_similarity(embeddings)
-
-    # 预生成全量邻居（只算一次）
-    dep = {}
-    for i, op in enumerate(ops):
-        dep[op["operationId"]] = [
-            {"operationId": ops[j]["operationId"], "score": float(sim_matrix[i][j])}
-            for j in range(len(ops)) if i != j
-        ]
-
-    thresholds = np.arange(0.65, 0.81, 0.01)
-    results = []
-    for t in thresholds:
-        pur = purity_at_threshold(t, dep, ops)
-        neigh_cnt = [len([n for n in v if n["score"] >= t]) for v in dep.values()]
-        avg_n = np.mean(neigh_cnt)
-        total_e = sum(neigh_cnt)
-        isolates = sum(1 for n in neigh_cnt if n == 0)
-        results.append((t, pur, avg_n, total_e, isolates))
-        print(f"thresh={t:.2f} 纯度={pur:.3f} avg_n={avg_n:.2f} edges={total_e} isolates={isolates}")
-
-    # 写入文件
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
+    return purity_curve(dep, ops, [threshold])[0]
+
+def purity_curve(dep: dict, ops: list, thresholds) -> list[float]:
+    """同一依赖图在多个阈值下的纯度，关联矩阵只建一次；邻居都无标签的节点记为 0，与 sweep 一致"""
+    return [r["purity"] for r in purity_report({"dep": dep}, ops, thresholds, skip_untagged=False)["dep"]]
+
+def write_curve(results: list[dict], out_file: Path, step: float = 0.01):
+    precision = max(2, -int(np.floor(np.log10(step))))
+    with open(out_file, "w", encoding="utf-8") as f:
         f.write("thresh purity avg_n edges isolates\n")
-        for t, pur, avg_n, total_e, isolates in results:
-            f.write(f"{t:.2f} {pur:.3f} {avg_n:.2f} {total_e} {isolates}\n")
-    print(f"✅ 曲线已保存：{OUT_FILE}")
+        for r in results:
+            f.write(f"{r['thresh']:.{precision}f} {r['purity']:.3f} {r['avg_n']:.2f} "
+                    f"{r['edges']} {r['isolates']}\n")
+
+def main(emb_file: Path = EMB_FILE, out_file: Path = OUT_FILE,
+         start: float = 0.65, stop: float = 0.81, step: float = 0.01):
+    ops = load(OPS_FILE)
+    embeddings = open_embeddings(emb_file)
+
+    # 所有阈值在一次遍历中算完，阈值可以取得很密
+    thresholds = np.arange(start, stop, step)
+    with stage("sweep"):
+        results = sweep(embeddings, ops, thresholds)
+    if len(results) <= 100:
+        for r in results:
+            print(f"thresh={r['thresh']:.2f} 纯度={r['purity']:.3f} avg_n={r['avg_n']:.2f} "
+                  f"edges={r['edges']} isolates={r['isolates']}")
+
+    write_curve(results, out_file, step)
+    print(f"✅ 曲线已保存：{out_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emb", type=Path, default=EMB_FILE, help="embedding 文件")
+    parser.add_argument("--out", type=Path, default=OUT_FILE, help="曲线输出文件")
+    parser.add_argument("--start", type=float, default=0.65, help="起始阈值")
+    parser.add_argument("--stop", type=float, default=0.81, help="结束阈值（不含）")
+    parser.add_argument("--step", type=float, default=0.01, help="阈值步长")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("threshold_curve", args):
+        main(args.emb, args.out, args.start, args.stop, args.step)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from neighbors import normalize, iter_similarity_blocks, BLOCK_SIZE
+
+# 0~255 每个字节的 1 比特数，用于对打包后的标签位集计数
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+
+
+def tag_bitsets(operations: list) -> np.ndarray:
+    """每个 operation 的标签集合打包为位集，形状 (N, ceil(标签数 / 8)) uint8"""
+    vocab = {t: k for k, t in enumerate(sorted({t for op in operations for t in op["tags"]}))}
+    incidence = np.zeros((len(operations), max(len(vocab), 1)), dtype=bool)
+    for i, op in enumerate(operations):
+        for t in op["tags"]:
+            incidence[i, vocab[t]] = True
+    return np.packbits(incidence, axis=1)
+
+
+def sweep(embeddings: np.ndarray, operations: list, thresholds, block_size: int = BLOCK_SIZE) -> list[dict]:
+    """一次遍历算出所有阈值下的 纯度 / 平均邻居数 / 边数 / 孤立节点数
+
+    每个节点只保留相似度 >= 最小阈值的邻居，按相似度降序排序一次，邻居标签位集做前缀 OR，
+    任意阈值下的邻居集合都是某个前缀，用二分查找定位即可。
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    n = len(operations)
+    bits = tag_bitsets(operations)
+
+    edges = np.zeros(len(thresholds), dtype=np.int64)
+    isolates = np.zeros(len(thresholds), dtype=np.int64)
+    purity_sum = np.zeros(len(thresholds), dtype=np.float64)
+    purity_cnt = np.zeros(len(thresholds), dtype=np.int64)
+
+    t_min = thresholds.min() if len(thresholds) else np.inf
+    normed = normalize(embeddings)
+    for start, block in iter_similarity_blocks(normed, block_size):
+        for r, row in enumerate(block):
+            # 低于最小阈值的邻居在任何阈值下都不出现，先过滤再排序；自身为 -inf，自然被排除
+            cand = np.flatnonzero(row >= t_min)
+            order = cand[np.argsort(-row[cand], kind="stable")]
+            sorted_scores = row[order]
+            # 相似度 >= t 的邻居数，即降序数组中的前缀长度
+            k = np.searchsorted(-sorted_scores, -thresholds, side="right")
+            edges += k
+            isolates += k == 0
+            if not len(order):
+                continue
+
+            union = np.bitwise_or.accumulate(bits[order], axis=0)
+            union_cnt = _POPCOUNT[union].sum(axis=1)
+            inter_cnt = _POPCOUNT[union & bits[start + r]].sum(axis=1)
+            prefix_purity = inter_cnt / np.maximum(union_cnt, 1)
+
+            has = k > 0
+            purity_sum[has] += prefix_purity[k[has] - 1]
+            purity_cnt += has
+
+    results = []
+    for t, e, iso, p_sum, p_cnt in zip(thresholds, edges, isolates, purity_sum, purity_cnt):
+        results.append({
+            "thresh": float(t),
+            "purity": p_sum / p_cnt if p_cnt else 0.0,
+            "avg_n": e / n if n else 0.0,
+            "edges": int(e),
+            "isolates": int(iso),
+        })
+    return results
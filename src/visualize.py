@@ -1,27 +1,54 @@
 import json
-import matplotlib.pyplot as plt
-import networkx as nx
+import argparse
+import numpy as np
 from pathlib import Path
 
+import instrumentation
+from graph import as_graph, load_graph
+from graph_tiles import write_tiles, OUTPUT_DIR
+
 DEP_FILE = Path("outputs/dependencies_qwen3.json")
 OUTPUT_IMAGE = Path("outputs/dependency_graph_qwen3.png")
+OPS_FILE = Path("outputs/operations.json")
+EMB_FILE = Path("outputs/embeddings_qwen3.npy")
+
+def visualize(dep_file: Path = DEP_FILE, output_image: Path = OUTPUT_IMAGE):
+    draw(load_graph(dep_file), output_image)
+
+def visualize_fast(dep_file: Path = DEP_FILE, emb_file: Path = EMB_FILE, out_dir: Path = OUTPUT_DIR):
+    """大图模式：embedding 的 PCA 投影作布局，标签聚合为超级节点，输出按需加载的 HTML 瓦片"""
+    with open(OPS_FILE, "r", encoding="utf-8") as f:
+        operations = json.load(f)
+    write_tiles(load_graph(dep_file), operations, np.load(emb_file, mmap_mode="r"), out_dir)
 
-def visualize():
-    with open(DEP_FILE, "r", encoding="utf-8") as f:
-        deps = json.load(f)
+def draw(deps, output_image: Path = OUTPUT_IMAGE):
+    import matplotlib.pyplot as plt
+    import networkx as nx
 
+    graph = as_graph(deps)
+    ids = [str(op_id) for op_id in graph.ids]
     G = nx.DiGraph()
-    for op, related in deps.items():
-        G.add_node(op)
-        for r in related:
-            G.add_edge(op, r["operationId"])
+    G.add_nodes_from(ids)
+    G.add_edges_from((ids[i], ids[j]) for i, j in zip(graph.edge_rows(), graph.indices))
 
     plt.figure(figsize=(20, 20))
     pos = nx.spring_layout(G, k=0.5, iterations=50)
     nx.draw(G, pos, with_labels=True, node_size=100, font_size=4, alpha=0.7)
     plt.title("GitLab API Operation Dependency Graph (Semantic Similarity)")
-    plt.savefig(OUTPUT_IMAGE, dpi=300)
-    print(f"✅ Saved dependency graph to {OUTPUT_IMAGE}")
+    plt.savefig(output_image, dpi=300)
+    plt.close()
+    print(f"✅ Saved dependency graph to {output_image}")
 
 if __name__ == "__main__":
-    visualize()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dep", type=Path, default=DEP_FILE, help="依赖图（.json 或 .npz）")
+    parser.add_argument("--out", type=Path, default=None, help="输出图片（--fast 时为输出目录）")
+    parser.add_argument("--fast", action="store_true", help="大图模式：PCA 布局 + 标签超级节点 + HTML 瓦片")
+    parser.add_argument("--emb", type=Path, default=EMB_FILE, help="--fast 布局使用的 embedding 文件")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.run_from_args("visualize", args):
+        if args.fast:
+            visualize_fast(args.dep, args.emb, args.out or OUTPUT_DIR)
+        else:
+            visualize(args.dep, args.out or OUTPUT_IMAGE)
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""增量 / 流式 / 分块路径与全量计算的一致性：合成 spec + stub_embed，不需要模型权重"""
+import copy
+import json
+
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex
+from build_param_deps import SIMILARITY_THRESHOLD, iter_vector_edges
+from graph import Graph
+from incremental import diff_operations, schema_hashes, update_embeddings, update_graph
+from neighbors import normalize, threshold_neighbors
+from parse_openapi import iter_operations, operations_from_spec, save_operations
+from parse_params import (extract_operations_from_dict, extract_operations_streaming, find_dependencies,
+                          resolve_all_refs, update_dependencies)
+from spec_loader import load_spec
+from spec_stream import SpecStream
+from synthetic_spec import generate_spec, save_spec, stub_embed
+
+THRESHOLD = 0.6
+
+
+def full_graph(ops: list, embeddings: np.ndarray, threshold: float = THRESHOLD) -> Graph:
+    return Graph.from_neighbors(threshold_neighbors(embeddings, threshold), [op["operationId"] for op in ops])
+
+
+def embed_ops(ops: list) -> np.ndarray:
+    return stub_embed([op["full_text"] for op in ops])
+
+
+def test_update_graph_matches_full_rebuild():
+    ops = operations_from_spec(generate_spec(400))
+    old_ops = ops[:300]
+    new_ops = [dict(op) for op in ops[20:]]
+    # 部分接口换成另一个接口的描述（文本变化），部分只改 tags（向量可复用）
+    for k in range(0, 280, 25):
+        new_ops[k]["full_text"] = new_ops[k + 1]["full_text"] + " changed"
+    for k in range(3, 280, 40):
+        new_ops[k]["tags"] = ["moved"]
+    new_ops = new_ops[::-1]
+
+    old_embeddings = embed_ops(old_ops)
+    diff = diff_operations(old_ops, new_ops)
+    assert diff["removed"] and diff["added"] and diff["changed"] and diff["updated"]
+
+    embeddings, dirty = update_embeddings(old_ops, old_embeddings, new_ops, diff, stub_embed)
+    np.testing.assert_allclose(embeddings, embed_ops(new_ops), atol=1e-6)
+
+    graph = update_graph(full_graph(old_ops, old_embeddings), [op["operationId"] for op in new_ops],
+                         embeddings, dirty, THRESHOLD, block_size=16)
+    expected = full_graph(new_ops, embeddings)
+    assert expected.n_edges > 0
+    assert list(graph.ids) == list(expected.ids)
+    np.testing.assert_array_equal(graph.indptr, expected.indptr)
+    np.testing.assert_array_equal(graph.indices, expected.indices)
+    np.testing.assert_allclose(graph.scores, expected.scores, atol=1e-6)
+
+
+def _schema_operations(spec: dict) -> dict:
+    operations = extract_operations_from_dict(spec)
+    resolve_all_refs(operations, spec)
+    return operations
+
+
+def test_update_dependencies_matches_full_rebuild():
+    old_spec = generate_spec(200)
+    new_spec = copy.deepcopy(old_spec)
+    paths = list(new_spec["paths"])
+    for path in paths[:3]:
+        del new_spec["paths"][path]
+    for method in new_spec["paths"][paths[5]].values():
+        method.pop("parameters", None)
+    new_spec["paths"][paths[8] + "/copy"] = copy.deepcopy(new_spec["paths"][paths[8]])
+
+    old_components, old_hashes = schema_hashes(old_spec)
+    new_components, new_hashes = schema_hashes(new_spec)
+    assert old_components == new_components
+    dirty = {op_id for op_id, h in new_hashes.items() if old_hashes.get(op_id) != h}
+    assert dirty
+
+    previous = find_dependencies(_schema_operations(old_spec))
+    expected = find_dependencies(_schema_operations(new_spec))
+    assert expected
+    assert update_dependencies(_schema_operations(new_spec), previous, dirty) == expected
+
+
+@pytest.fixture(scope="module")
+def spec():
+    spec = generate_spec(120)
+    # 多字节字符：SpecStream 的字符位置 → 字节偏移换算只在非 ASCII 文件上生效
+    spec["info"]["description"] = "合成的 GitLab 风格接口文档"
+    first = next(iter(spec["paths"].values()))
+    next(iter(first.values()))["summary"] = "列出全部资源（中文摘要）"
+    return spec
+
+
+@pytest.mark.parametrize("suffix", [".yaml", ".json"])
+def test_stream_matches_full_load(spec, tmp_path, suffix):
+    path = tmp_path / f"spec{suffix}"
+    if suffix == ".json":
+        path.write_text(json.dumps(spec, indent=2, ensure_ascii=False), encoding="utf-8")
+    else:
+        save_spec(spec, path)
+    loaded = load_spec(path, use_snapshot=False)
+
+    with SpecStream(path) as stream:
+        assert list(stream.paths()) == list(loaded["paths"].items())
+        assert dict(stream.components("schemas")) == loaded["components"]["schemas"]
+        save_operations(iter_operations(stream.paths()), tmp_path / "stream.json")
+    save_operations(operations_from_spec(loaded), tmp_path / "full.json")
+    assert (tmp_path / "stream.json").read_bytes() == (tmp_path / "full.json").read_bytes()
+
+    assert extract_operations_streaming(str(path)) == _schema_operations(loaded)
+
+
+def test_stream_reindents_nested_blocks(tmp_path):
+    path = tmp_path / "spec.yaml"
+    path.write_text(
+        "openapi: 3.0.0\n"
+        "paths:\n"
+        "    /a:\n"
+        "        get:\n"
+        "            summary: 说明\n"
+        "            tags: [x, y]\n"
+        "    /b: {get: {summary: flow}}\n"
+        "components:\n"
+        "  schemas:\n"
+        "    A:\n"
+        "      type: object\n"
+        "      properties:\n"
+        "        id: {type: integer}\n",
+        encoding="utf-8")
+    loaded = load_spec(path, use_snapshot=False)
+    with SpecStream(path) as stream:
+        assert list(stream.paths()) == list(loaded["paths"].items())
+        assert stream.components("schemas")["A"] == loaded["components"]["schemas"]["A"]
+
+
+def _param_fixture(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((6, 16))
+    vectors = (centers[rng.integers(6, size=50)] + 0.3 * rng.standard_normal((50, 16))).astype(np.float32)
+    # 多条 meta 行共用一个向量（--dedup），部分向量不被任何行引用
+    index = rng.integers(45, size=150)
+    # 零向量（如空描述）的自相似度为 0，共用它的参数之间不应产生边
+    vectors[3] = 0
+    index[:6] = 3
+    meta = [{"operationId": f"op{row // 3}"} for row in range(len(index))]
+    return vectors, index, meta
+
+
+def _brute_force_edges(vectors, index, meta) -> dict:
+    normed = normalize(vectors)
+    edges = {}
+    for i in range(len(index)):
+        for j in range(i + 1, len(index)):
+            s = float(normed[index[i]] @ normed[index[j]])
+            if s >= SIMILARITY_THRESHOLD and meta[i]["operationId"] != meta[j]["operationId"]:
+                edges[(i, j)] = s
+    return edges
+
+
+def _collect(edges) -> dict:
+    result = {}
+    for i, j, s in edges:
+        for key, score in zip(zip(i.tolist(), j.tolist()), s.tolist()):
+            assert key not in result
+            result[key] = score
+    return result
+
+
+def _assert_same_edges(actual: dict, expected: dict):
+    assert actual.keys() == expected.keys()
+    np.testing.assert_allclose([actual[key] for key in expected], list(expected.values()), atol=1e-5)
+
+
+def test_expand_pairs_matches_brute_force():
+    vectors, index, meta = _param_fixture()
+    expected = _brute_force_edges(vectors, index, meta)
+    assert expected
+    _assert_same_edges(_collect(iter_vector_edges(meta, vectors, index, block_size=7)), expected)
+
+
+def test_ann_edges_match_exact_with_full_probe(tmp_path):
+    vectors, index, meta = _param_fixture()
+    ann = IVFIndex.build(vectors, n_lists=4, pq_subspaces=0)
+    ann.save(tmp_path / "ann.npz")
+    edges = iter_vector_edges(meta, vectors, index, block_size=7,
+                              ann_index=tmp_path / "ann.npz", n_probe=len(ann.centroids))
+    _assert_same_edges(_collect(edges), _brute_force_edges(vectors, index, meta))